@@ -1,14 +1,76 @@
-from fastapi import APIRouter, HTTPException, Request
-from typing import Dict, Any
-from app.db.session import get_session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from datetime import date, datetime, time, timedelta, timezone
+from typing import AsyncIterator, Dict, Any, List, Optional
+from app.db.session import get_async_db, get_async_session
 from app.models.order import Order
+from app.services import rollups
+from app.services.response_cache import CachedResponse, dashboard_cache
+from sqlalchemy import case
 from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+import csv
+import io
+import json
 import logging
-from starlette.responses import HTMLResponse
+import os
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# "rollup" reads the incrementally maintained order_rollup table; "orders" aggregates `order` directly
+DASHBOARD_SOURCE = os.getenv("DASHBOARD_SOURCE", "rollup")
+
+def _order_filters(start: Optional[date], end: Optional[date], status: Optional[List[str]]) -> list:
+    """WHERE clauses for the optional dashboard filters (dates are inclusive, UTC)."""
+    clauses = []
+    if start is not None:
+        clauses.append(Order.created_at >= datetime.combine(start, time.min, tzinfo=timezone.utc))
+    if end is not None:
+        clauses.append(Order.created_at < datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc))
+    if status:
+        clauses.append(Order.status.in_(status))
+    return clauses
+
+# Columns served by the listing/export endpoints (raw_text stays in the table)
+ORDER_LIST_COLUMNS = ["id", "product_type", "quantity", "status", "final_price", "email", "issues"]
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+
+def _order_list_select():
+    return select(*[getattr(Order, c) for c in ORDER_LIST_COLUMNS])
+
+# Response headers that are part of a cached representation
+CACHED_HEADERS = ("X-Next-Cursor",)
+
+def _cache_key(request: Request) -> tuple:
+    representation = "html" if "text/html" in request.headers.get("accept", "") else "json"
+    return (request.url.path, tuple(sorted(request.query_params.multi_items())), representation)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    return inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]
+
+def _from_cache_entry(request: Request, entry: CachedResponse) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "Vary": "Accept", **entry.headers}
+    if _etag_matches(request, entry.etag):
+        dashboard_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+def _cached(request: Request) -> Optional[Response]:
+    """Serve a fresh cached rendering (or a 304) without touching the database."""
+    entry = dashboard_cache.get(_cache_key(request))
+    return _from_cache_entry(request, entry) if entry is not None else None
+
+def _cache_response(request: Request, version: int, response: Response) -> Response:
+    # `version` is read before querying, so a write that races the query is never cached
+    headers = {k: response.headers[k] for k in CACHED_HEADERS if k in response.headers}
+    entry = dashboard_cache.put(_cache_key(request), response.body, response.media_type, version, headers)
+    return _from_cache_entry(request, entry)
+
 def _render_summary_html(total: int, revenue: float, pending: int) -> str:
     return f"""
 <!doctype html>
@@ -46,9 +108,9 @@ def _render_summary_html(total: int, revenue: float, pending: int) -> str:
     </table>
     <script>
       // Use string concatenation (avoid JS template literals) so Python f-strings don't interfere
-      fetch('/dashboard/orders').then(function(r){{ return r.json(); }}).then(function(rows){{
+      fetch('/dashboard/orders?recent=20').then(function(r){{ return r.json(); }}).then(function(rows){{
         var tbody = document.getElementById('rows');
-        rows.slice().reverse().slice(0,20).forEach(function(o){{
+        rows.forEach(function(o){{
           var tr = document.createElement('tr');
           var id = o.id !== undefined ? o.id : '';
           var product = o.product_type || '—';
@@ -67,85 +129,157 @@ def _render_summary_html(total: int, revenue: float, pending: int) -> str:
 """
 
 @router.get("/summary")
-async def summary(request: Request) -> Any:
-    session = get_session()
+async def summary(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[List[str]] = Query(None),
+    session: AsyncSession = Depends(get_async_db),
+) -> Any:
+    cached = _cached(request)
+    if cached is not None:
+        return cached
+    version = dashboard_cache.version
     try:
-        total = session.exec(select(func.count()).select_from(Order)).one()
-        if isinstance(total, tuple):
-            total = total[0]
+        if DASHBOARD_SOURCE == "rollup":
+            stmt = rollups.summary_stmt(start, end, status)
+        else:
+            # Single aggregate round-trip; never materializes Order rows (or raw_text)
+            stmt = select(
+                func.count(Order.id),
+                func.coalesce(func.sum(Order.final_price), 0),
+                func.coalesce(func.sum(case((Order.status == "needs_review", 1), else_=0)), 0),
+            ).where(*_order_filters(start, end, status))
+        total, total_revenue, pending = (await session.exec(stmt)).one()
         total = int(total or 0)
-        rows = session.exec(select(Order)).all()
-        total_revenue = sum((o.final_price or 0) for o in rows)
-        pending = session.exec(select(func.count()).select_from(Order).where(Order.status == "needs_review")).one()
-        if isinstance(pending, tuple):
-            pending = pending[0]
+        total_revenue = float(total_revenue or 0)
         pending = int(pending or 0)
 
         accept = request.headers.get('accept','')
         if 'text/html' in accept:
             html = _render_summary_html(total, total_revenue, pending)
-            return HTMLResponse(content=html)
+            return _cache_response(request, version, HTMLResponse(content=html))
 
-        return {"total_orders": total, "revenue": total_revenue, "pending": pending}
+        return _cache_response(request, version, JSONResponse({"total_orders": total, "revenue": total_revenue, "pending": pending}))
     except Exception as e:
         logger.exception("Failed to compute summary: %s", e)
         raise HTTPException(status_code=500, detail="Failed to compute dashboard summary")
-    finally:
-        session.close()
 
 @router.get("/orders")
-async def orders(request: Request):
-    session = get_session()
-    try:
-        rows = session.exec(select(Order).order_by(Order.id)).all()
-        result = []
-        for o in rows:
-            result.append({
-                "id": o.id,
-                "product_type": o.product_type,
-                "quantity": o.quantity,
-                "status": o.status,
-                "final_price": o.final_price,
-                "email": getattr(o, 'email', None),
-                "issues": o.issues,
-            })
+async def orders(
+    request: Request,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, description="Keyset cursor: return orders with id > after"),
+    recent: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Return the newest N orders, newest first"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[List[str]] = Query(None),
+    session: AsyncSession = Depends(get_async_db),
+):
+    """Keyset-paginated order listing.
 
-        accept = request.headers.get('accept','')
-        if 'text/html' in accept:
-            # simple HTML table view
-            rows_html = ''.join([f"<tr><td>{r['id']}</td><td>{r['product_type'] or '—'}</td><td>{r['quantity'] or '—'}</td><td>{r['status']}</td><td>{r['final_price'] if r['final_price']!=None else '—'}</td><td>{r.get('email') or ''}</td><td>{r['issues'] or ''}</td></tr>" for r in result])
-            html = f"""
+    Pages ascend by id; when a page is full the `X-Next-Cursor` response header holds the
+    `after` value for the next page. `recent=N` returns the newest N orders instead.
+    """
+    cached = _cached(request)
+    if cached is not None:
+        return cached
+    version = dashboard_cache.version
+    stmt = _order_list_select().where(*_order_filters(start, end, status))
+    if recent is not None:
+        stmt = stmt.order_by(Order.id.desc()).limit(recent)
+    else:
+        if after is not None:
+            stmt = stmt.where(Order.id > after)
+        stmt = stmt.order_by(Order.id).limit(limit)
+    rows = (await session.exec(stmt)).all()
+    result = [dict(zip(ORDER_LIST_COLUMNS, row)) for row in rows]
+    headers = {}
+    if recent is None and len(result) == limit:
+        headers["X-Next-Cursor"] = str(result[-1]["id"])
+
+    accept = request.headers.get('accept','')
+    if 'text/html' in accept:
+        # simple HTML table view
+        rows_html = ''.join([f"<tr><td>{r['id']}</td><td>{r['product_type'] or '—'}</td><td>{r['quantity'] or '—'}</td><td>{r['status']}</td><td>{r['final_price'] if r['final_price']!=None else '—'}</td><td>{r.get('email') or ''}</td><td>{r['issues'] or ''}</td></tr>" for r in result])
+        html = f"""
 <!doctype html>
 <html><head><meta charset='utf-8' /><title>Orders</title>
 <style>body{{font-family:Inter,system-ui, -apple-system, 'Segoe UI', Roboto; background:#f3f4f6; padding:24px}} table{{width:100%; border-collapse:collapse; background:white}}th,td{{padding:12px;border-bottom:1px solid #eef2f7}}thead{{background:#f9fafb}}</style>
 </head><body><div class='container'><h1>Orders</h1><table><thead><tr><th>ID</th><th>Product</th><th>Qty</th><th>Status</th><th>Price</th><th>Email</th><th>Issues</th></tr></thead><tbody>{rows_html}</tbody></table></div></body></html>
 """
-            return HTMLResponse(content=html)
+        return _cache_response(request, version, HTMLResponse(content=html, headers=headers))
+
+    return _cache_response(request, version, JSONResponse(result, headers=headers))
 
-        return result
-    finally:
-        session.close()
+async def _export_rows(stmt, fmt: str) -> AsyncIterator[str]:
+    # Own session: the request-scoped one may be closed before the body is fully streamed
+    async with get_async_session() as session:
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(ORDER_LIST_COLUMNS)
+            async for batch in result.partitions():
+                writer.writerows(batch)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        else:
+            async for batch in result.partitions():
+                yield "".join(json.dumps(dict(zip(ORDER_LIST_COLUMNS, row))) + "\n" for row in batch)
+
+@router.get("/orders/export")
+async def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[List[str]] = Query(None),
+):
+    """Stream every matching order as NDJSON or CSV from a server-side cursor (constant memory)."""
+    stmt = _order_list_select().where(*_order_filters(start, end, status)).order_by(Order.id)
+    if format == "csv":
+        media_type = "text/csv"
+        headers = {"Content-Disposition": 'attachment; filename="orders.csv"'}
+    else:
+        media_type = "application/x-ndjson"
+        headers = {}
+    return StreamingResponse(_export_rows(stmt, format), media_type=media_type, headers=headers)
 
 @router.get("/stats")
-async def stats(request: Request):
-    session = get_session()
-    try:
-        rows = session.exec(select(Order)).all()
-        by_status: Dict[str, int] = {}
-        for o in rows:
-            by_status[o.status or "unknown"] = by_status.get(o.status or "unknown", 0) + 1
+async def stats(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[List[str]] = Query(None),
+    session: AsyncSession = Depends(get_async_db),
+):
+    cached = _cached(request)
+    if cached is not None:
+        return cached
+    version = dashboard_cache.version
+    if DASHBOARD_SOURCE == "rollup":
+        stmt = rollups.stats_stmt(start, end, status)
+    else:
+        stmt = (
+            select(Order.status, func.count(Order.id))
+            .where(*_order_filters(start, end, status))
+            .group_by(Order.status)
+        )
+    by_status: Dict[str, int] = {}
+    for st, count in (await session.exec(stmt)).all():
+        key = st or "unknown"
+        by_status[key] = by_status.get(key, 0) + int(count)
 
-        accept = request.headers.get('accept','')
-        if 'text/html' in accept:
-            items = ''.join([f"<li><strong>{k}</strong>: {v}</li>" for k,v in by_status.items()])
-            html = f"""
+    accept = request.headers.get('accept','')
+    if 'text/html' in accept:
+        items = ''.join([f"<li><strong>{k}</strong>: {v}</li>" for k,v in by_status.items()])
+        html = f"""
 <!doctype html>
 <html><head><meta charset='utf-8' /><title>Stats</title>
 <style>body{{font-family:Inter,system-ui, -apple-system, 'Segoe UI', Roboto; background:#f3f4f6; padding:24px}} ul{{background:white;padding:20px;border-radius:8px;}}</style>
 </head><body><div class='container'><h1>Stats</h1><ul>{items}</ul></div></body></html>
 """
-            return HTMLResponse(content=html)
+        return _cache_response(request, version, HTMLResponse(content=html))
 
-        return {"by_status": by_status}
-    finally:
-        session.close()
+    return _cache_response(request, version, JSONResponse({"by_status": by_status}))
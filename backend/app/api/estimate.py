@@ -1,34 +1,57 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Any, Dict, Optional
+from sqlalchemy import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, Dict, List, Optional
+import os
 
+from app.services import estimation, rollups
+from app.services.response_cache import invalidate_orders
 from app.services.llm_parser import LLMSpecParser
-from app.services.pricing import PriceEngine
-from app.services.validation import Validator
-from app.services.workflow import WorkflowClient
-from app.db.session import get_session
+from app.services.workflow import WorkflowClient, workflow_queue
+from app.db.session import get_async_db
 from app.models.order import Order
 
 router = APIRouter()
 
+ESTIMATE_BATCH_MAX_ITEMS = int(os.getenv("ESTIMATE_BATCH_MAX_ITEMS", "1000"))
+# Parser calls (packed or single) in flight at once per batch request (the LLM client also caps calls per process)
+ESTIMATE_BATCH_CONCURRENCY = int(os.getenv("ESTIMATE_BATCH_CONCURRENCY", "16"))
+ESTIMATE_BATCH_CHUNK = 1000
+
 class EstimateRequest(BaseModel):
     order_id: int
     raw_text: str
     customer_email: Optional[str] = None
 
+class EstimateBatchItem(BaseModel):
+    order_id: int
+    # Defaults to the order's stored raw_text
+    raw_text: Optional[str] = None
+    customer_email: Optional[str] = None
+
+class EstimateBatchRequest(BaseModel):
+    items: List[EstimateBatchItem] = []
+    # Shorthand for items that only name an order
+    order_ids: List[int] = []
+
 @router.post("/")
-async def estimate_spec(req: EstimateRequest) -> Dict[str, Any]:
+async def estimate_spec(req: EstimateRequest, session: AsyncSession = Depends(get_async_db)) -> Dict[str, Any]:
     logger = __import__('logging').getLogger(__name__)
-    session = get_session()
-    order = session.get(Order, req.order_id)
+    order = await session.get(Order, req.order_id)
     if order is None:
         logger.warning("Estimate requested for missing order id=%s", req.order_id)
         raise HTTPException(status_code=404, detail="Order not found")
+    # End the read transaction: the pooled connection is not held across the LLM call (up to
+    # LLM_TOTAL_TIMEOUT). The write below re-reads the row, locked.
+    await session.commit()
 
     logger.debug("Estimate requested raw_text=%s", req.raw_text)
     parser = LLMSpecParser()
     try:
-        spec = parser.parse(req.raw_text)
+        spec = await parser.aparse(req.raw_text)
     except Exception as e:
         logger.exception("LLM parser error: %s", e)
         raise HTTPException(status_code=500, detail="LLM parser error")
@@ -39,56 +62,132 @@ async def estimate_spec(req: EstimateRequest) -> Dict[str, Any]:
 
     logger.info("Parsed spec for order_id=%s: %s", order.id, {k: spec.get(k) for k in ['product_type','quantity','size']})
 
-    # Validation (pass raw text so validator can detect 'free' and gibberish)
-    v = Validator()
-    validation = v.validate(spec, req.raw_text)
-    logger.info("Validation for order_id=%s => %s", order.id, validation.get("decision"))
-
-    # Pricing
-    engine = PriceEngine()
-    pricing = engine.estimate(spec)
-    logger.info("Pricing for order_id=%s => %s", order.id, pricing.get("final_price"))
-
-    # Respect validation by default; allow only explicit free-text overrides (send to ...)
-    override = parser.decide(spec, req.raw_text, full=False)
-    if override:
-        decision = override
-    else:
-        decision = validation.get("decision")
+    # Validation (pass raw text so validator can detect 'free' and gibberish), pricing and decision
+    result = estimation.evaluate(parser, spec, req.raw_text)
+    logger.info("Validation for order_id=%s => %s", order.id, result["validation"].get("decision"))
+    logger.info("Pricing for order_id=%s => %s", order.id, result["pricing"].get("final_price"))
+    validation, pricing = result["validation"], result["pricing"]
 
     # Persist all order updates in a single commit (reduces race conditions & duplicated commits)
-    try:
-        order.product_type = spec.get("product_type")
-        order.quantity = spec.get("quantity")
-        order.size = spec.get("size")
-        order.paper_type = spec.get("paper_type")
-        order.color = spec.get("color")
-        order.finishing = ",".join(spec.get("finishing") or [])
-        order.turnaround_days = spec.get("turnaround_days")
-        order.rush = bool(spec.get("rush", False))
-        order.final_price = pricing.get("final_price")
-        order.issues = ",".join(validation.get("issues") or [])
-        order.status = decision
-        if req.customer_email:
-            order.email = req.customer_email
-        session.add(order)
-        session.commit()
-        session.refresh(order)
-    finally:
-        session.close()
+    order = await rollups.lock_order(session, order.id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    before = rollups.snapshot(order)
+    for name, value in estimation.order_updates(result, req.customer_email).items():
+        setattr(order, name, value)
+    session.add(order)
+    await rollups.record_change(session, order, before)
+    await session.commit()
+    await session.refresh(order)
+    invalidate_orders()
 
     # Trigger workflow in n8n with summary payload (use LLM-decided disposition)
     wf = WorkflowClient()
-    payload = {
-        "order_id": order.id,
-        "decision": decision,
-        "price": pricing.get("final_price"),
-        "issues": validation.get("issues"),
-    }
-    if req.customer_email:
-        payload["email"] = req.customer_email
+    payload = estimation.workflow_payload(order.id, result, req.customer_email)
 
     logger.debug("Triggering workflow with payload: %s", payload)
-    wf.trigger(payload)
+    # requests + retry sleeps are blocking; keep them off the event loop
+    await run_in_threadpool(wf.trigger, payload)
 
     return {"order_id": order.id, "spec": spec, "validation": validation, "pricing": pricing}
+
+
+@router.post("/batch")
+async def estimate_batch(req: EstimateBatchRequest, session: AsyncSession = Depends(get_async_db)):
+    """Estimate many stored orders in one call.
+
+    Parsing packs several orders into each LLM call (`LLMSpecParser.aparse_many`), with calls run
+    concurrently (bounded by ESTIMATE_BATCH_CONCURRENCY); validation, pricing and the
+    decision run per item; every estimated order is written with one bulk UPDATE and one rollup
+    upsert in a single transaction. Workflow webhooks are queued and sent in the background.
+    Results are returned in input order (200 when every item was estimated, 207 otherwise).
+    """
+    logger = __import__('logging').getLogger(__name__)
+    items = list(req.items) + [EstimateBatchItem(order_id=i) for i in req.order_ids]
+    if not items:
+        raise HTTPException(status_code=400, detail="No orders provided")
+    if len(items) > ESTIMATE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {ESTIMATE_BATCH_MAX_ITEMS} items")
+
+    ids = {item.order_id for item in items}
+    rows = (await session.execute(
+        select(Order.id, Order.raw_text).where(Order.id.in_(ids))
+    )).all()
+    orders = {row.id: row for row in rows}
+
+    results: List[Dict[str, Any]] = [{"index": i, "order_id": item.order_id} for i, item in enumerate(items)]
+    pending: List[int] = []
+    seen = set()
+    for index, item in enumerate(items):
+        if item.order_id not in orders:
+            results[index]["error"] = "Order not found"
+        elif item.order_id in seen:
+            results[index]["error"] = "Duplicate order_id in batch"
+        else:
+            seen.add(item.order_id)
+            pending.append(index)
+
+    parser = LLMSpecParser()
+    texts = {index: items[index].raw_text or orders[items[index].order_id].raw_text or "" for index in pending}
+    # Release the connection while the batch is parsed; the write re-reads the rows it updates, locked
+    await session.commit()
+    specs = await parser.aparse_many(
+        [texts[index] for index in pending], return_exceptions=True, concurrency=ESTIMATE_BATCH_CONCURRENCY,
+    )
+
+    updates: List[Dict[str, Any]] = []
+    payloads: List[Dict[str, Any]] = []
+    for index, spec in zip(pending, specs):
+        item = items[index]
+        if isinstance(spec, Exception):
+            logger.error("LLM parser error for order_id=%s: %s", item.order_id, spec)
+            results[index]["error"] = "LLM parser error"
+            continue
+        if not isinstance(spec, dict):
+            results[index]["error"] = "LLM parser failed to return JSON"
+            continue
+        try:
+            result = estimation.evaluate(parser, spec, texts[index])
+        except Exception as e:
+            logger.exception("Estimate failed for order_id=%s: %s", item.order_id, e)
+            results[index]["error"] = "Estimate failed"
+            continue
+
+        updates.append({"id": item.order_id, **estimation.order_updates(result, item.customer_email)})
+        payloads.append(estimation.workflow_payload(item.order_id, result, item.customer_email))
+        results[index].update({
+            "spec": spec,
+            "validation": result["validation"],
+            "pricing": result["pricing"],
+            "decision": result["decision"],
+        })
+
+    if updates:
+        # Rollup deltas diff against the rows as they are now, locked (in id order) until commit
+        locked = {row.id: row for row in (await session.execute(
+            select(Order.id, Order.status, Order.final_price, Order.created_at)
+            .where(Order.id.in_([values["id"] for values in updates]))
+            .order_by(Order.id)
+            .with_for_update()
+        )).all()}
+        deltas: List[Dict[str, Any]] = []
+        for values in updates:
+            row = locked[values["id"]]
+            deltas.extend(rollups.deltas_for_values(
+                row.created_at, (row.status, row.final_price), values["status"], values["final_price"],
+            ))
+        # ORM bulk UPDATE by primary key: one executemany per chunk instead of a round trip per order
+        for start in range(0, len(updates), ESTIMATE_BATCH_CHUNK):
+            await session.execute(update(Order), updates[start:start + ESTIMATE_BATCH_CHUNK])
+        await rollups.apply_deltas(session, rollups.merge_deltas(deltas))
+        await session.commit()
+        invalidate_orders()
+        for payload in payloads:
+            workflow_queue.enqueue(payload)
+
+    failed = len(items) - len(updates)
+    logger.info("Batch estimate estimated=%s failed=%s", len(updates), failed)
+    return JSONResponse(
+        {"estimated": len(updates), "failed": failed, "results": results},
+        status_code=200 if failed == 0 else 207,
+    )
@@ -1,70 +1,261 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, Query, Request, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse
-from typing import Optional
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple, Union
+import json
+import os
 
-from app.db.session import get_session
+from app.db.session import get_async_db
 from app.models.order import Order, OrderCreate, OrderRaw
+from app.services import jobs, rollups
+from app.services.extraction_pool import ExtractionBusy, ExtractionTimeout, UnsupportedDocument, extract_document, is_supported
+from app.services.jobs import job_workers
+from app.services.response_cache import invalidate_orders
 from app.services.llm_parser import LLMSpecParser
-from app.utils.pdf_reader import extract_text_from_pdf
-from app.utils.image_ocr import ocr_image
-from app.utils.image_quality import get_image_dpi
+from app.services.uploads import UploadTooLarge, remove_spooled, spool_upload
 
 router = APIRouter()
 
+INTAKE_BATCH_MAX_ITEMS = int(os.getenv("INTAKE_BATCH_MAX_ITEMS", "10000"))
+INTAKE_BATCH_MAX_BYTES = int(os.getenv("INTAKE_BATCH_MAX_BYTES", str(32 * 1024 * 1024)))
+# Rows per multi-row INSERT statement
+INTAKE_BATCH_CHUNK = 1000
+
 @router.post("/order")
 async def intake_order(
     text: Optional[str] = Form(None),
     email_body: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
     email: Optional[str] = Form(None),
+    estimate: Optional[str] = Query(None),
+    session: AsyncSession = Depends(get_async_db),
 ):
-    """Accept plain text, email body, PDF, or image. Normalize, store raw input, and return order id."""
+    """Accept plain text, email body, PDF, or image. Normalize, store raw input, and return order id.
+
+    With `?estimate=async` the upload is not extracted in the request: the order is stored with an
+    estimate job (extract, parse, validate, price, persist, notify) and 202 is returned with the
+    job id; progress is at `GET /jobs/{id}`.
+    """
     logger = __import__('logging').getLogger(__name__)
     logger.info("Received intake request: text=%s, email_body=%s, file=%s", bool(text), bool(email_body), getattr(file, 'filename', None))
 
     if not any([text, email_body, file]):
         logger.warning("No input provided in intake request")
         raise HTTPException(status_code=400, detail="No input provided")
+    if estimate not in (None, "async"):
+        raise HTTPException(status_code=400, detail="estimate must be 'async'")
+    deferred = estimate == "async"
 
     raw_text = text or email_body or ""
     issues = []
+    upload = None
 
     if file:
+        content_type = file.content_type
+        if deferred and not is_supported(content_type):
+            logger.error("Unsupported file type: %s", content_type)
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {content_type}")
+        path = None
         try:
-            content_type = file.content_type
-            content = await file.read()
-            logger.debug("File content type=%s size=%s", content_type, len(content))
-            if content_type == "application/pdf":
-                extracted = extract_text_from_pdf(content)
-                logger.debug("Extracted %d chars from PDF", len(extracted))
-                raw_text += "\n" + extracted
-            elif content_type.startswith("image/"):
-                extracted = ocr_image(content)
+            # Spooled to disk in chunks (size-checked, hashed); extractors read the file, not a bytes copy
+            upload = await spool_upload(file)
+            path = upload.path
+            logger.debug("File content type=%s size=%s sha256=%s", content_type, upload.size, upload.sha256)
+            if not deferred:
+                # pdfminer / tesseract run in the extraction process pool, off the event loop
+                extracted, file_issues = await extract_document(path, upload.sha256, content_type)
                 raw_text += "\n" + extracted
-                dpi = get_image_dpi(content)
-                logger.debug("Image DPI=%s", dpi)
-                if min(dpi) < 300:
-                    issues.append("low_resolution")
-            else:
-                logger.error("Unsupported file type: %s", content_type)
-                raise HTTPException(status_code=400, detail=f"Unsupported file type: {content_type}")
-        except HTTPException:
-            raise
+                issues.extend(file_issues)
+        except UnsupportedDocument as e:
+            logger.error("%s", e)
+            raise HTTPException(status_code=400, detail=str(e))
+        except UploadTooLarge as e:
+            logger.warning("Rejected upload %s: %s", getattr(file, 'filename', None), e)
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {e.max_bytes} bytes")
+        except ExtractionBusy as e:
+            logger.warning("Extraction pool saturated; rejecting upload %s", getattr(file, 'filename', None))
+            raise HTTPException(status_code=503, detail="Document extraction is busy, retry later", headers={"Retry-After": str(e.retry_after)})
+        except ExtractionTimeout as e:
+            logger.error("Extraction timed out for upload %s: %s", getattr(file, 'filename', None), e)
+            raise HTTPException(status_code=422, detail="Document extraction timed out")
         except Exception as e:
             logger.exception("Error processing uploaded file: %s", e)
             raise HTTPException(status_code=400, detail="Failed to process uploaded file")
+        finally:
+            # A deferred upload is kept for the job's extract stage
+            if not deferred:
+                remove_spooled(path)
 
     # persist raw_text in DB
-    session = get_session()
+    order = Order(raw_text=raw_text, status="received")
+    if email:
+        order.email = email
+    session.add(order)
+    job = None
     try:
-        order = Order(raw_text=raw_text, status="received")
-        if email:
-            order.email = email
-        session.add(order)
-        session.commit()
-        session.refresh(order)
-        logger.info("Created order id=%s issues=%s email=%s", order.id, issues, email)
-    finally:
-        session.close()
+        await rollups.record_change(session, order, None)
+        if deferred:
+            # Order and job commit together: no job without its order, no queued order without a job
+            await session.flush()
+            job = jobs.new_job(order.id, email, upload, file.content_type if upload else None)
+            session.add(job)
+        await session.commit()
+    except BaseException:
+        if upload is not None and deferred:
+            remove_spooled(upload.path)
+        raise
+    await session.refresh(order)
+    invalidate_orders()
+    logger.info("Created order id=%s issues=%s email=%s", order.id, issues, email)
 
+    if job is not None:
+        job_workers.wake()
+        logger.info("Queued estimate job id=%s for order id=%s", job.id, order.id)
+        status_url = f"/jobs/{job.id}"
+        return JSONResponse(
+            {"order_id": order.id, "job_id": job.id, "status": job.status, "status_url": status_url, "raw_text": raw_text, "email": email},
+            status_code=202,
+            headers={"Location": status_url},
+        )
     return JSONResponse({"order_id": order.id, "issues": issues, "raw_text": raw_text, "email": email}, status_code=201)
+
+
+def _batch_item_error(item: Any) -> Optional[str]:
+    if not isinstance(item, dict):
+        return "item must be an object"
+    text, email_body, email = item.get("text"), item.get("email_body"), item.get("email")
+    for name, value in (("text", text), ("email_body", email_body), ("email", email)):
+        if value is not None and not isinstance(value, str):
+            return f"{name} must be a string"
+    if not (text or email_body):
+        return "No input provided"
+    return None
+
+
+async def _read_batch(request: Request) -> List[Tuple[Any, Optional[str]]]:
+    """Parse a JSON array or NDJSON body into (item, parse_error) pairs, one per input item.
+
+    Answers 413 as soon as the body passes INTAKE_BATCH_MAX_BYTES or, for NDJSON, as soon as
+    the items read pass INTAKE_BATCH_MAX_ITEMS, without reading the rest of the body.
+    """
+    content_type = request.headers.get("content-type", "")
+    length = request.headers.get("content-length", "")
+    if INTAKE_BATCH_MAX_BYTES > 0 and length.isdigit() and int(length) > INTAKE_BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {INTAKE_BATCH_MAX_BYTES} bytes")
+    items: List[Tuple[Any, Optional[str]]] = []
+    received = 0
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        buf = bytearray()
+        # Bytes of `buf` already searched for a newline: each chunk is scanned once
+        scanned = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if INTAKE_BATCH_MAX_BYTES > 0 and received > INTAKE_BATCH_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Batch exceeds {INTAKE_BATCH_MAX_BYTES} bytes")
+            buf += chunk
+            start = 0
+            while True:
+                end = buf.find(b"\n", max(start, scanned))
+                if end < 0:
+                    break
+                line = buf[start:end]
+                if line.strip():
+                    items.append(_parse_ndjson_line(line))
+                    if len(items) > INTAKE_BATCH_MAX_ITEMS:
+                        raise HTTPException(status_code=413, detail=f"Batch exceeds {INTAKE_BATCH_MAX_ITEMS} items")
+                start = end + 1
+            del buf[:start]
+            scanned = len(buf)
+        if buf.strip():
+            items.append(_parse_ndjson_line(buf))
+        return items
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if INTAKE_BATCH_MAX_BYTES > 0 and len(body) > INTAKE_BATCH_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {INTAKE_BATCH_MAX_BYTES} bytes")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if isinstance(payload, dict) and isinstance(payload.get("items"), list):
+        payload = payload["items"]
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    return [(item, None) for item in payload]
+
+
+def _parse_ndjson_line(line: Union[bytes, bytearray]) -> Tuple[Any, Optional[str]]:
+    try:
+        return json.loads(line), None
+    except ValueError:
+        return None, "invalid JSON"
+
+
+@router.post("/orders:batch")
+async def intake_orders_batch(request: Request, session: AsyncSession = Depends(get_async_db)):
+    """Bulk text/email intake: a JSON array (or NDJSON stream) of `{text, email_body, email}` objects.
+
+    Valid items are inserted with multi-row INSERT ... RETURNING in one transaction, with a savepoint
+    per INTAKE_BATCH_CHUNK rows: a chunk the database rejects is rolled back and its items reported
+    as failed. Results are returned in input order, with `order_id` for created items and `error`
+    for rejected ones (201 when every item was created, 207 otherwise).
+    """
+    logger = __import__('logging').getLogger(__name__)
+    items = await _read_batch(request)
+    if len(items) > INTAKE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {INTAKE_BATCH_MAX_ITEMS} items")
+
+    results: List[Dict[str, Any]] = []
+    rows: List[Dict[str, Any]] = []
+    row_indexes: List[int] = []
+    now = datetime.now(timezone.utc)
+    for index, (item, parse_error) in enumerate(items):
+        error = parse_error or _batch_item_error(item)
+        if error:
+            results.append({"index": index, "error": error})
+            continue
+        results.append({"index": index})
+        rows.append({
+            "raw_text": item.get("text") or item.get("email_body") or "",
+            "status": "received",
+            "email": item.get("email") or None,
+            "created_at": now,
+        })
+        row_indexes.append(index)
+
+    created = 0
+    if rows:
+        stmt = insert(Order).returning(Order.id, sort_by_parameter_order=True)
+        for start in range(0, len(rows), INTAKE_BATCH_CHUNK):
+            chunk = rows[start:start + INTAKE_BATCH_CHUNK]
+            indexes = row_indexes[start:start + INTAKE_BATCH_CHUNK]
+            try:
+                # Each chunk under its own savepoint: a failing chunk does not take the others with it
+                async with session.begin_nested():
+                    ids = (await session.execute(stmt, chunk)).scalars().all()
+            except DBAPIError as e:
+                logger.error("Batch intake chunk at index %s (%s items) failed: %s", indexes[0], len(chunk), e)
+                for index in indexes:
+                    results[index] = {"index": index, "error": "Database error, item not created"}
+                continue
+            for index, order_id in zip(indexes, ids):
+                results[index]["order_id"] = order_id
+            created += len(ids)
+        if created:
+            await rollups.apply_deltas(session, [{
+                "day": now.date(), "status": "received", "order_count": created, "revenue": 0.0,
+            }])
+            await session.commit()
+            invalidate_orders()
+
+    failed = len(results) - created
+    logger.info("Batch intake created=%s failed=%s", created, failed)
+    return JSONResponse(
+        {"created": created, "failed": failed, "results": results},
+        status_code=201 if failed == 0 else 207,
+    )
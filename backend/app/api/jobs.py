@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, Dict
+
+from app.db.session import get_async_db
+from app.models.job import EstimateJob
+from app.services.jobs import job_view
+
+router = APIRouter()
+
+@router.get("/{job_id}")
+async def get_job(job_id: int, session: AsyncSession = Depends(get_async_db)) -> Dict[str, Any]:
+    """Status of an estimate job queued by `POST /intake/order?estimate=async`, stage by stage."""
+    job = await session.get(EstimateJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job)
@@ -0,0 +1,40 @@
+from fastapi import APIRouter
+from typing import Any, Dict
+
+from app.db.session import pool_metrics
+from app.services.circuit_breaker import llm_breaker
+from app.services.extraction_cache import extraction_cache
+from app.services.extraction_pool import extraction_pool
+from app.services.jobs import job_workers
+from app.services.llm_client import llm_metrics
+from app.services.llm_parser import batch_stats, cascade_stats, hedge_stats, parse_flights
+from app.services.parse_cache import parse_cache
+from app.services.response_cache import dashboard_cache
+from app.services.text_reducer import reduction_stats
+from app.services.workflow import workflow_queue
+
+router = APIRouter()
+
+@router.get("")
+async def metrics() -> Dict[str, Any]:
+    """Process-local runtime counters (per uvicorn worker)."""
+    return {
+        "db": pool_metrics(),
+        "dashboard_cache": dashboard_cache.stats(),
+        "extraction_pool": extraction_pool.stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "jobs": job_workers.stats(),
+        "llm": llm_metrics(),
+        "llm_breaker": llm_breaker.stats(),
+        "llm_hedge": hedge_stats.stats(),
+        "llm_parse_cache": parse_cache.stats(),
+        "llm_singleflight": parse_flights.stats(),
+        "llm_cascade": cascade_stats.stats(),
+        "llm_batch": batch_stats.stats(),
+        "llm_input": reduction_stats.stats(),
+        "workflow_queue": workflow_queue.stats(),
+    }
+
+@router.get("/db")
+async def db_metrics() -> Dict[str, Any]:
+    return pool_metrics()
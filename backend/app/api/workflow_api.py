@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
-from app.db.session import get_session
+from app.db.session import get_async_db
 from app.models.order import Order
+from app.services import rollups
+from app.services.response_cache import invalidate_orders
 
 router = APIRouter()
 
@@ -17,12 +20,12 @@ class WorkflowUpdate(BaseModel):
     email: Optional[str] = None
 
 @router.post("/workflow/update")
-async def update_order(update: WorkflowUpdate):
-    session = get_session()
-    order = session.get(Order, update.order_id)
+async def update_order(update: WorkflowUpdate, session: AsyncSession = Depends(get_async_db)):
+    order = await rollups.lock_order(session, update.order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    before = rollups.snapshot(order)
     # Prefer explicit `decision` if provided (keeps n8n payload semantics intact)
     if update.decision is not None:
         order.status = update.decision
@@ -42,7 +45,8 @@ async def update_order(update: WorkflowUpdate):
             pass
 
     session.add(order)
-    session.commit()
-    session.refresh(order)
-    session.close()
+    await rollups.record_change(session, order, before)
+    await session.commit()
+    await session.refresh(order)
+    invalidate_orders()
     return {"ok": True, "order_id": order.id, "status": order.status, "final_price": order.final_price, "issues": order.issues}
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""Versioned schema migrations.
+
+Run once per deploy, before the API workers start (the API itself performs no DDL):
+
+    python -m app.db.migrations            # apply pending migrations
+    python -m app.db.migrations current    # print the applied version
+    python -m app.db.migrations list       # list migrations and whether they are applied
+
+Applied versions are recorded in `schema_migrations`. Concurrent runners serialize on a
+Postgres advisory lock. Migrations are append-only: never edit one that has shipped, add a
+new version instead. SQLite (local tests/scripts) has no migration history; the runner
+creates the current model tables directly and stamps the latest version.
+"""
+from dataclasses import dataclass
+from typing import Callable, List, Sequence, Union
+import logging
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel
+
+from app.db.session import get_engine
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant shared by every runner: pg_advisory_lock key
+MIGRATION_LOCK_ID = 727_401_001
+
+Step = Union[str, Callable[[Connection], None]]
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    steps: Sequence[Step]
+    # False for statements Postgres refuses inside a transaction (CREATE INDEX CONCURRENTLY)
+    transactional: bool = True
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline order table", [
+        """
+        CREATE TABLE IF NOT EXISTS "order" (
+            id SERIAL PRIMARY KEY,
+            raw_text TEXT NOT NULL,
+            product_type VARCHAR(128),
+            quantity INTEGER,
+            size VARCHAR(64),
+            paper_type VARCHAR(64),
+            color VARCHAR(64),
+            finishing TEXT,
+            turnaround_days INTEGER,
+            rush BOOLEAN DEFAULT FALSE,
+            status VARCHAR(64),
+            final_price DOUBLE PRECISION,
+            issues TEXT
+        )
+        """,
+    ]),
+    Migration(2, "order.email and order.created_at", [
+        'ALTER TABLE "order" ADD COLUMN IF NOT EXISTS email VARCHAR(256)',
+        'ALTER TABLE "order" ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ DEFAULT now()',
+    ]),
+    # CONCURRENTLY: building these on a large live table must not block intake writes
+    Migration(3, "hot-path indexes on order status, email and created_at", [
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_order_status ON "order" (status)',
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_order_email ON "order" (email)',
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_order_created_at ON "order" (created_at)',
+    ], transactional=False),
+    Migration(4, "order_rollup dashboard counters", [
+        """
+        CREATE TABLE IF NOT EXISTS order_rollup (
+            day DATE NOT NULL,
+            status VARCHAR(64) NOT NULL,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            revenue DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status)
+        )
+        """,
+        "DELETE FROM order_rollup",
+        """
+        INSERT INTO order_rollup (day, status, order_count, revenue)
+        SELECT COALESCE((created_at AT TIME ZONE 'UTC')::date, CURRENT_DATE),
+               COALESCE(status, 'unknown'), COUNT(*), COALESCE(SUM(final_price), 0)
+        FROM "order"
+        GROUP BY 1, 2
+        """,
+    ]),
+    Migration(5, "llm_parse_cache", [
+        """
+        CREATE TABLE IF NOT EXISTS llm_parse_cache (
+            key VARCHAR(64) PRIMARY KEY,
+            model VARCHAR(128) NOT NULL,
+            prompt_version VARCHAR(64) NOT NULL,
+            spec TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL,
+            expires_at TIMESTAMPTZ NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_llm_parse_cache_created_at ON llm_parse_cache (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_llm_parse_cache_expires_at ON llm_parse_cache (expires_at)",
+    ]),
+    Migration(6, "extraction_cache", [
+        """
+        CREATE TABLE IF NOT EXISTS extraction_cache (
+            key VARCHAR(64) PRIMARY KEY,
+            content_sha256 VARCHAR(64) NOT NULL,
+            extractor VARCHAR(128) NOT NULL,
+            result TEXT NOT NULL,
+            result_bytes INTEGER NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL,
+            last_used_at TIMESTAMPTZ NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_extraction_cache_content_sha256 ON extraction_cache (content_sha256)",
+        "CREATE INDEX IF NOT EXISTS ix_extraction_cache_last_used_at ON extraction_cache (last_used_at)",
+    ]),
+    Migration(7, "estimate_job queue", [
+        """
+        CREATE TABLE IF NOT EXISTS estimate_job (
+            id SERIAL PRIMARY KEY,
+            order_id INTEGER NOT NULL,
+            status VARCHAR(16) NOT NULL,
+            stage VARCHAR(16),
+            stages TEXT NOT NULL DEFAULT '{}',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            customer_email VARCHAR(256),
+            upload_path TEXT,
+            upload_content_type VARCHAR(128),
+            upload_sha256 VARCHAR(64),
+            result TEXT,
+            error TEXT,
+            run_after TIMESTAMPTZ NOT NULL,
+            locked_by VARCHAR(64),
+            locked_until TIMESTAMPTZ,
+            created_at TIMESTAMPTZ NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL,
+            finished_at TIMESTAMPTZ
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_estimate_job_order_id ON estimate_job (order_id)",
+        "CREATE INDEX IF NOT EXISTS ix_estimate_job_status ON estimate_job (status)",
+        # Claim query: the queued jobs that are due, oldest first; and expired leases
+        "CREATE INDEX IF NOT EXISTS ix_estimate_job_queued ON estimate_job (run_after, id) WHERE status = 'queued'",
+        "CREATE INDEX IF NOT EXISTS ix_estimate_job_lease ON estimate_job (locked_until) WHERE status = 'running'",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER PRIMARY KEY,"
+        " description TEXT NOT NULL,"
+        " applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ))
+
+
+def applied_versions(conn: Connection) -> List[int]:
+    _ensure_version_table(conn)
+    return [r[0] for r in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+
+def _run_steps(conn: Connection, migration: Migration) -> None:
+    for step in migration.steps:
+        if callable(step):
+            step(conn)
+        else:
+            conn.execute(text(step))
+
+
+def _record(conn: Connection, migration: Migration) -> None:
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+        {"v": migration.version, "d": migration.description},
+    )
+
+
+def _create_all_and_stamp(engine) -> List[int]:
+    # Import models so every table is registered on the metadata
+    import app.models.order  # noqa: F401
+    import app.models.rollup  # noqa: F401
+    import app.models.llm_cache  # noqa: F401
+    import app.models.extraction_cache  # noqa: F401
+    import app.models.job  # noqa: F401
+
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        done = set(applied_versions(conn))
+        stamped = [m.version for m in MIGRATIONS if m.version not in done]
+        for m in MIGRATIONS:
+            if m.version not in done:
+                _record(conn, m)
+    return stamped
+
+
+def upgrade(engine=None) -> List[int]:
+    """Apply every pending migration in order. Returns the versions applied."""
+    engine = engine or get_engine()
+    if engine.dialect.name != "postgresql":
+        return _create_all_and_stamp(engine)
+
+    applied: List[int] = []
+    # Dedicated autocommit connection holds the session-level advisory lock for the whole run
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": MIGRATION_LOCK_ID})
+        try:
+            done = set(applied_versions(lock_conn))
+            for migration in MIGRATIONS:
+                if migration.version in done:
+                    continue
+                logger.info("Applying migration %s: %s", migration.version, migration.description)
+                if migration.transactional:
+                    with engine.begin() as conn:
+                        _run_steps(conn, migration)
+                        _record(conn, migration)
+                else:
+                    _run_steps(lock_conn, migration)
+                    _record(lock_conn, migration)
+                applied.append(migration.version)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": MIGRATION_LOCK_ID})
+    return applied
+
+
+def current_version(engine=None) -> int:
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        try:
+            versions = [r[0] for r in conn.execute(text("SELECT version FROM schema_migrations"))]
+        except Exception:
+            return 0
+    return max(versions, default=0)
+
+
+def main(argv: List[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    command = argv[0] if argv else "upgrade"
+    if command == "upgrade":
+        applied = upgrade()
+        logger.info("Schema at version %s (applied: %s)", LATEST_VERSION, applied or "none")
+    elif command == "current":
+        print(current_version())
+    elif command == "list":
+        with get_engine().connect() as conn:
+            done = set(applied_versions(conn))
+            conn.commit()
+        for m in MIGRATIONS:
+            print(f"{m.version:>4} {'applied' if m.version in done else 'pending':<8} {m.description}")
+    else:
+        print(f"unknown command {command!r}; expected upgrade, current or list", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,4 +1,5 @@
--- SQL schema for orders (initial)
+-- Reference schema for orders. Applied via versioned migrations: python -m app.db.migrations
+-- (app/db/migrations.py is the source of truth; keep this file in sync with it)
 
 CREATE TABLE IF NOT EXISTS "order" (
     id SERIAL PRIMARY KEY,
@@ -12,7 +13,75 @@ CREATE TABLE IF NOT EXISTS "order" (
     turnaround_days INTEGER,
     rush BOOLEAN DEFAULT FALSE,
     status VARCHAR(64),
-    final_price NUMERIC,
+    final_price DOUBLE PRECISION,
     issues TEXT,
-    email VARCHAR(256)
+    email VARCHAR(256),
+    created_at TIMESTAMPTZ DEFAULT now()
 );
+
+CREATE INDEX IF NOT EXISTS ix_order_status ON "order" (status);
+CREATE INDEX IF NOT EXISTS ix_order_email ON "order" (email);
+CREATE INDEX IF NOT EXISTS ix_order_created_at ON "order" (created_at);
+
+-- Per-day, per-status dashboard counters maintained on every order write
+CREATE TABLE IF NOT EXISTS order_rollup (
+    day DATE NOT NULL,
+    status VARCHAR(64) NOT NULL,
+    order_count INTEGER NOT NULL DEFAULT 0,
+    revenue DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status)
+);
+
+-- Persistent LLM parse cache (see app/services/parse_cache.py)
+CREATE TABLE IF NOT EXISTS llm_parse_cache (
+    key VARCHAR(64) PRIMARY KEY,
+    model VARCHAR(128) NOT NULL,
+    prompt_version VARCHAR(64) NOT NULL,
+    spec TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_llm_parse_cache_created_at ON llm_parse_cache (created_at);
+CREATE INDEX IF NOT EXISTS ix_llm_parse_cache_expires_at ON llm_parse_cache (expires_at);
+
+-- Content-addressed document extraction cache (see app/services/extraction_cache.py)
+CREATE TABLE IF NOT EXISTS extraction_cache (
+    key VARCHAR(64) PRIMARY KEY,
+    content_sha256 VARCHAR(64) NOT NULL,
+    extractor VARCHAR(128) NOT NULL,
+    result TEXT NOT NULL,
+    result_bytes INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    last_used_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_extraction_cache_content_sha256 ON extraction_cache (content_sha256);
+CREATE INDEX IF NOT EXISTS ix_extraction_cache_last_used_at ON extraction_cache (last_used_at);
+
+-- Intake-to-estimate job queue, claimed with FOR UPDATE SKIP LOCKED (see app/services/jobs.py)
+CREATE TABLE IF NOT EXISTS estimate_job (
+    id SERIAL PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    status VARCHAR(16) NOT NULL,
+    stage VARCHAR(16),
+    stages TEXT NOT NULL DEFAULT '{}',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    customer_email VARCHAR(256),
+    upload_path TEXT,
+    upload_content_type VARCHAR(128),
+    upload_sha256 VARCHAR(64),
+    result TEXT,
+    error TEXT,
+    run_after TIMESTAMPTZ NOT NULL,
+    locked_by VARCHAR(64),
+    locked_until TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ix_estimate_job_order_id ON estimate_job (order_id);
+CREATE INDEX IF NOT EXISTS ix_estimate_job_status ON estimate_job (status);
+CREATE INDEX IF NOT EXISTS ix_estimate_job_queued ON estimate_job (run_after, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS ix_estimate_job_lease ON estimate_job (locked_until) WHERE status = 'running';
@@ -1,12 +1,234 @@
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import Any, AsyncIterator, Dict, Iterator
 import os
+import threading
+import time
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+psycopg2://postgres:postgres@db:5432/ai_print")
 
+
+def _to_async_url(url: str) -> str:
+    """Map a sync driver URL onto its asyncio driver (psycopg2 -> asyncpg, sqlite -> aiosqlite)."""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+# The async path used by the API routes; override when the async driver needs a different DSN
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _to_async_url(DATABASE_URL)
+
+# Pool sizing (per process). Total Postgres connections ~= workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+
+class PoolStats:
+    """Thread-safe counters describing how the connection pool is used."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "waits": self.waits,
+                "wait_seconds_total": round(self.wait_seconds, 6),
+                "wait_seconds_max": round(self.max_wait_seconds, 6),
+                "timeouts": self.timeouts,
+            }
+
+
+pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+class _WaitInstrumented:
+    """Pool mixin that records checkouts which had to wait for a free connection."""
+
+    stats = pool_stats
+
+    def _do_get(self):
+        # Same condition QueuePool uses to decide it must block until a connection is checked in
+        exhausted = (
+            self._max_overflow > -1
+            and self._overflow >= self._max_overflow
+            and self._pool.empty()
+        )
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.stats.incr("timeouts")
+            raise
+        finally:
+            if exhausted:
+                self.stats.record_wait(time.perf_counter() - start)
+
+
+class InstrumentedQueuePool(_WaitInstrumented, QueuePool):
+    stats = pool_stats
+
+
+class InstrumentedAsyncQueuePool(_WaitInstrumented, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+def _pool_kwargs(url: str, poolclass=InstrumentedQueuePool) -> Dict[str, Any]:
+    # SQLite (tests / scripts) manages its own pooling and rejects the sizing arguments
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _instrument(engine, stats: PoolStats) -> None:
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, conn_record):
+        stats.incr("connects")
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+        stats.incr("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, conn_record):
+        stats.incr("checkins")
+
+
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+
+
 def get_engine():
-    return create_engine(DATABASE_URL, echo=True)
+    """Return the process-wide engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(DATABASE_URL, echo=DB_ECHO, **_pool_kwargs(DATABASE_URL))
+                _instrument(engine, pool_stats)
+                _engine = engine
+    return _engine
+
+
+def get_async_engine():
+    """Return the process-wide asyncio engine used by the API routes."""
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                engine = create_async_engine(
+                    ASYNC_DATABASE_URL,
+                    echo=DB_ECHO,
+                    **_pool_kwargs(ASYNC_DATABASE_URL, InstrumentedAsyncQueuePool),
+                )
+                _instrument(engine.sync_engine, async_pool_stats)
+                _async_engine = engine
+    return _async_engine
 
 
 def get_session() -> Session:
-    engine = get_engine()
-    return Session(engine)
+    """Open a session on the shared engine (scripts / tests). Callers must close it."""
+    return Session(get_engine())
+
+
+def get_db() -> Iterator[Session]:
+    """FastAPI dependency yielding a session that is closed after the request."""
+    session = get_session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def get_async_session() -> AsyncSession:
+    """Open an AsyncSession on the shared async engine. Use as `async with get_async_session() as s`."""
+    # expire_on_commit=False: attributes stay readable after commit without an implicit (sync) reload
+    return AsyncSession(get_async_engine(), expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency yielding an AsyncSession that is closed after the request."""
+    async with get_async_session() as session:
+        yield session
+
+
+async def dispose_engines() -> None:
+    """Close pooled connections (app shutdown)."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+
+
+def _engine_metrics(engine, url: str, stats: PoolStats) -> Dict[str, Any]:
+    metrics: Dict[str, Any] = {"url_dialect": url.split(":", 1)[0]}
+    if engine is None:
+        metrics["initialized"] = False
+        metrics.update(stats.snapshot())
+        return metrics
+
+    pool = engine.pool
+    metrics["initialized"] = True
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    metrics["status"] = pool.status()
+    metrics.update(stats.snapshot())
+    return metrics
+
+
+def pool_metrics() -> Dict[str, Any]:
+    """Current pool occupancy plus cumulative checkout/wait counters for both engines."""
+    return {
+        "sync": _engine_metrics(_engine, DATABASE_URL, pool_stats),
+        "async": _engine_metrics(
+            _async_engine.sync_engine if _async_engine is not None else None,
+            ASYNC_DATABASE_URL,
+            async_pool_stats,
+        ),
+    }
@@ -1,9 +1,13 @@
-from fastapi import FastAPI
-from sqlmodel import SQLModel
+from fastapi import Depends, FastAPI
+from sqlmodel import Session
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import intake, estimate, validate, dashboard, workflow_api
-from app.db.session import get_engine
+from app.api import intake, estimate, validate, dashboard, workflow_api, metrics, jobs
+from app.db.session import dispose_engines
+from app.services.extraction_pool import extraction_pool
+from app.services.jobs import job_workers
+from app.services.llm_client import close_llm_client
+from app.services.uploads import UploadLimitMiddleware
 
 app = FastAPI(title="AI Print Estimator")
 
@@ -15,6 +19,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Reject oversized uploads while the body is still streaming in
+app.add_middleware(UploadLimitMiddleware, paths=["/intake/order"])
 
 # Include routers
 app.include_router(intake.router, prefix="/intake", tags=["intake"])
@@ -22,22 +28,22 @@ app.include_router(estimate.router, prefix="/estimate", tags=["estimate"])
 app.include_router(validate.router, prefix="/validate", tags=["validate"])
 app.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
 app.include_router(workflow_api.router, prefix="", tags=["workflow"])
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+
+# Schema changes are applied by `python -m app.db.migrations` before workers start; startup does no DDL.
 
 @app.on_event("startup")
-def on_startup():
-    engine = get_engine()
-    SQLModel.metadata.create_all(engine)
+async def on_startup():
+    # Estimate job workers (JOBS_WORKERS per process; 0 when run by `python -m app.services.jobs`)
+    await job_workers.start()
 
-    # Ensure existing Postgres DB has the `email` column (added in models). This is a small
-    # non-destructive migration that adds the column if it's missing so running containers
-    # don't crash on writes from the frontend/workflow.
-    try:
-        from sqlalchemy import text
-        with engine.begin() as conn:
-            conn.execute(text('ALTER TABLE "order" ADD COLUMN IF NOT EXISTS email VARCHAR(256);'))
-    except Exception as e:
-        import logging
-        logging.getLogger(__name__).warning("Failed to run simple migration for 'email' column: %s", e)
+@app.on_event("shutdown")
+async def on_shutdown():
+    await job_workers.stop()
+    await dispose_engines()
+    await close_llm_client()
+    extraction_pool.shutdown()
 
 @app.get("/")
 async def root():
@@ -81,29 +87,32 @@ class RetryQueueItem(BaseModel):
     error: str
     retry_count: int = Field(..., ge=0)
 
-from app.db.session import get_session
+from app.db.session import get_db
 from app.models.order import Order
+from app.services import rollups
+from app.services.response_cache import invalidate_orders
 
 
 @app.put("/orders/{order_id}")
-def update_order(order_id: int, upd: OrderUpdate):
+def update_order(order_id: int, upd: OrderUpdate, session: Session = Depends(get_db)):
     """Update an order's status (as called by n8n nodes). This will try to update the persisted DB Order if present, otherwise fall back to the in-memory store for tests/local dev."""
     record = {"order_id": order_id, "status": upd.status, "updated_at": upd.updated_at.isoformat()}
 
     # First try to update the DB-backed Order if it exists
-    session = None
     try:
-        session = get_session()
-        db_order = session.get(Order, order_id)
+        db_order = rollups.lock_order_sync(session, order_id)
         if db_order is not None:
+            before = rollups.snapshot(db_order)
             db_order.status = upd.status
             if upd.price is not None:
                 db_order.final_price = upd.price
             if upd.issues is not None:
                 db_order.issues = upd.issues
             session.add(db_order)
+            rollups.record_change_sync(session, db_order, before)
             session.commit()
             session.refresh(db_order)
+            invalidate_orders()
             logger.info("DB Order updated order_id=%s status=%s", order_id, upd.status)
             return {
                 "order_id": db_order.id,
@@ -113,9 +122,7 @@ def update_order(order_id: int, upd: OrderUpdate):
             }
     except Exception as e:
         logger.exception("Failed to update DB order: %s", e)
-    finally:
-        if session:
-            session.close()
+        session.rollback()
 
     # Fallback to in-memory store (keeps existing tests and simple local behaviour)
     with _store_lock:
@@ -125,24 +132,18 @@ def update_order(order_id: int, upd: OrderUpdate):
 
 
 @app.get("/orders/{order_id}")
-def get_order(order_id: int):
+def get_order(order_id: int, session: Session = Depends(get_db)):
     # prefer DB-backed order, otherwise return in-memory if present
-    session = None
-    try:
-        session = get_session()
-        db_order = session.get(Order, order_id)
-        if db_order is not None:
-            return {
-                "order_id": db_order.id,
-                "status": db_order.status,
-                "final_price": db_order.final_price,
-                "issues": db_order.issues,
-                "product_type": db_order.product_type,
-                "quantity": db_order.quantity,
-            }
-    finally:
-        if session:
-            session.close()
+    db_order = session.get(Order, order_id)
+    if db_order is not None:
+        return {
+            "order_id": db_order.id,
+            "status": db_order.status,
+            "final_price": db_order.final_price,
+            "issues": db_order.issues,
+            "product_type": db_order.product_type,
+            "quantity": db_order.quantity,
+        }
 
     with _store_lock:
         rec = _orders.get(order_id)
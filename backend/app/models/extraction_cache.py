@@ -0,0 +1,18 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+class ExtractionCacheEntry(SQLModel, table=True):
+    """Persisted document extraction result, keyed by sha256(upload sha256, extractor version).
+
+    `result` is the extractor output as JSON text; `result_bytes` its size, which bounds the
+    table. Rows are evicted least recently used first (`last_used_at`).
+    """
+    __tablename__ = "extraction_cache"
+
+    key: str = Field(primary_key=True, max_length=64)
+    content_sha256: str = Field(index=True, max_length=64)
+    extractor: str = Field(max_length=128)
+    result: str
+    result_bytes: int
+    created_at: datetime
+    last_used_at: datetime = Field(index=True)
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import SQLModel, Field
+
+class EstimateJob(SQLModel, table=True):
+    """Queued intake-to-estimate job, claimed by workers with SELECT ... FOR UPDATE SKIP LOCKED.
+
+    `status` is queued / running / succeeded / failed. `stages` is JSON text with one entry per
+    pipeline stage (status, timings, details); `result` the estimate as JSON once succeeded. A
+    running job whose `locked_until` lease has passed (its worker died) is claimed again.
+    """
+    __tablename__ = "estimate_job"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    order_id: int = Field(index=True)
+    status: str = Field(index=True, max_length=16)
+    stage: Optional[str] = Field(default=None, max_length=16)
+    stages: str = "{}"
+    attempts: int = 0
+    customer_email: Optional[str] = Field(default=None, max_length=256)
+    # Spooled upload extracted by the job (deleted once extracted, or when the job fails)
+    upload_path: Optional[str] = None
+    upload_content_type: Optional[str] = Field(default=None, max_length=128)
+    upload_sha256: Optional[str] = Field(default=None, max_length=64)
+    result: Optional[str] = None
+    error: Optional[str] = None
+    run_after: datetime
+    locked_by: Optional[str] = Field(default=None, max_length=64)
+    locked_until: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
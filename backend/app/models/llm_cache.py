@@ -0,0 +1,16 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+class LLMParseCacheEntry(SQLModel, table=True):
+    """Persisted LLM parse result, keyed by sha256(normalized text, model, prompt version).
+
+    `spec` is the parsed spec as JSON text. Rows past `expires_at` are ignored and pruned.
+    """
+    __tablename__ = "llm_parse_cache"
+
+    key: str = Field(primary_key=True, max_length=64)
+    model: str = Field(max_length=128)
+    prompt_version: str = Field(max_length=64)
+    spec: str
+    created_at: datetime = Field(index=True)
+    expires_at: datetime = Field(index=True)
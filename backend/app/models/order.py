@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from typing import Optional, List
 from sqlmodel import SQLModel, Field
 
@@ -12,11 +13,14 @@ class Order(SQLModel, table=True):
     finishing: Optional[str]
     turnaround_days: Optional[int]
     rush: Optional[bool]
-    status: Optional[str]
+    # indexed: dashboard aggregates and n8n/CSR lookups filter and group on it
+    status: Optional[str] = Field(default=None, index=True)
     final_price: Optional[float]
     issues: Optional[str]
     # optional customer email (may be populated by frontend or workflow)
-    email: Optional[str]
+    email: Optional[str] = Field(default=None, index=True)
+    # UTC creation time; drives the dashboard date-range filters
+    created_at: Optional[datetime] = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
 
 class OrderCreate(SQLModel):
     raw_text: str
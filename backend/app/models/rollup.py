@@ -0,0 +1,14 @@
+from datetime import date
+from sqlmodel import SQLModel, Field
+
+class OrderRollup(SQLModel, table=True):
+    """Per-day, per-status order counters maintained incrementally on every order write.
+
+    `day` is the UTC date of the order's `created_at`; orders without a status are counted under "unknown".
+    """
+    __tablename__ = "order_rollup"
+
+    day: date = Field(primary_key=True)
+    status: str = Field(primary_key=True, max_length=64)
+    order_count: int = 0
+    revenue: float = 0.0
@@ -0,0 +1,166 @@
+"""Circuit breaker for the LLM provider.
+
+When the provider is down or slow, every request would otherwise wait out its timeout before
+falling back to the deterministic parser. The breaker watches the outcome of the last
+`LLM_BREAKER_WINDOW` calls; once at least `LLM_BREAKER_MIN_CALLS` have been seen and the share of
+failures reaches `LLM_BREAKER_FAILURE_RATE`, it opens and callers skip the LLM immediately. A
+call counts as failed when it times out, hits a transport error or retryable status, or takes
+longer than `LLM_BREAKER_SLOW_SECONDS` (even if it succeeds). After `LLM_BREAKER_OPEN_SECONDS`
+the breaker is half-open: one probe call at a time goes through; a success closes it, a failure
+opens it again.
+
+The breaker also keeps recent successful call latencies, which hedge mode uses for its p95 budget.
+"""
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LLM_BREAKER_ENABLED = os.getenv("LLM_BREAKER_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "10"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a sliding window of call outcomes. Thread-safe.
+
+    Callers ask `allow()` before a call and pass the start time it returns to `record_success`,
+    `record_failure` or `record_neutral` (finished without saying anything about provider health,
+    e.g. cancelled or rejected as a bad request). Outcomes of calls started before the last state
+    change are ignored, so a straggler cannot close or reopen the breaker for the probe.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = LLM_BREAKER_WINDOW,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        failure_rate: float = LLM_BREAKER_FAILURE_RATE,
+        slow_seconds: float = LLM_BREAKER_SLOW_SECONDS,
+        open_seconds: float = LLM_BREAKER_OPEN_SECONDS,
+        enabled: bool = LLM_BREAKER_ENABLED,
+        latency_samples: int = 200,
+    ):
+        self.name = name
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # True = failed (error or slow)
+        self._outcomes: Deque[bool] = deque(maxlen=max(1, window))
+        self._latencies: Deque[float] = deque(maxlen=latency_samples)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._changed_at = 0.0
+        self._probe_in_flight = False
+        self.trips = 0
+        self.short_circuited = 0
+        self.probes = 0
+        self.slow_calls = 0
+
+    def allow(self) -> Optional[float]:
+        """Start time for a call that may go to the provider now, or None when it must not."""
+        if not self.enabled:
+            return time.monotonic()
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return time.monotonic()
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self.probes += 1
+                return time.monotonic()
+            self.short_circuited += 1
+            return None
+
+    def record_success(self, started: float) -> None:
+        seconds = time.monotonic() - started
+        slow = seconds > self.slow_seconds
+        with self._lock:
+            self._latencies.append(seconds)
+            if slow:
+                self.slow_calls += 1
+            self._record(started, failed=slow)
+
+    def record_failure(self, started: float) -> None:
+        with self._lock:
+            self._record(started, failed=True)
+
+    def record_neutral(self, started: float) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN and started >= self._changed_at:
+                self._probe_in_flight = False
+
+    def _record(self, started: float, failed: bool) -> None:
+        if not self.enabled or started < self._changed_at:
+            return
+        if self.state == HALF_OPEN and self._probe_in_flight:
+            self._probe_in_flight = False
+            if failed:
+                self._trip()
+            else:
+                self._outcomes.clear()
+                self._transition(CLOSED)
+            return
+        if self.state != CLOSED:
+            return
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls and self._failure_ratio() >= self.failure_rate:
+            self._trip()
+
+    def _trip(self) -> None:
+        self.trips += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            log = logger.warning if state == OPEN else logger.info
+            log("Circuit breaker %s: %s -> %s", self.name, self.state, state)
+            self.state = state
+            self._changed_at = time.monotonic()
+
+    def _failure_ratio(self) -> float:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def latency_quantile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """Quantile of recent successful call latencies (seconds), None until `min_samples` calls."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency_quantile(0.95, min_samples=1)
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "state": self.state,
+                "window_calls": len(self._outcomes),
+                "window_failure_rate": round(self._failure_ratio(), 4),
+                "trips": self.trips,
+                "short_circuited": self.short_circuited,
+                "probes": self.probes,
+                "slow_calls": self.slow_calls,
+                "open_for_seconds": round(time.monotonic() - self._opened_at, 3) if self.state == OPEN else None,
+                "latency_p95_seconds": round(p95, 6) if p95 is not None else None,
+            }
+
+
+llm_breaker = CircuitBreaker("llm")
@@ -0,0 +1,58 @@
+"""Shared parse -> validate -> price -> decide steps used by the single and batch estimate paths."""
+from typing import Any, Dict, Optional
+
+from app.services.llm_parser import LLMSpecParser
+from app.services.pricing import PriceEngine
+from app.services.validation import Validator
+
+
+def decide(parser: LLMSpecParser, spec: Dict[str, Any], validation: Dict[str, Any], raw_text: str) -> str:
+    """Respect validation by default; allow only explicit free-text overrides (send to ...)."""
+    override = parser.decide(spec, raw_text, full=False)
+    return override or validation.get("decision")
+
+
+def evaluate(parser: LLMSpecParser, spec: Dict[str, Any], raw_text: str) -> Dict[str, Any]:
+    """Validate, price and decide an already-parsed spec."""
+    validation = Validator().validate(spec, raw_text)
+    pricing = PriceEngine().estimate(spec)
+    return {
+        "spec": spec,
+        "validation": validation,
+        "pricing": pricing,
+        "decision": decide(parser, spec, validation, raw_text),
+    }
+
+
+def order_updates(result: Dict[str, Any], customer_email: Optional[str] = None) -> Dict[str, Any]:
+    """Column values persisted on the Order for an evaluated estimate."""
+    spec, validation, pricing = result["spec"], result["validation"], result["pricing"]
+    updates = {
+        "product_type": spec.get("product_type"),
+        "quantity": spec.get("quantity"),
+        "size": spec.get("size"),
+        "paper_type": spec.get("paper_type"),
+        "color": spec.get("color"),
+        "finishing": ",".join(spec.get("finishing") or []),
+        "turnaround_days": spec.get("turnaround_days"),
+        "rush": bool(spec.get("rush", False)),
+        "final_price": pricing.get("final_price"),
+        "issues": ",".join(validation.get("issues") or []),
+        "status": result["decision"],
+    }
+    if customer_email:
+        updates["email"] = customer_email
+    return updates
+
+
+def workflow_payload(order_id: int, result: Dict[str, Any], customer_email: Optional[str] = None) -> Dict[str, Any]:
+    """Summary payload sent to the n8n workflow webhook."""
+    payload = {
+        "order_id": order_id,
+        "decision": result["decision"],
+        "price": result["pricing"].get("final_price"),
+        "issues": result["validation"].get("issues"),
+    }
+    if customer_email:
+        payload["email"] = customer_email
+    return payload
@@ -0,0 +1,290 @@
+"""Content-addressed cache of document extraction results (PDF text, image OCR).
+
+Artwork PDFs and scans come back again and again: reorders, resends by email, CSR re-uploads.
+Results are cached by sha256(upload sha256, extractor version), in-process (LRU bounded by
+`EXTRACTION_CACHE_MEMORY_BYTES`) and in the `extraction_cache` table, shared by every worker
+and surviving restarts. The upload digest is computed while the upload is spooled, so a
+duplicate skips extraction entirely. The extractor version covers the extraction settings and
+library versions (`extractor_version()` in `app.utils.pdf_reader` / `app.utils.image_pipeline`):
+changing either moves lookups to new keys. Results without text are not stored: the extractors
+report a failed read (corrupt PDF, missing tesseract, unreadable image) as empty text, and that
+must not stick to the upload's digest. Content-addressed entries never go stale, so there is
+no TTL; the table is trimmed to `EXTRACTION_CACHE_DB_MAX_BYTES` of results, least recently used
+first.
+
+    python -m app.services.extraction_cache prune   # trim to EXTRACTION_CACHE_DB_MAX_BYTES
+    python -m app.services.extraction_cache clear   # drop every row
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models.extraction_cache import ExtractionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Persist to the extraction_cache table (false: in-process tier only)
+EXTRACTION_CACHE_PERSIST = os.getenv("EXTRACTION_CACHE_PERSIST", "true").lower() in ("1", "true", "yes")
+EXTRACTION_CACHE_MEMORY_BYTES = int(os.getenv("EXTRACTION_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+EXTRACTION_CACHE_DB_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_DB_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Prune the table after this many stores (per process)
+EXTRACTION_CACHE_PRUNE_EVERY = int(os.getenv("EXTRACTION_CACHE_PRUNE_EVERY", "200"))
+
+
+def extraction_key(content_sha256: str, extractor: str) -> str:
+    return hashlib.sha256(f"{content_sha256}\x00{extractor}".encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """In-process LRU (bounded by result bytes) in front of the extraction_cache table. Thread-safe.
+
+    Values are dicts stored as JSON text and decoded on every hit. Database errors are logged and
+    treated as misses: the cache never fails an upload.
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int = EXTRACTION_CACHE_MEMORY_BYTES,
+        persist: bool = EXTRACTION_CACHE_PERSIST,
+        db_max_bytes: int = EXTRACTION_CACHE_DB_MAX_BYTES,
+        prune_every: int = EXTRACTION_CACHE_PRUNE_EVERY,
+        enabled: bool = EXTRACTION_CACHE_ENABLED,
+    ):
+        self.memory_bytes = memory_bytes
+        self.persist = persist
+        self.db_max_bytes = db_max_bytes
+        self.prune_every = prune_every
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stores_since_prune = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.not_stored = 0
+        self.evictions = 0
+        self.pruned = 0
+        self.errors = 0
+        self.seconds_saved = 0.0
+
+    def _incr(self, name: str, amount: Any = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _remember(self, key: str, value: str) -> None:
+        size = len(value)
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.memory_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+            return value
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result for `key`; memory hits stay on the loop, database lookups run in a thread."""
+        value = self._memory_get(key)
+        if value is None and self.persist:
+            value = await asyncio.to_thread(self._db_get, key)
+        if value is None:
+            self._incr("misses")
+            return None
+        result = json.loads(value)
+        self._incr("seconds_saved", result.get("seconds") or 0.0)
+        return result
+
+    async def aput(self, key: str, content_sha256: str, extractor: str, result: Dict[str, Any]) -> None:
+        value = json.dumps(result, sort_keys=True)
+        self._remember(key, value)
+        self._incr("stores")
+        if self.persist:
+            await asyncio.to_thread(self._db_put, key, content_sha256, extractor, value)
+
+    async def get_or_extract(
+        self, content_sha256: str, extractor: str, extract: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """(result, hit): the cached result for this upload and extractor, or `extract()`'s, stored.
+
+        The extraction's duration is stored with the result (`seconds`) and counted as saved on
+        later hits. Results with empty text are returned but not stored, so the next upload retries.
+        """
+        if not self.enabled:
+            return await extract(), False
+        key = extraction_key(content_sha256, extractor)
+        cached = await self.aget(key)
+        if cached is not None:
+            return cached, True
+        started = time.perf_counter()
+        result = await extract()
+        result["seconds"] = round(time.perf_counter() - started, 6)
+        if not (result.get("text") or "").strip():
+            self._incr("not_stored")
+            return result, False
+        await self.aput(key, content_sha256, extractor, result)
+        return result, False
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _db_get(self, key: str) -> Optional[str]:
+        from app.db.session import get_session
+
+        try:
+            with get_session() as session:
+                value = session.execute(
+                    select(ExtractionCacheEntry.result).where(ExtractionCacheEntry.key == key)
+                ).scalar_one_or_none()
+                if value is not None:
+                    session.execute(
+                        update(ExtractionCacheEntry)
+                        .where(ExtractionCacheEntry.key == key)
+                        .values(last_used_at=datetime.now(timezone.utc))
+                    )
+                    session.commit()
+        except Exception as e:
+            self._incr("errors")
+            logger.warning("Extraction cache lookup failed: %s", e)
+            return None
+        if value is None:
+            return None
+        self._remember(key, value)
+        self._incr("db_hits")
+        return value
+
+    def _db_put(self, key: str, content_sha256: str, extractor: str, value: str) -> None:
+        from app.db.session import get_session
+
+        now = datetime.now(timezone.utc)
+        row = {
+            "key": key,
+            "content_sha256": content_sha256,
+            "extractor": extractor,
+            "result": value,
+            "result_bytes": len(value.encode("utf-8")),
+            "created_at": now,
+            "last_used_at": now,
+        }
+        try:
+            with get_session() as session:
+                dialect = sqlite if session.get_bind().dialect.name == "sqlite" else postgresql
+                stmt = dialect.insert(ExtractionCacheEntry).values(**row)
+                session.execute(stmt.on_conflict_do_update(
+                    index_elements=[ExtractionCacheEntry.key],
+                    set_={
+                        "result": stmt.excluded.result,
+                        "result_bytes": stmt.excluded.result_bytes,
+                        "last_used_at": stmt.excluded.last_used_at,
+                    },
+                ))
+                session.commit()
+        except Exception as e:
+            self._incr("errors")
+            logger.warning("Extraction cache store failed: %s", e)
+            return
+
+        with self._lock:
+            self._stores_since_prune += 1
+            due = self._stores_since_prune >= self.prune_every
+            if due:
+                self._stores_since_prune = 0
+        if due:
+            try:
+                with get_session() as session:
+                    self._incr("pruned", prune(session, self.db_max_bytes))
+            except Exception as e:
+                self._incr("errors")
+                logger.warning("Extraction cache prune failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "persist": self.persist,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "max_memory_bytes": self.memory_bytes,
+                "db_max_bytes": self.db_max_bytes,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else None,
+                "stores": self.stores,
+                "not_stored": self.not_stored,
+                "evictions": self.evictions,
+                "pruned": self.pruned,
+                "errors": self.errors,
+                "extraction_seconds_saved": round(self.seconds_saved, 3),
+            }
+
+
+def prune(session, max_bytes: int = EXTRACTION_CACHE_DB_MAX_BYTES) -> int:
+    """Delete least recently used rows until results total at most `max_bytes`. Returns rows deleted."""
+    total = session.execute(select(func.coalesce(func.sum(ExtractionCacheEntry.result_bytes), 0))).scalar_one()
+    if total <= max_bytes:
+        return 0
+    # Running total from the most recently used row; rows past the budget go
+    running = (
+        select(
+            ExtractionCacheEntry.key,
+            func.sum(ExtractionCacheEntry.result_bytes)
+            .over(order_by=(ExtractionCacheEntry.last_used_at.desc(), ExtractionCacheEntry.key))
+            .label("running"),
+        )
+        .subquery()
+    )
+    over_budget = select(running.c.key).where(running.c.running > max_bytes)
+    deleted = session.execute(
+        delete(ExtractionCacheEntry).where(ExtractionCacheEntry.key.in_(over_budget))
+    ).rowcount or 0
+    session.commit()
+    return deleted
+
+
+extraction_cache = ExtractionCache()
+
+
+if __name__ == "__main__":
+    from app.db.session import get_session
+
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1:]
+    if command not in (["prune"], ["clear"]):
+        print("usage: python -m app.services.extraction_cache prune|clear", file=sys.stderr)
+        sys.exit(2)
+    with get_session() as s:
+        if command == ["prune"]:
+            removed = prune(s)
+        else:
+            removed = s.execute(delete(ExtractionCacheEntry)).rowcount or 0
+            s.commit()
+    logger.info("Removed %s extraction_cache rows", removed)
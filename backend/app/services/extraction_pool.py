@@ -0,0 +1,304 @@
+"""Process pool for document extraction (PDF text, image OCR) off the event loop.
+
+pdfminer and tesseract are CPU-bound and hold the GIL (or a subprocess) for seconds on large
+uploads; run inline in `async def intake_order` they stall every other request on the worker.
+Jobs here run on `EXTRACTION_WORKERS` worker processes (started with `spawn`, so nothing of the
+server's threads or connections is inherited), each running one job at a time:
+
+- Each worker process is replaced after `EXTRACTION_MAX_TASKS_PER_CHILD` jobs, which bounds
+  pdfminer's memory growth.
+- At most `EXTRACTION_QUEUE_MAX` jobs may be running or waiting; beyond that `ExtractionBusy` is
+  raised (intake answers 503 with `Retry-After`) instead of letting uploads pile up in memory.
+- A job that runs longer than `EXTRACTION_TIMEOUT` seconds raises `ExtractionTimeout`. The clock
+  starts when the job is handed to an idle, started worker, so time spent waiting for a worker
+  or for a process to spawn does not count. A running process cannot be interrupted, so the
+  worker that overran is killed and replaced; the other workers and their jobs are not touched.
+  A job whose worker process dies under it is resubmitted once.
+
+`EXTRACTION_WORKERS=0` runs jobs in the default thread pool instead (no process isolation or
+recycling; timed-out jobs keep running in their thread).
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from app.services.extraction_cache import extraction_cache
+from app.utils import image_pipeline, pdf_reader
+from app.utils.image_pipeline import ImageAnalysis, analyze_image
+from app.utils.pdf_reader import extract_text_from_pdf
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+EXTRACTION_MAX_TASKS_PER_CHILD = int(os.getenv("EXTRACTION_MAX_TASKS_PER_CHILD", "50"))
+EXTRACTION_QUEUE_MAX = int(os.getenv("EXTRACTION_QUEUE_MAX", str(4 * max(EXTRACTION_WORKERS, 1))))
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "60"))
+EXTRACTION_RETRY_AFTER = int(os.getenv("EXTRACTION_RETRY_AFTER", "5"))
+
+
+class ExtractionBusy(Exception):
+    """Too many extraction jobs queued; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int = EXTRACTION_RETRY_AFTER):
+        super().__init__(f"extraction queue full; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+class UnsupportedDocument(ValueError):
+    pass
+
+
+def _pdf_job(source: Union[bytes, str]) -> str:
+    return extract_text_from_pdf(source)
+
+
+def _image_job(source: Union[bytes, str]) -> ImageAnalysis:
+    return analyze_image(source)
+
+
+def _ready() -> int:
+    # First call in a new worker: imports this module (and the extractors) before any job is timed
+    return os.getpid()
+
+
+class _Worker:
+    """One worker process: a single-process executor, replaced after a timeout or `max_tasks` jobs."""
+
+    def __init__(self):
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.pid: Optional[int] = None
+        self.tasks = 0
+
+    async def start(self) -> None:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            self.tasks = 0
+            try:
+                self.pid = await asyncio.wrap_future(self.executor.submit(_ready))
+            except BaseException:
+                self.stop(kill=True)
+                raise
+
+    def stop(self, kill: bool) -> None:
+        executor, self.executor, self.pid = self.executor, None, None
+        if executor is None:
+            return
+        if kill:
+            # Private, but the only handle on a process busy with a job that will never be collected
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ExtractionPool:
+    def __init__(
+        self,
+        workers: int = EXTRACTION_WORKERS,
+        max_tasks_per_child: int = EXTRACTION_MAX_TASKS_PER_CHILD,
+        queue_max: int = EXTRACTION_QUEUE_MAX,
+        timeout: float = EXTRACTION_TIMEOUT,
+    ):
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.queue_max = max(1, queue_max)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._workers = [_Worker() for _ in range(max(workers, 0))]
+        self._idle: List[_Worker] = list(self._workers)
+        # Callers waiting for an idle worker, from any event loop
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self.pending = 0
+        self.max_pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.recycled = 0
+        self.resubmitted = 0
+        self.seconds_total = 0.0
+
+    async def _acquire(self) -> _Worker:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, waiter))
+                except ValueError:
+                    # A worker is already on its way to this waiter; _hand_over passes it on
+                    pass
+            raise
+
+    def _release(self, worker: _Worker) -> None:
+        with self._lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(self._hand_over, waiter, worker)
+                    return
+            self._idle.append(worker)
+
+    def _hand_over(self, waiter: asyncio.Future, worker: _Worker) -> None:
+        if waiter.done():
+            self._release(worker)
+        else:
+            waiter.set_result(worker)
+
+    async def _run_on(self, worker: _Worker, fn: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+        for attempt in range(2):
+            await worker.start()
+            future = worker.executor.submit(fn, *args)
+            try:
+                result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Extraction job overran %gs; replacing worker pid=%s", self.timeout, worker.pid)
+                worker.stop(kill=True)
+                with self._lock:
+                    self.timeouts += 1
+                    self.restarts += 1
+                raise ExtractionTimeout(f"extraction took longer than {self.timeout:g}s")
+            except BrokenProcessPool:
+                # The worker process died under the job (crash, OOM kill)
+                worker.stop(kill=True)
+                with self._lock:
+                    self.restarts += 1
+                if attempt:
+                    raise
+                with self._lock:
+                    self.resubmitted += 1
+                continue
+            except BaseException:
+                # Cancelled caller: the job would keep this worker busy, so the next job's clock
+                # would include the rest of it
+                if not future.done():
+                    worker.stop(kill=True)
+                    with self._lock:
+                        self.restarts += 1
+                raise
+            worker.tasks += 1
+            if self.max_tasks_per_child and worker.tasks >= self.max_tasks_per_child:
+                worker.stop(kill=False)
+                with self._lock:
+                    self.recycled += 1
+            return result
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` on a worker within the job timeout (counted from when the job starts)."""
+        with self._lock:
+            if self.pending >= self.queue_max:
+                self.rejected += 1
+                raise ExtractionBusy()
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+            self.submitted += 1
+        started = time.perf_counter()
+        try:
+            if not self._workers:
+                loop = asyncio.get_running_loop()
+                try:
+                    result = await asyncio.wait_for(loop.run_in_executor(None, fn, *args), self.timeout)
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise ExtractionTimeout(f"extraction took longer than {self.timeout:g}s")
+            else:
+                worker = await self._acquire()
+                try:
+                    result = await self._run_on(worker, fn, args)
+                finally:
+                    self._release(worker)
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.seconds_total += time.perf_counter() - started
+        with self._lock:
+            self.completed += 1
+        return result
+
+    async def extract_pdf(self, source: Union[bytes, str]) -> str:
+        """Text of a PDF; pass a file path rather than bytes to avoid copying the document to the worker."""
+        return await self.run(_pdf_job, source)
+
+    async def extract_image(self, source: Union[bytes, str]) -> ImageAnalysis:
+        """OCR text, DPI and timings of an image (file path or bytes), decoded once."""
+        return await self.run(_image_job, source)
+
+    def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.stop(kill=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_tasks_per_child": self.max_tasks_per_child,
+                "queue_max": self.queue_max,
+                "timeout_seconds": self.timeout,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+                "recycled": self.recycled,
+                "resubmitted": self.resubmitted,
+                "seconds_total": round(self.seconds_total, 6),
+            }
+
+
+extraction_pool = ExtractionPool()
+
+
+def is_supported(content_type: Optional[str]) -> bool:
+    return content_type == "application/pdf" or (content_type or "").startswith("image/")
+
+
+async def extract_document(path: str, sha256: str, content_type: Optional[str]) -> Tuple[str, List[str]]:
+    """Text of a spooled upload (PDF or image) and the intake issues it raises (`low_resolution`).
+
+    Extraction runs in the pool; repeat uploads of the same bytes are answered from the extraction
+    cache. Raises UnsupportedDocument for other content types, and ExtractionBusy /
+    ExtractionTimeout from the pool.
+    """
+    async def extract_pdf() -> Dict[str, Any]:
+        return {"text": await extraction_pool.extract_pdf(path)}
+
+    async def extract_image() -> Dict[str, Any]:
+        analysis = await extraction_pool.extract_image(path)
+        logger.debug("Image size=%s ocr_size=%s timings_ms=%s", analysis.size, analysis.ocr_size, analysis.timings_ms)
+        return {"text": analysis.text, "dpi": list(analysis.dpi)}
+
+    if content_type == "application/pdf":
+        result, hit = await extraction_cache.get_or_extract(sha256, pdf_reader.extractor_version(), extract_pdf)
+        logger.debug("Extracted %d chars from PDF (cached=%s)", len(result["text"]), hit)
+        return result["text"], []
+    if is_supported(content_type):
+        result, hit = await extraction_cache.get_or_extract(sha256, image_pipeline.extractor_version(), extract_image)
+        logger.debug("Image DPI=%s (cached=%s)", result["dpi"], hit)
+        return result["text"], ["low_resolution"] if min(result["dpi"]) < 300 else []
+    raise UnsupportedDocument(f"Unsupported file type: {content_type}")
@@ -0,0 +1,435 @@
+"""Asynchronous intake-to-estimate jobs, queued in the database.
+
+`POST /intake/order?estimate=async` stores the order and an `estimate_job` row in one transaction
+and answers 202. Workers then run the pipeline
+
+    extract -> parse -> validate -> price -> persist -> notify
+
+recording each stage's progress on the job (`GET /jobs/{id}`). The table is the queue: workers
+claim the oldest due job with SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers (in
+the API processes, or `python -m app.services.jobs`) share it without a broker and never take
+the same job. A claimed job holds a lease (`JOBS_LEASE_SECONDS`, renewed at every stage); if its
+worker dies, the lease runs out and another worker claims the job again. Failed attempts are
+retried after `JOBS_RETRY_SECONDS` × attempt, up to `JOBS_MAX_ATTEMPTS`. SQLite has no row
+locks; there a compare-and-set UPDATE alone keeps two workers from claiming the same job.
+
+The stages reuse the synchronous estimate's pieces (`app.services.estimation`), so both paths
+write the same order updates and workflow payloads. Uploads are extracted by the job: intake
+spools the file and the worker reads it, so standalone workers need the API's `UPLOAD_TMP_DIR`.
+
+    python -m app.services.jobs [workers]   # run workers outside the API processes
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+from sqlalchemy import and_, or_, select, update
+
+from app.models.job import EstimateJob
+from app.models.order import Order
+from app.services import estimation, rollups
+from app.services.extraction_pool import extract_document
+from app.services.llm_parser import LLMSpecParser
+from app.services.pricing import PriceEngine
+from app.services.response_cache import invalidate_orders
+from app.services.uploads import SpooledUpload, remove_spooled
+from app.services.validation import Validator
+from app.services.workflow import WorkflowClient
+
+logger = logging.getLogger(__name__)
+
+# Job workers per API process (0: run `python -m app.services.jobs` instead)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "1"))
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "300"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_RETRY_SECONDS = float(os.getenv("JOBS_RETRY_SECONDS", "10"))
+
+STAGES = ("extract", "parse", "validate", "price", "persist", "notify")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobFailed(Exception):
+    """A job that cannot succeed on retry (e.g. its order is gone)."""
+
+
+class LeaseLost(Exception):
+    """Another worker took the job over after this worker's lease ran out."""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def new_job(
+    order_id: int,
+    customer_email: Optional[str] = None,
+    upload: Optional[SpooledUpload] = None,
+    content_type: Optional[str] = None,
+) -> EstimateJob:
+    now = _now()
+    return EstimateJob(
+        order_id=order_id,
+        status=QUEUED,
+        stages="{}",
+        customer_email=customer_email,
+        upload_path=upload.path if upload else None,
+        upload_content_type=content_type if upload else None,
+        upload_sha256=upload.sha256 if upload else None,
+        run_after=now,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def job_view(job: EstimateJob) -> Dict[str, Any]:
+    """Response body of GET /jobs/{id}: status, per-stage progress and, once succeeded, the estimate."""
+    recorded = json.loads(job.stages or "{}")
+    return {
+        "job_id": job.id,
+        "order_id": job.order_id,
+        "status": job.status,
+        "stage": job.stage,
+        "attempts": job.attempts,
+        "stages": [dict({"name": name, "status": "pending"}, **recorded.get(name, {})) for name in STAGES],
+        "error": job.error,
+        "result": json.loads(job.result) if job.result else None,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class JobStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.claimed = 0
+        self.reclaimed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.lease_lost = 0
+        self.running = 0
+        self.stage_runs = {name: 0 for name in STAGES}
+        self.stage_seconds = {name: 0.0 for name in STAGES}
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_runs[name] += 1
+            self.stage_seconds[name] += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.running,
+                "claimed": self.claimed,
+                "reclaimed": self.reclaimed,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "retried": self.retried,
+                "lease_lost": self.lease_lost,
+                "stage_runs": dict(self.stage_runs),
+                "stage_seconds_total": {name: round(s, 6) for name, s in self.stage_seconds.items()},
+            }
+
+
+class _JobRun:
+    """One attempt at a claimed job. Progress writes are fenced on `locked_by`.
+
+    A rollback expires `job`, and reloading it lazily is not possible on an AsyncSession, so the
+    columns needed after one are copied here.
+    """
+
+    def __init__(self, workers: "JobWorkers", session, job: EstimateJob, worker_id: str):
+        self.workers = workers
+        self.session = session
+        self.job = job
+        self.job_id = job.id
+        self.attempts = job.attempts
+        self.upload_path = job.upload_path
+        self.worker_id = worker_id
+        self.stages: Dict[str, Dict[str, Any]] = json.loads(job.stages or "{}")
+        self.current: Optional[str] = None
+
+    async def _save(self, **values: Any) -> None:
+        now = _now()
+        values.setdefault("locked_until", now + timedelta(seconds=self.workers.lease_seconds))
+        values.update(stages=json.dumps(self.stages), updated_at=now)
+        result = await self.session.execute(
+            update(EstimateJob)
+            .where(EstimateJob.id == self.job_id, EstimateJob.locked_by == self.worker_id)
+            .values(**values)
+        )
+        if result.rowcount == 0:
+            await self.session.rollback()
+            raise LeaseLost(f"job {self.job_id} was taken over")
+        await self.session.commit()
+
+    @asynccontextmanager
+    async def stage(self, name: str) -> AsyncIterator[Dict[str, Any]]:
+        """Run a stage: marked running, then done with its duration (committed with the stage's writes)."""
+        self.current = name
+        entry = {"status": "running", "started_at": _now().isoformat()}
+        self.stages[name] = entry
+        await self._save(stage=name)
+        started = time.perf_counter()
+        try:
+            yield entry
+        except BaseException:
+            entry.update(status="failed", seconds=round(time.perf_counter() - started, 6))
+            raise
+        seconds = time.perf_counter() - started
+        entry.update(status="done", seconds=round(seconds, 6))
+        self.workers.job_stats.record_stage(name, seconds)
+        await self._save(stage=name)
+
+    async def run(self) -> None:
+        job, session = self.job, self.session
+        order = await session.get(Order, job.order_id)
+        if order is None:
+            raise JobFailed("Order not found")
+        raw_text = order.raw_text or ""
+
+        if job.upload_path and self.stages.get("extract", {}).get("status") != "done":
+            async with self.stage("extract") as entry:
+                text, issues = await extract_document(job.upload_path, job.upload_sha256, job.upload_content_type)
+                raw_text += "\n" + text
+                order.raw_text = raw_text
+                session.add(order)
+                entry.update(chars=len(text), issues=issues)
+            remove_spooled(job.upload_path)
+        elif "extract" not in self.stages:
+            self.stages["extract"] = {"status": "skipped"}
+
+        parser = LLMSpecParser()
+        async with self.stage("parse") as entry:
+            spec = await parser.aparse(raw_text)
+            if not isinstance(spec, dict):
+                raise JobFailed("LLM parser failed to return JSON")
+            entry["fields"] = {k: spec.get(k) for k in ("product_type", "quantity", "size")}
+
+        async with self.stage("validate") as entry:
+            validation = Validator().validate(spec, raw_text)
+            decision = estimation.decide(parser, spec, validation, raw_text)
+            entry.update(decision=decision, issues=validation.get("issues"))
+
+        async with self.stage("price") as entry:
+            pricing = PriceEngine().estimate(spec)
+            entry["final_price"] = pricing.get("final_price")
+        result = {"spec": spec, "validation": validation, "pricing": pricing, "decision": decision}
+
+        async with self.stage("persist"):
+            order = await rollups.lock_order(session, job.order_id)
+            if order is None:
+                raise JobFailed("Order not found")
+            before = rollups.snapshot(order)
+            for name, value in estimation.order_updates(result, job.customer_email).items():
+                setattr(order, name, value)
+            session.add(order)
+            await rollups.record_change(session, order, before)
+        invalidate_orders()
+
+        async with self.stage("notify") as entry:
+            payload = estimation.workflow_payload(order.id, result, job.customer_email)
+            # WorkflowClient retries with blocking sleeps; a failed delivery does not fail the job
+            entry["delivered"] = await asyncio.to_thread(WorkflowClient().trigger, payload)
+
+        await self._save(
+            status=SUCCEEDED, result=json.dumps(result, default=str), error=None,
+            finished_at=_now(), locked_by=None, locked_until=None,
+        )
+
+    async def fail(self, error: Exception) -> bool:
+        """Record a failed attempt: requeue with backoff, or fail for good. True when requeued."""
+        await self.session.rollback()
+        retry = not isinstance(error, JobFailed) and self.attempts < self.workers.max_attempts
+        message = f"{self.current or 'start'}: {type(error).__name__}: {error}"
+        now = _now()
+        values: Dict[str, Any] = {"status": QUEUED if retry else FAILED, "error": message, "locked_by": None, "locked_until": None}
+        if retry:
+            values["run_after"] = now + timedelta(seconds=self.workers.retry_seconds * self.attempts)
+        else:
+            values["finished_at"] = now
+            remove_spooled(self.upload_path)
+        await self._save(**values)
+        return retry
+
+
+class JobWorkers:
+    """Pool of asyncio worker tasks claiming and running estimate jobs."""
+
+    def __init__(
+        self,
+        workers: int = JOBS_WORKERS,
+        poll_seconds: float = JOBS_POLL_SECONDS,
+        lease_seconds: float = JOBS_LEASE_SECONDS,
+        max_attempts: int = JOBS_MAX_ATTEMPTS,
+        retry_seconds: float = JOBS_RETRY_SECONDS,
+    ):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.retry_seconds = retry_seconds
+        self.job_stats = JobStats()
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        if self.workers <= 0 or self._tasks:
+            return
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n), name=f"estimate-job-{n}") for n in range(self.workers)]
+        logger.info("Started %s estimate job workers", self.workers)
+
+    async def stop(self) -> None:
+        """Cancel the workers. Jobs they were running are claimed again once their lease runs out."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def join(self) -> None:
+        await asyncio.gather(*self._tasks)
+
+    def wake(self) -> None:
+        """Let idle workers poll now (a job was just queued in this process)."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _worker(self, n: int) -> None:
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{n}"[:64]
+        while True:
+            try:
+                ran = await self.run_once(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Estimate job worker %s error: %s", worker_id, e)
+                ran = False
+            if not ran:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _claim(self, session, worker_id: str) -> Optional[EstimateJob]:
+        now = _now()
+        job = (await session.execute(
+            select(EstimateJob)
+            .where(or_(
+                and_(EstimateJob.status == QUEUED, EstimateJob.run_after <= now),
+                # Lease ran out: the worker running it died
+                and_(EstimateJob.status == RUNNING, EstimateJob.locked_until < now),
+            ))
+            .order_by(EstimateJob.run_after, EstimateJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )).scalars().first()
+        if job is None:
+            await session.rollback()
+            return None
+        expired = job.status == RUNNING
+        if expired and job.attempts >= self.max_attempts:
+            values: Dict[str, Any] = {
+                "status": FAILED, "error": "worker lost (lease expired)", "finished_at": now,
+                "locked_by": None, "locked_until": None, "updated_at": now,
+            }
+        else:
+            values = {
+                "status": RUNNING, "locked_by": worker_id, "attempts": job.attempts + 1, "updated_at": now,
+                "locked_until": now + timedelta(seconds=self.lease_seconds),
+            }
+        # Compare-and-set on what was read: a no-op under SKIP LOCKED, the guard against a
+        # concurrent claim on SQLite (no row locks)
+        claimed = await session.execute(
+            update(EstimateJob)
+            .where(EstimateJob.id == job.id, EstimateJob.status == job.status, EstimateJob.attempts == job.attempts)
+            .values(**values)
+        )
+        if claimed.rowcount == 0:
+            await session.rollback()
+            return None
+        await session.commit()
+        if expired:
+            self.job_stats.incr("reclaimed")
+            logger.warning("Reclaimed estimate job id=%s from %s (lease expired)", job.id, job.locked_by)
+        if values["status"] == FAILED:
+            remove_spooled(job.upload_path)
+            self.job_stats.incr("failed")
+            return None
+        await session.refresh(job)
+        self.job_stats.incr("claimed")
+        return job
+
+    async def run_once(self, worker_id: str) -> bool:
+        """Claim and run one due job. False when there was none."""
+        from app.db.session import get_async_session
+
+        async with get_async_session() as session:
+            job = await self._claim(session, worker_id)
+            if job is None:
+                return False
+            run = _JobRun(self, session, job, worker_id)
+            self.job_stats.incr("running")
+            try:
+                await run.run()
+                self.job_stats.incr("succeeded")
+                logger.info("Estimate job id=%s order_id=%s succeeded (attempt %s)", job.id, job.order_id, job.attempts)
+            except LeaseLost as e:
+                self.job_stats.incr("lease_lost")
+                logger.warning("Estimate job id=%s abandoned: %s", run.job_id, e)
+            except Exception as e:
+                logger.exception("Estimate job id=%s failed at %s: %s", run.job_id, run.current, e)
+                try:
+                    requeued = await run.fail(e)
+                except LeaseLost:
+                    self.job_stats.incr("lease_lost")
+                else:
+                    self.job_stats.incr("retried" if requeued else "failed")
+            finally:
+                self.job_stats.incr("running", -1)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            {"workers": len(self._tasks), "max_attempts": self.max_attempts, "lease_seconds": self.lease_seconds},
+            **self.job_stats.stats(),
+        )
+
+
+job_workers = JobWorkers()
+
+
+if __name__ == "__main__":
+    from app.db.session import dispose_engines
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def main() -> None:
+        workers = JobWorkers(workers=int(sys.argv[1]) if len(sys.argv) > 1 else max(JOBS_WORKERS, 1))
+        await workers.start()
+        try:
+            await workers.join()
+        finally:
+            await workers.stop()
+            await dispose_engines()
+
+    asyncio.run(main())
@@ -0,0 +1,361 @@
+"""Async LLM client used by the API request path.
+
+One pooled `httpx.AsyncClient` per process (per event loop) talks to an OpenAI-compatible
+`/chat/completions` endpoint. A semaphore caps in-flight calls (excess callers queue), each
+attempt has its own timeout, and the whole call (queueing + retries) has a total deadline, so
+a slow or hung completion can only ever cost a request `LLM_TOTAL_TIMEOUT` seconds and never
+blocks the event loop. Calls go through the circuit breaker in `app.services.circuit_breaker`:
+while the provider is failing or slow, they fail fast with `LLMCircuitOpen`.
+
+Test clients with the older `chat(messages)` / `complete(prompt)` / callable shape plug into the
+same interface through `LegacyClientAdapter`. For local runs and load tests, point
+`OPENAI_BASE_URL` at the stub server in `app.services.llm_stub`.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import inspect
+import logging
+import os
+import threading
+import time
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+from app.services.circuit_breaker import CircuitBreaker, llm_breaker
+
+logger = logging.getLogger(__name__)
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+# Max concurrent in-flight LLM calls per process; further calls wait for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Per-attempt timeout and overall deadline (queueing + retries), seconds
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_TOTAL_TIMEOUT = float(os.getenv("LLM_TOTAL_TIMEOUT", "45"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", str(max(LLM_MAX_CONCURRENCY, 1) * 2)))
+LLM_POOL_KEEPALIVE = int(os.getenv("LLM_POOL_KEEPALIVE", str(max(LLM_MAX_CONCURRENCY, 1))))
+
+# Retried (with backoff) while the total deadline allows; other 4xx fail immediately
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """An LLM call failed (transport error, bad status or unusable response)."""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class LLMTimeout(LLMError):
+    """An LLM call did not complete within its per-call or total deadline."""
+
+
+class LLMCircuitOpen(LLMError):
+    """The circuit breaker is open: the call was not attempted."""
+
+
+class LLMStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.short_circuited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queue_wait_seconds = 0.0
+        self.call_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def incr(self, name: str, amount: Any = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "timeouts": self.timeouts,
+                "retries": self.retries,
+                "short_circuited": self.short_circuited,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queue_wait_seconds_total": round(self.queue_wait_seconds, 6),
+                "call_seconds_total": round(self.call_seconds, 6),
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+
+class AsyncLLMClient:
+    """Chat-completions client with a shared connection pool, concurrency cap and deadlines."""
+
+    def __init__(
+        self,
+        base_url: str = OPENAI_BASE_URL,
+        api_key: Optional[str] = OPENAI_API_KEY,
+        model: str = OPENAI_MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT,
+        total_timeout: float = LLM_TOTAL_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        if httpx is None:
+            raise RuntimeError("httpx is required for AsyncLLMClient")
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.total_timeout = total_timeout
+        self.max_retries = max_retries
+        self.breaker = breaker or llm_breaker
+        self.stats = LLMStats()
+        # Pooled connections belong to the loop that opened them: one httpx client per loop, as
+        # (loop, client, task closing the client when the loop's tasks are cancelled)
+        self._http: Dict[int, Tuple[asyncio.AbstractEventLoop, "httpx.AsyncClient", "asyncio.Task"]] = {}
+        # Semaphores bind to the running loop; keep one per loop (tests may run several)
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+
+    def _client(self) -> "httpx.AsyncClient":
+        loop = asyncio.get_running_loop()
+        entry = self._http.get(id(loop))
+        if entry is not None and entry[0] is loop and not entry[1].is_closed:
+            return entry[1]
+        # A client can only be closed on its own loop; those of loops closed since are gone
+        for key, (other, _, _) in list(self._http.items()):
+            if other.is_closed():
+                del self._http[key]
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(
+                max_connections=LLM_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_POOL_KEEPALIVE,
+            ),
+        )
+        self._http[id(loop)] = (loop, http, loop.create_task(self._close_with_loop(http)))
+        return http
+
+    async def _close_with_loop(self, http: "httpx.AsyncClient") -> None:
+        # asyncio.run() cancels leftover tasks before it closes the loop: close the pool then
+        try:
+            await asyncio.get_running_loop().create_future()
+        finally:
+            await http.aclose()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        key = id(asyncio.get_running_loop())
+        sem = self._semaphores.get(key)
+        if sem is None:
+            sem = self._semaphores[key] = asyncio.Semaphore(self.max_concurrency)
+        return sem
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0,
+        timeout: Optional[float] = None,
+        total_timeout: Optional[float] = None,
+    ) -> str:
+        """Return the assistant message text. Raises LLMTimeout / LLMCircuitOpen / LLMError."""
+        started = self.breaker.allow()
+        if started is None:
+            self.stats.incr("short_circuited")
+            raise LLMCircuitOpen("LLM circuit breaker is open")
+        self.stats.incr("calls")
+        total = total_timeout if total_timeout is not None else self.total_timeout
+        try:
+            content = await asyncio.wait_for(
+                self._chat_with_retries(messages, model or self.model, temperature, timeout or self.timeout),
+                timeout=total,
+            )
+        except asyncio.TimeoutError:
+            self.stats.incr("timeouts")
+            self.stats.incr("failed")
+            self.breaker.record_failure(started)
+            raise LLMTimeout(f"LLM call exceeded total deadline of {total}s")
+        except LLMError as e:
+            self.stats.incr("failed")
+            # Timeouts, transport errors and 429/5xx say the provider is unhealthy; a 400 does not
+            if e.retryable or isinstance(e, LLMTimeout):
+                self.breaker.record_failure(started)
+            else:
+                self.breaker.record_neutral(started)
+            raise
+        except BaseException:
+            self.breaker.record_neutral(started)
+            raise
+        self.breaker.record_success(started)
+        return content
+
+    async def _chat_with_retries(self, messages, model: str, temperature: float, timeout: float) -> str:
+        body = {"model": model, "messages": messages, "temperature": temperature}
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(body, timeout)
+            except LLMError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.stats.incr("retries")
+                await asyncio.sleep(min(0.25 * 2 ** (attempt - 1), 2.0))
+
+    async def _attempt(self, body: Dict[str, Any], timeout: float) -> str:
+        queued = time.perf_counter()
+        async with self._semaphore():
+            started = time.perf_counter()
+            self.stats.incr("queue_wait_seconds", started - queued)
+            self.stats.enter()
+            try:
+                resp = await asyncio.wait_for(self._client().post("/chat/completions", json=body), timeout=timeout)
+            except (asyncio.TimeoutError, httpx.TimeoutException):
+                self.stats.incr("timeouts")
+                raise LLMTimeout(f"LLM call exceeded per-call timeout of {timeout}s", retryable=True)
+            except httpx.HTTPError as e:
+                raise LLMError(f"LLM transport error: {e}", retryable=True)
+            finally:
+                self.stats.leave()
+                self.stats.incr("call_seconds", time.perf_counter() - started)
+
+        if resp.status_code != 200:
+            raise LLMError(
+                f"LLM returned HTTP {resp.status_code}: {resp.text[:200]}",
+                retryable=resp.status_code in RETRY_STATUS,
+            )
+        try:
+            data = resp.json()
+            content = data["choices"][0]["message"]["content"]
+        except Exception as e:
+            raise LLMError(f"Unexpected LLM response shape: {e}")
+        usage = data.get("usage") or {}
+        self.stats.incr("prompt_tokens", int(usage.get("prompt_tokens") or 0))
+        self.stats.incr("completion_tokens", int(usage.get("completion_tokens") or 0))
+        self.stats.incr("succeeded")
+        return content
+
+    async def aclose(self) -> None:
+        """Close the clients of every loop: this loop's now, those of other running loops on their own."""
+        loop = asyncio.get_running_loop()
+        for key, (other, http, closer) in list(self._http.items()):
+            del self._http[key]
+            if other is loop:
+                closer.cancel()
+                await http.aclose()
+            elif not other.is_closed():
+                asyncio.run_coroutine_threadsafe(http.aclose(), other)
+
+
+class LegacyClientAdapter:
+    """Expose a `chat` / `complete` / callable test client through the async `chat(messages)` interface.
+
+    Sync methods run in a worker thread; coroutine methods are awaited. The total deadline applies.
+    """
+
+    def __init__(self, client: Any, total_timeout: float = LLM_TOTAL_TIMEOUT):
+        self.client = client
+        self.total_timeout = total_timeout
+
+    async def chat(self, messages: List[Dict[str, str]], total_timeout: Optional[float] = None, **_: Any) -> str:
+        try:
+            resp = await asyncio.wait_for(self._invoke(messages), timeout=total_timeout or self.total_timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeout("LLM client call exceeded total deadline")
+        return response_text(resp)
+
+    async def _invoke(self, messages: List[Dict[str, str]]) -> Any:
+        if hasattr(self.client, "chat"):
+            fn, arg = self.client.chat, messages
+        elif hasattr(self.client, "complete"):
+            fn, arg = self.client.complete, "\n".join(m["content"] for m in messages if m.get("role") == "user")
+        else:
+            fn, arg = self.client, "\n".join(m["content"] for m in messages if m.get("role") == "user")
+        if inspect.iscoroutinefunction(fn) or inspect.iscoroutinefunction(getattr(fn, "__call__", None)):
+            return await fn(arg)
+        result = await asyncio.to_thread(fn, arg)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+
+def response_text(resp: Any) -> str:
+    """Text content of a client response: a string, {"content": ...} or an OpenAI-like choices dict."""
+    if isinstance(resp, dict):
+        if "content" in resp:
+            return resp["content"]
+        if "choices" in resp and resp["choices"]:
+            c = resp["choices"][0]
+            return c.get("message", {}).get("content") or c.get("text") or str(resp)
+    return resp if isinstance(resp, str) else str(resp)
+
+
+def as_async_client(client: Any) -> Any:
+    """Wrap a client unless it already speaks the async `chat(messages)` interface."""
+    if isinstance(client, (AsyncLLMClient, LegacyClientAdapter)):
+        return client
+    return LegacyClientAdapter(client)
+
+
+_llm_client: Optional[AsyncLLMClient] = None
+_llm_client_lock = threading.Lock()
+
+
+def llm_configured() -> bool:
+    return bool(OPENAI_API_KEY) and httpx is not None
+
+
+def get_llm_client() -> Optional[AsyncLLMClient]:
+    """Process-wide pooled client, or None when no OpenAI key is configured."""
+    global _llm_client
+    if not llm_configured():
+        return None
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_client = AsyncLLMClient()
+    return _llm_client
+
+
+async def close_llm_client() -> None:
+    """Close pooled LLM connections (app shutdown)."""
+    if _llm_client is not None:
+        await _llm_client.aclose()
+
+
+def llm_metrics() -> Dict[str, Any]:
+    metrics: Dict[str, Any] = {
+        "configured": llm_configured(),
+        "base_url": OPENAI_BASE_URL,
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "timeout_seconds": LLM_TIMEOUT,
+        "total_timeout_seconds": LLM_TOTAL_TIMEOUT,
+    }
+    metrics.update(_llm_client.stats.snapshot() if _llm_client is not None else LLMStats().snapshot())
+    return metrics
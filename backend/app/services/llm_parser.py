@@ -1,10 +1,20 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Awaitable, Iterable, List, Optional, Tuple
+import asyncio
+import copy
 import json
 import logging
 import os
 import re
+import threading
 from typing import Optional
 
+from app.services import parse_cache as _parse_cache
+from app.services.circuit_breaker import llm_breaker
+from app.services.singleflight import SingleFlight
+from app.services.spec_scanner import default_scanner
+from app.services.text_reducer import REDUCER_VERSION, estimate_tokens, reduce_text, reduction_stats
+from app.services.llm_client import LLM_TIMEOUT, LLMCircuitOpen, LLMError, as_async_client, get_llm_client
+
 logger = logging.getLogger(__name__)
 
 PROMPT_TEMPLATE = """
@@ -33,6 +43,10 @@ OVERRIDE_REVIEW_RE = re.compile(r"\b(send(?: this)?(?: to)?|please send(?: this)
 OVERRIDE_APPROVE_RE = re.compile(r"\b(send(?: this)?(?: to)?|please send(?: this)?(?: to)?)\s+(auto[_\-\s]?approved|auto[_\-\s]?approve|approved)\b", re.I)
 OVERRIDE_REJECT_RE = re.compile(r"\b(send(?: this)?(?: to)?|please send(?: this)?(?: to)?)\s+(rejected|reject(?:ed)?)\b", re.I)
 
+SYSTEM_PROMPT = "You are a strict JSON-only extractor. Respond with JSON only."
+DECISION_SYSTEM_PROMPT = "You are a decision engine: answer with exactly one of: auto_approved, needs_review, rejected. Do not add explanation."
+DECISIONS = ("auto_approved", "needs_review", "rejected")
+
 # Optional OpenAI integration: if OPENAI_API_KEY is set in the environment, the parser will use OpenAI ChatCompletion
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
@@ -45,25 +59,268 @@ except Exception:
     openai = None
     HAVE_OPENAI = False
 
+# "separate": extraction and decision are two completions (the original flow). "combined": one
+# completion returns the spec plus a suggested disposition, and decide(full=True) reuses it. Only
+# callers of parse_with_decision / decide(full=True) benefit: the estimate paths decide from
+# validation plus free-text overrides (decide(full=False)), so the default keeps the prompt small.
+LLM_DECISION_MODE = os.getenv("LLM_DECISION_MODE", "separate").lower()
+
+# Same schema as PROMPT_TEMPLATE plus a "disposition" field
+COMBINED_PROMPT_TEMPLATE = PROMPT_TEMPLATE.replace(
+    '  "missing_fields": []\n}',
+    '  "missing_fields": [],\n  "disposition": ""\n}',
+).replace(
+    "\nText:\n",
+    '\nSet "disposition" to exactly one of: auto_approved (complete, valid, printable order), '
+    "needs_review (missing or ambiguous details), rejected (invalid or unserviceable request).\n\nText:\n",
+)
+
+# Coalesce concurrent parses of the same normalized text into one LLM call
+LLM_SINGLEFLIGHT = os.getenv("LLM_SINGLEFLIGHT", "true").lower() in ("1", "true", "yes")
+parse_flights = SingleFlight("llm_parse")
+
+# "cascade": run the deterministic scanner first and ask the LLM only for critical fields it could
+# not read confidently; "llm": send every text to the LLM (when one is configured)
+LLM_PARSE_MODE = os.getenv("LLM_PARSE_MODE", "llm").lower()
+LLM_CASCADE_MIN_CONFIDENCE = float(os.getenv("LLM_CASCADE_MIN_CONFIDENCE", "0.8"))
+CRITICAL_FIELDS = ("product_type", "quantity", "size", "paper_type")
+
+FIELDS_PROMPT_TEMPLATE = """
+You are a strict JSON extractor. From the order text below, extract ONLY the fields listed and output EXACTLY a JSON object with those keys (no explanations):
+%s
+Field meanings: product_type is the printed product (e.g. flyer, business_card, brochure); quantity is the number of pieces (integer); size is the trimmed size (e.g. 210x297mm); paper_type is the stock code (e.g. C300).
+If a field cannot be determined, set it to null.
+Respond ONLY with JSON (no markdown, backticks or commentary).
+
+Text:
+"""
+FIELDS_DISPOSITION_HINT = (
+    'Also include "disposition": exactly one of auto_approved (complete, valid, printable order), '
+    "needs_review (missing or ambiguous details), rejected (invalid or unserviceable request)."
+)
+
+# Hedge mode for request-path parses/decisions: if the LLM has not answered within this budget,
+# answer with the deterministic result and record the late LLM answer for comparison. Milliseconds,
+# or "p95" for the rolling p95 of recent LLM call latency; empty/0 disables hedging
+LLM_HEDGE_MS = os.getenv("LLM_HEDGE_MS", "").strip().lower()
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+COMPARED_FIELDS = ("product_type", "quantity", "size", "paper_type", "color", "finishing", "turnaround_days", "rush")
+
+# Bulk parses (parse_many) pack several texts into one completion, up to this many estimated
+# prompt + answer tokens and this many texts per call
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "4000"))
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", "20"))
+# Estimated tokens of one element of the JSON-array answer
+BATCH_ANSWER_TOKENS = 120
+
+# The JSON object schema from PROMPT_TEMPLATE
+SPEC_SCHEMA = PROMPT_TEMPLATE[PROMPT_TEMPLATE.index("{"):PROMPT_TEMPLATE.index("\n}\n") + 2]
+BATCH_PROMPT_TEMPLATE = """
+You are a strict JSON extractor. Below are several order texts, each starting with a line "### ORDER <index>". For EACH text, extract a JSON object matching schema:
+%s
+and add an "index" field holding that text's index.
+Ensure fields are present; for missing fields, list their names in "missing_fields". If you cannot find a field, put null or an empty list and include the field name in "missing_fields".%s
+Respond ONLY with a JSON array holding one object per text (no markdown, backticks or commentary).
+Use deterministic parsing (temperature=0).
+
+Texts:
+"""
+
+class CascadeStats:
+    """How often the cascade answered without the LLM, partially, or fully via the LLM."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parses = 0
+        self.llm_avoided = 0
+        self.llm_partial = 0
+        self.llm_full = 0
+        self.fields_requested: Dict[str, int] = {f: 0 for f in CRITICAL_FIELDS}
+
+    def record(self, weak: List[str]) -> None:
+        with self._lock:
+            self.parses += 1
+            if not weak:
+                self.llm_avoided += 1
+            elif len(weak) < len(CRITICAL_FIELDS):
+                self.llm_partial += 1
+            else:
+                self.llm_full += 1
+            for f in weak:
+                self.fields_requested[f] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": LLM_PARSE_MODE,
+                "min_confidence": LLM_CASCADE_MIN_CONFIDENCE,
+                "parses": self.parses,
+                "llm_avoided": self.llm_avoided,
+                "llm_partial": self.llm_partial,
+                "llm_full": self.llm_full,
+                "llm_avoided_rate": round(self.llm_avoided / self.parses, 4) if self.parses else None,
+                "fields_requested": dict(self.fields_requested),
+            }
+
+
+cascade_stats = CascadeStats()
+
+
+class BatchStats:
+    """Packed bulk parses: calls made, texts answered in them, and texts re-run on their own."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.packs = 0
+        self.packed_items = 0
+        self.answered = 0
+        self.retried = 0
+        self.failed_packs = 0
+
+    def record(self, items: int, answered: int) -> None:
+        with self._lock:
+            self.packs += 1
+            self.packed_items += items
+            self.answered += answered
+            self.retried += items - answered
+            if not answered:
+                self.failed_packs += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "token_budget": LLM_BATCH_TOKEN_BUDGET,
+                "max_items": LLM_BATCH_MAX_ITEMS,
+                "packs": self.packs,
+                "packed_items": self.packed_items,
+                "items_per_pack": round(self.packed_items / self.packs, 2) if self.packs else None,
+                "answered": self.answered,
+                "retried": self.retried,
+                "failed_packs": self.failed_packs,
+            }
+
+
+batch_stats = BatchStats()
+
+
+def hedge_budget() -> Optional[float]:
+    """Seconds to wait for the LLM before hedging, or None when hedging is off (or p95 is not known yet)."""
+    if LLM_HEDGE_MS in ("", "0", "off", "false"):
+        return None
+    if LLM_HEDGE_MS == "p95":
+        return llm_breaker.latency_quantile(0.95, LLM_HEDGE_MIN_SAMPLES)
+    return float(LLM_HEDGE_MS) / 1000
+
+
+class HedgeStats:
+    """Hedged answers and how the late LLM answers compared with the deterministic ones."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hedged = 0
+        self.late_answers = 0
+        self.late_failures = 0
+        self.late_agreed = 0
+        self.late_seconds = 0.0
+        self.field_mismatches: Dict[str, int] = {f: 0 for f in COMPARED_FIELDS}
+        self.decisions_hedged = 0
+        self.decision_mismatches = 0
+
+    def incr(self, name: str, amount: Any = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def record_late(self, mismatched: List[str], seconds: float) -> None:
+        with self._lock:
+            self.late_answers += 1
+            self.late_seconds += seconds
+            if not mismatched:
+                self.late_agreed += 1
+            for f in mismatched:
+                self.field_mismatches[f] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        budget = hedge_budget()
+        with self._lock:
+            return {
+                "mode": LLM_HEDGE_MS or "off",
+                "budget_seconds": round(budget, 6) if budget is not None else None,
+                "hedged": self.hedged,
+                "late_answers": self.late_answers,
+                "late_failures": self.late_failures,
+                "late_agreed": self.late_agreed,
+                "late_seconds_total": round(self.late_seconds, 6),
+                "field_mismatches": dict(self.field_mismatches),
+                "decisions_hedged": self.decisions_hedged,
+                "decision_mismatches": self.decision_mismatches,
+            }
+
+
+hedge_stats = HedgeStats()
+# Late LLM calls still being awaited for comparison (referenced so they are not garbage collected)
+_late_tasks: set = set()
+
+# Changes whenever the extraction prompt (or how its input is reduced) changes, invalidating cached parses
+PROMPT_VERSION = _parse_cache.prompt_version(SYSTEM_PROMPT, PROMPT_TEMPLATE, REDUCER_VERSION)
+COMBINED_PROMPT_VERSION = _parse_cache.prompt_version(SYSTEM_PROMPT, COMBINED_PROMPT_TEMPLATE, REDUCER_VERSION)
+BATCH_PROMPT_VERSION = _parse_cache.prompt_version(
+    SYSTEM_PROMPT, BATCH_PROMPT_TEMPLATE, PROMPT_TEMPLATE, FIELDS_DISPOSITION_HINT, REDUCER_VERSION,
+)
+# Field prompts depend on which fields the scanner left open, so the scanner patterns (vocabulary
+# included) are part of the version
+CASCADE_PROMPT_VERSION = _parse_cache.prompt_version(
+    SYSTEM_PROMPT, FIELDS_PROMPT_TEMPLATE, FIELDS_DISPOSITION_HINT, str(LLM_CASCADE_MIN_CONFIDENCE),
+    *default_scanner.patterns(), REDUCER_VERSION,
+)
+
 
 class LLMSpecParser:
     """LLM-backed specification extractor.
 
     The parser expects a `client` object with a `chat` or `complete` interface returning text.
     In tests, provide a mock client that returns JSON text.
+
+    In cascade parse mode (LLM_PARSE_MODE=cascade) the deterministic scanner runs first and the
+    LLM is asked only for critical fields it could not read with confidence (or not at all).
+
+    In combined decision mode (LLM_DECISION_MODE=combined) the extraction prompt also asks for a
+    disposition, which a later `decide(full=True)` for the same text returns without a second call.
+
+    Parses answered by OpenAI are cached (see `app.services.parse_cache`); pass `cache` to use
+    a specific cache, including with a custom client. Heuristic fallback results are never cached.
+
+    `parse` / `decide` block and suit scripts and worker threads; request handlers use
+    `aparse` / `adecide`, which go through the pooled async client in `app.services.llm_client`
+    (the test client shapes above are adapted to it).
     """
 
-    def __init__(self, client: Optional[object] = None):
+    def __init__(
+        self,
+        client: Optional[object] = None,
+        cache: Optional[_parse_cache.ParseCache] = None,
+        decision_mode: Optional[str] = None,
+        parse_mode: Optional[str] = None,
+    ):
         self.client = client
+        self.combined = (decision_mode or LLM_DECISION_MODE) == "combined"
+        self.cascade = (parse_mode or LLM_PARSE_MODE) == "cascade"
+        # normalized text -> disposition suggested by a combined-mode parse (read by decide)
+        self._dispositions: Dict[str, str] = {}
+        if cache is None and client is None and OPENAI_API_KEY and _parse_cache.LLM_CACHE_ENABLED:
+            cache = _parse_cache.parse_cache
+        self.cache = cache
+        self._aclient = as_async_client(client) if client is not None else None
 
     def _default_parse(self, text: str) -> Dict[str, Any]:
-        # Heuristic regex-based parser for local testing when an LLM is not available.
-        # Extract common fields (quantity, size, paper, color, finishing, turnaround, rush).
-        import re
-        txt = (text or "").lower()
+        # Heuristic parser for local testing when an LLM is not available.
+        # Extract common fields (quantity, size, paper, color, finishing, turnaround, rush) in one scan.
+        return self._spec_from_scan(default_scanner.scan(text))
+
+    def _spec_from_scan(self, scan: Dict[str, Any]) -> Dict[str, Any]:
+        txt = scan["text"]
 
         # If the text looks like gibberish or is extremely short without keywords, flag missing critical fields
-        if len(txt) < 30 and not any(k in txt for k in ("print", "flyer", "business", "card", "please", "brochure")):
+        if len(txt) < 30 and not scan["intent"]:
             return {
                 "product_type": None,
                 "quantity": None,
@@ -76,38 +333,7 @@ class LLMSpecParser:
                 "missing_fields": ["product_type", "quantity", "size"],
             }
 
-        # Quantity (e.g., 'print 250' or '250 flyers')
-        q_match = re.search(r"\b(\d{1,6})\b(?=\s*(?:pieces|pcs|flyers|cards|brochures|units)?)", txt)
-        quantity = int(q_match.group(1)) if q_match else None
-
-        # Size (e.g., 210x297 or 85x55mm)
-        size_match = re.search(r"(\d{2,4}\s*[x×]\s*\d{2,4}(?:mm)?)", txt)
-        size = size_match.group(1).replace(" ", "") if size_match else None
-
-        # Paper type (C300, C350) and color (4/0, 4/4)
-        paper_match = re.search(r"\b(c\d{3})\b", txt)
-        paper = paper_match.group(1).upper() if paper_match else None
-        color_match = re.search(r"\b(\d+/\d+)\b", txt)
-        color = color_match.group(1) if color_match else None
-
-        # finishing
-        finishing = []
-        if "lamination" in txt:
-            finishing.append("lamination")
-        if "spot uv" in txt or "spot_uv" in txt or "spotuv" in txt:
-            finishing.append("spot_uv")
-        if "die cut" in txt or "die_cut" in txt:
-            finishing.append("die_cut")
-        if not finishing:
-            finishing = ["none"]
-
-        # turnaround days
-        td_match = re.search(r"(\d{1,3})\s*(day|days)", txt)
-        turnaround = int(td_match.group(1)) if td_match else None
-
-        # rush detection
-        rush = bool(re.search(r"\b(rush|urgent)\b", txt))
-
+        quantity, size, paper = scan["quantity"], scan["size"], scan["paper_type"]
         missing = []
         if not quantity:
             missing.append("quantity")
@@ -117,18 +343,27 @@ class LLMSpecParser:
             missing.append("paper_type")
 
         return {
-            "product_type": "business_card" if "card" in txt else ("flyer" if "flyer" in txt or "flyers" in txt else None),
+            "product_type": scan["product_type"],
             "quantity": quantity or 100,
             "size": size or "85x55mm",
             "paper_type": paper or "C300",
-            "color": color or "4/4",
-            "finishing": finishing,
-            "turnaround_days": turnaround or 3,
-            "rush": rush,
+            "color": scan["color"] or "4/4",
+            "finishing": scan["finishing"] or ["none"],
+            "turnaround_days": scan["turnaround_days"] or 3,
+            "rush": scan["rush"],
             "missing_fields": missing,
         }
 
     def _call_client(self, prompt: str, text: Optional[str] = None) -> str:
+        raw = self._call_llm(prompt)
+        if raw is not None:
+            return raw
+        logger.debug("No LLM client or OpenAI available; using default parser")
+        # Use the raw text (if provided) for the local heuristic parser to avoid parsing the prompt template
+        return json.dumps(self._default_parse(text or prompt))
+
+    def _call_llm(self, prompt: str) -> Optional[str]:
+        """Raw LLM answer for `prompt`, or None when no LLM is configured or the OpenAI call failed."""
         # If a client was explicitly provided (for testing), use it
         if self.client is not None:
             try:
@@ -152,24 +387,53 @@ class LLMSpecParser:
                 logger.exception("LLM client call failed: %s", e)
                 return json.dumps({"missing_fields": ["parse_error"]})
 
-        # If OpenAI is available and API key is configured, use it
+        # If OpenAI is available and API key is configured, use it (unless the circuit breaker is open)
         if HAVE_OPENAI and OPENAI_API_KEY:
+            started = llm_breaker.allow()
+            if started is None:
+                logger.debug("LLM circuit breaker open; using default parser")
+                return None
             try:
                 logger.debug("Calling OpenAI model=%s", OPENAI_MODEL)
                 messages = [
-                    {"role": "system", "content": "You are a strict JSON-only extractor. Respond with JSON only."},
-                    {"role": "user", "content": PROMPT_TEMPLATE + "\n" + prompt},
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
                 ]
-                resp = openai.ChatCompletion.create(model=OPENAI_MODEL, messages=messages, temperature=0)
+                resp = openai.ChatCompletion.create(
+                    model=OPENAI_MODEL, messages=messages, temperature=0, request_timeout=LLM_TIMEOUT,
+                )
                 content = resp["choices"][0]["message"]["content"]
+                llm_breaker.record_success(started)
                 return content
             except Exception as e:
+                llm_breaker.record_failure(started)
                 logger.exception("OpenAI call failed: %s", e)
                 # fall through to default parser
 
-        logger.debug("No LLM client or OpenAI available; using default parser")
-        # Use the raw text (if provided) for the local heuristic parser to avoid parsing the prompt template
-        return json.dumps(self._default_parse(text or prompt))
+        return None
+
+    async def _acall_llm(self, prompt: str) -> Optional[str]:
+        """Async `_call_llm`: same fallbacks, but never blocks the event loop and honours the LLM deadlines."""
+        if self._aclient is not None:
+            try:
+                return await self._aclient.chat([{"role": "user", "content": prompt}])
+            except Exception as e:
+                logger.exception("LLM client call failed: %s", e)
+                return json.dumps({"missing_fields": ["parse_error"]})
+
+        client = get_llm_client()
+        if client is not None:
+            try:
+                logger.debug("Calling LLM model=%s", client.model)
+                return await client.chat([
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
+                ])
+            except LLMCircuitOpen:
+                logger.debug("LLM circuit breaker open; using default parser")
+            except LLMError as e:
+                logger.error("LLM call failed, using default parser: %s", e)
+        return None
 
     def _clean_json_text(self, text: str) -> str:
         # Some LLMs may wrap JSON in backticks or markdown; try to extract the first {...}
@@ -197,9 +461,483 @@ class LLMSpecParser:
 
         Returns a dict conforming to the schema; on parse errors, returns a dict with missing_fields populated.
         """
-        prompt = PROMPT_TEMPLATE + "\n" + text
-        raw = self._call_client(prompt, text)
+        if not (LLM_SINGLEFLIGHT and self._llm_active()):
+            return self._take_disposition(text, self._parse_once(text))
+        # Identical texts parsed concurrently (double submits, webhook retries) share one LLM call
+        spec = parse_flights.do_sync(self._flight_key(text), lambda: self._parse_once(text))
+        return self._take_disposition(text, copy.deepcopy(spec))
+
+    async def aparse(self, text: str) -> Dict[str, Any]:
+        """Async `parse` for request handlers."""
+        if not (LLM_SINGLEFLIGHT and self._allm_active()):
+            return self._take_disposition(text, await self._aparse_once(text))
+        spec = await parse_flights.do(self._flight_key(text), lambda: self._aparse_once(text))
+        return self._take_disposition(text, copy.deepcopy(spec))
+
+    def parse_many(self, texts: Iterable[str], return_exceptions: bool = False) -> List[Any]:
+        """Parse many texts (backfills, batch imports), packing several into each LLM call.
+
+        Texts are grouped into one prompt per call up to LLM_BATCH_TOKEN_BUDGET estimated tokens
+        (and LLM_BATCH_MAX_ITEMS texts); the LLM answers with an indexed JSON array. Each element
+        goes through the same schema enforcement as `parse`; elements that are missing or unusable,
+        and texts too long to share a call, are re-parsed on their own. Returns specs in input
+        order. With `return_exceptions`, a text whose parse raised yields the exception instead
+        of failing the whole call (as with `asyncio.gather`).
+        """
+        texts = list(texts)
+        if not (self._llm_active() and LLM_BATCH_MAX_ITEMS > 1):
+            results: List[Any] = []
+            for text in texts:
+                try:
+                    results.append(self.parse(text))
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results.append(e)
+            return results
+
+        unique = self._unique_texts(texts)
+        done: Dict[str, Any] = {}
+        todo: List[str] = []
+        for key, text in unique.items():
+            spec = self._batch_resolved(text)
+            if spec is None and self.cache is not None:
+                spec = self.cache.get(self._batch_cache_key(text))
+            if spec is not None:
+                done[key] = spec
+            else:
+                todo.append(key)
+
+        llm_texts = {key: self._llm_text(unique[key]) for key in todo}
+        packs, retry = self._packs(todo, llm_texts)
+        for pack in packs:
+            pack_texts = [llm_texts[key] for key in pack]
+            raw = self._call_llm(self._batch_prompt(pack_texts))
+            for key, spec in zip(pack, self._unpack_batch(raw, pack_texts)):
+                if spec is None:
+                    retry.append(key)
+                    continue
+                done[key] = spec
+                if self.cache is not None:
+                    self.cache.put(self._batch_cache_key(unique[key]), spec, OPENAI_MODEL, self._batch_version())
+
+        for key in retry:
+            try:
+                done[key] = self._parse_once(unique[key])
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                done[key] = e
+        return self._assemble(texts, done)
+
+    async def aparse_many(
+        self, texts: Iterable[str], return_exceptions: bool = False, concurrency: Optional[int] = None,
+    ) -> List[Any]:
+        """Async `parse_many`: packed calls (and individual re-parses) run concurrently, at most
+        `concurrency` at a time when given; the pooled LLM client caps calls per process as well."""
+        texts = list(texts)
+        semaphore = asyncio.Semaphore(max(1, concurrency)) if concurrency else None
+
+        async def bounded(fn, *args):
+            if semaphore is None:
+                return await fn(*args)
+            async with semaphore:
+                return await fn(*args)
+
+        if not (self._allm_active() and LLM_BATCH_MAX_ITEMS > 1):
+            return list(await asyncio.gather(*(bounded(self.aparse, t) for t in texts), return_exceptions=return_exceptions))
+
+        unique = self._unique_texts(texts)
+        done: Dict[str, Any] = {}
+        todo: List[str] = []
+        for key, text in unique.items():
+            spec = self._batch_resolved(text)
+            if spec is None and self.cache is not None:
+                spec = await self.cache.aget(self._batch_cache_key(text))
+            if spec is not None:
+                done[key] = spec
+            else:
+                todo.append(key)
+
+        llm_texts = {key: self._llm_text(unique[key]) for key in todo}
+        packs, retry = self._packs(todo, llm_texts)
+
+        async def run_pack(pack: List[str]) -> None:
+            pack_texts = [llm_texts[key] for key in pack]
+            raw = await bounded(self._acall_llm, self._batch_prompt(pack_texts))
+            for key, spec in zip(pack, self._unpack_batch(raw, pack_texts)):
+                if spec is None:
+                    retry.append(key)
+                    continue
+                done[key] = spec
+                if self.cache is not None:
+                    await self.cache.aput(self._batch_cache_key(unique[key]), spec, OPENAI_MODEL, self._batch_version())
+
+        await asyncio.gather(*(run_pack(pack) for pack in packs))
+
+        specs = await asyncio.gather(*(bounded(self._aparse_once, unique[key]) for key in retry), return_exceptions=True)
+        for key, spec in zip(retry, specs):
+            if isinstance(spec, Exception) and not return_exceptions:
+                raise spec
+            done[key] = spec
+        return self._assemble(texts, done)
+
+    def _parse_once(self, text: str) -> Dict[str, Any]:
+        if self.cascade and self._llm_active():
+            spec, weak = self._cascade_plan(text)
+            if not weak:
+                return spec
+            if len(weak) < len(CRITICAL_FIELDS):
+                return self._parse_fields(text, spec, weak)
+
+        template, version = self._prompt()
+        key = None
+        if self.cache is not None:
+            key = _parse_cache.cache_key(text, OPENAI_MODEL, version)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        raw = self._call_llm(template + "\n" + self._llm_text(text))
+        from_llm = raw is not None
+        if not from_llm:
+            logger.debug("No LLM client or OpenAI available; using default parser")
+            raw = json.dumps(self._default_parse(text))
+
+        spec = self._spec_from_raw(raw)
+        if key is not None and from_llm and "parse_error" not in spec["missing_fields"]:
+            self.cache.put(key, spec, OPENAI_MODEL, version)
+        return spec
+
+    async def _aparse_once(self, text: str) -> Dict[str, Any]:
+        if self.cascade and self._allm_active():
+            spec, weak = self._cascade_plan(text)
+            if not weak:
+                return spec
+            if len(weak) < len(CRITICAL_FIELDS):
+                return await self._aparse_fields(text, spec, weak)
+
+        template, version = self._prompt()
+        key = None
+        if self.cache is not None:
+            key = _parse_cache.cache_key(text, OPENAI_MODEL, version)
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                return cached
+
+        late, raw = await self._within_hedge(self._acall_llm(template + "\n" + self._llm_text(text)))
+        if late is not None:
+            # Over the hedge budget: answer deterministically, keep the LLM answer for comparison
+            spec = self._spec_from_raw(json.dumps(self._default_parse(text)))
+            self._keep_late(self._record_late_parse(late, text, copy.deepcopy(spec), key, version))
+            if self.combined:
+                spec["disposition"] = self.fallback_decide(spec, text)
+            return spec
+        from_llm = raw is not None
+        if not from_llm:
+            logger.debug("No LLM client or OpenAI available; using default parser")
+            raw = json.dumps(self._default_parse(text))
+
+        spec = self._spec_from_raw(raw)
+        if key is not None and from_llm and "parse_error" not in spec["missing_fields"]:
+            await self.cache.aput(key, spec, OPENAI_MODEL, version)
+        return spec
+
+    async def _within_hedge(self, call: Awaitable[Any]) -> Tuple[Optional["asyncio.Task"], Any]:
+        """Await `call` within the hedge budget: (None, result), or (still-running task, None) once over it."""
+        budget = hedge_budget()
+        if budget is None:
+            return None, await call
+        task = asyncio.ensure_future(call)
+        try:
+            return None, await asyncio.wait_for(asyncio.shield(task), budget)
+        except asyncio.TimeoutError:
+            hedge_stats.incr("hedged")
+            return task, None
+
+    def _keep_late(self, coro: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coro)
+        _late_tasks.add(task)
+        task.add_done_callback(_late_tasks.discard)
+
+    async def _record_late_parse(
+        self, late: "asyncio.Task", text: str, fallback: Dict[str, Any], key: Optional[str], version: str,
+    ) -> None:
+        started = asyncio.get_running_loop().time()
+        try:
+            raw = await late
+        except Exception as e:
+            raw = None
+            logger.debug("Late LLM parse failed: %s", e)
+        spec = self._spec_from_raw(raw) if raw is not None else None
+        if spec is None or "parse_error" in spec["missing_fields"]:
+            hedge_stats.incr("late_failures")
+            return
+        mismatched = [f for f in COMPARED_FIELDS if spec.get(f) != fallback.get(f)]
+        hedge_stats.record_late(mismatched, asyncio.get_running_loop().time() - started)
+        if mismatched:
+            logger.info("Late LLM parse disagrees with the hedged answer on %s", ", ".join(mismatched))
+        # The next parse of this text gets the LLM answer from the cache
+        if key is not None:
+            await self.cache.aput(key, spec, OPENAI_MODEL, version)
+
+    async def _record_late_decision(self, late: "asyncio.Task", decision: str) -> None:
+        try:
+            content = await late
+        except Exception as e:
+            hedge_stats.incr("late_failures")
+            logger.debug("Late LLM decision failed: %s", e)
+            return
+        if self._decision_from_content(content) != decision:
+            hedge_stats.incr("decision_mismatches")
+            logger.info("Late LLM decision %r disagrees with the hedged decision %r", content.strip(), decision)
+
+    def _llm_text(self, text: str) -> str:
+        """The order text as sent to the LLM: reduced to LLM_INPUT_TOKEN_BUDGET (see app.services.text_reducer)."""
+        reduction = reduce_text(text)
+        reduction_stats.record(reduction)
+        if reduction.tokens_out < reduction.tokens_in:
+            logger.info(
+                "Reduced LLM input from %s to %s tokens (saved %s; %s/%s segments kept, %s lines dropped)",
+                reduction.tokens_in, reduction.tokens_out, reduction.tokens_in - reduction.tokens_out,
+                reduction.segments_kept, reduction.segments_total, reduction.lines_dropped,
+            )
+        return reduction.text
+
+    def _llm_active(self) -> bool:
+        return self.client is not None or bool(HAVE_OPENAI and OPENAI_API_KEY)
+
+    def _allm_active(self) -> bool:
+        return self._aclient is not None or get_llm_client() is not None
+
+    def _flight_key(self, text: str) -> Tuple[Any, ...]:
+        # Parsers with different clients or prompt modes must never share a result
+        return (
+            id(self.client) if self.client is not None else None,
+            self._prompt()[1],
+            self.cascade,
+            _parse_cache.normalize_text(text),
+        )
+
+    def _unique_texts(self, texts: List[str]) -> Dict[str, str]:
+        # Texts that normalize the same are parsed once
+        unique: Dict[str, str] = {}
+        for text in texts:
+            unique.setdefault(_parse_cache.normalize_text(text), text)
+        return unique
+
+    def _batch_resolved(self, text: str) -> Optional[Dict[str, Any]]:
+        """Spec without any LLM call (cascade mode, every critical field confident), else None.
+
+        Texts the cascade cannot settle alone are extracted in full in the packed prompt.
+        """
+        if not self.cascade:
+            return None
+        spec, weak = self._cascade_plan(text)
+        return spec if not weak else None
+
+    def _packs(self, keys: List[str], texts: Dict[str, str]) -> Tuple[List[List[str]], List[str]]:
+        """Group texts into calls by estimated tokens; texts that end up alone are returned separately."""
+        budget = LLM_BATCH_TOKEN_BUDGET - estimate_tokens(self._batch_prompt([]))
+        packs: List[List[str]] = []
+        current: List[str] = []
+        used = 0
+        for key in keys:
+            cost = estimate_tokens(texts[key]) + BATCH_ANSWER_TOKENS
+            if current and (used + cost > budget or len(current) >= LLM_BATCH_MAX_ITEMS):
+                packs.append(current)
+                current, used = [], 0
+            current.append(key)
+            used += cost
+        if current:
+            packs.append(current)
+        # A pack of one gains nothing over the single-text prompt
+        return [p for p in packs if len(p) > 1], [p[0] for p in packs if len(p) == 1]
+
+    def _batch_prompt(self, texts: List[str]) -> str:
+        hint = "\n" + FIELDS_DISPOSITION_HINT if self.combined else ""
+        body = "".join("\n### ORDER %d\n%s\n" % (i, text) for i, text in enumerate(texts))
+        return BATCH_PROMPT_TEMPLATE % (SPEC_SCHEMA, hint) + body
+
+    def _unpack_batch(self, raw: Optional[str], texts: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Per-text specs from a JSON-array answer; None for elements that must be re-parsed."""
+        specs: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        if raw is not None:
+            start, end = raw.find("["), raw.rfind("]")
+            try:
+                answer = json.loads(raw[start:end + 1]) if 0 <= start < end else None
+            except ValueError as e:
+                logger.error("Failed to parse packed LLM answer to JSON: %s", e)
+                answer = None
+            seen = set()
+            for element in answer if isinstance(answer, list) else []:
+                index = element.get("index") if isinstance(element, dict) else None
+                if not isinstance(index, int) or not 0 <= index < len(texts):
+                    continue
+                if index in seen:
+                    # Two answers for one text: trust neither
+                    specs[index] = None
+                    continue
+                seen.add(index)
+                element = {k: v for k, v in element.items() if k != "index"}
+                spec = self._spec_from_raw(json.dumps(element))
+                if "parse_error" not in spec["missing_fields"]:
+                    specs[index] = spec
+        answered = sum(1 for spec in specs if spec is not None)
+        batch_stats.record(len(texts), answered)
+        if answered < len(texts):
+            logger.info("Packed LLM parse answered %s/%s texts; re-parsing the rest individually", answered, len(texts))
+        return specs
+
+    def _batch_cache_key(self, text: str) -> str:
+        return _parse_cache.cache_key(text, OPENAI_MODEL, self._batch_version())
+
+    def _batch_version(self) -> str:
+        return BATCH_PROMPT_VERSION + ("c" if self.combined else "s")
+
+    def _assemble(self, texts: List[str], done: Dict[str, Any]) -> List[Any]:
+        results: List[Any] = []
+        for text in texts:
+            spec = done[_parse_cache.normalize_text(text)]
+            if isinstance(spec, Exception):
+                results.append(spec)
+            else:
+                results.append(self._take_disposition(text, copy.deepcopy(spec)))
+        return results
+
+    def scan_critical(
+        self, text: str, scan: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Deterministically read the critical fields with a confidence per field.
+
+        Rated on the scanner's evidence (pass `scan` to reuse one): 1.0: one unambiguous explicit
+        match; 0.5: a bare number that only might be the quantity; 0.4: conflicting matches
+        (first one returned); 0.0: not found.
+        """
+        if scan is None:
+            scan = default_scanner.scan(text)
+        values: Dict[str, Any] = {}
+        confidence: Dict[str, float] = {}
+        for name in CRITICAL_FIELDS:
+            distinct = list(dict.fromkeys(scan["evidence"][name]))
+            values[name] = distinct[0] if distinct else None
+            confidence[name] = 0.0 if not distinct else (1.0 if len(distinct) == 1 else 0.4)
+        if values["quantity"] is None and scan["quantity"] is not None:
+            values["quantity"], confidence["quantity"] = scan["quantity"], 0.5
+        if values["quantity"] == 0:
+            values["quantity"], confidence["quantity"] = None, 0.0
+        return values, confidence
+
+    def _cascade_plan(self, text: str) -> Tuple[Dict[str, Any], List[str]]:
+        """Deterministic spec plus the critical fields the LLM still has to supply."""
+        scan = default_scanner.scan(text)
+        values, confidence = self.scan_critical(text, scan)
+        weak = [f for f in CRITICAL_FIELDS if confidence[f] < LLM_CASCADE_MIN_CONFIDENCE]
+        cascade_stats.record(weak)
+
+        spec = self._spec_from_scan(scan)
+        for f in CRITICAL_FIELDS:
+            spec[f] = values[f] if f not in weak else None
+        spec["missing_fields"] = list(weak)
+        if not weak and self.combined:
+            # No LLM call at all: the deterministic decision stands in for the combined disposition
+            spec["disposition"] = self.fallback_decide(spec, text)
+        return spec, weak
+
+    def _fields_prompt(self, weak: List[str]) -> str:
+        fields = "{\n" + ",\n".join('  "%s": null' % f for f in weak) + "\n}"
+        template = FIELDS_PROMPT_TEMPLATE % fields
+        if self.combined:
+            template = template.replace("\nText:\n", "\n" + FIELDS_DISPOSITION_HINT + "\n\nText:\n")
+        return template
 
+    def _merge_fields(self, spec: Dict[str, Any], raw: str, weak: List[str]) -> Optional[Dict[str, Any]]:
+        """Fill `weak` fields from the LLM's answer; None when the answer is unusable."""
+        try:
+            answer = json.loads(self._clean_json_text(raw))
+            if not isinstance(answer, dict) or "parse_error" in (answer.get("missing_fields") or []):
+                raise ValueError("expected a JSON object with the requested fields")
+        except Exception as e:
+            logger.error("Failed to parse LLM field answer to JSON: %s", e)
+            return None
+        for f in weak:
+            value = answer.get(f)
+            if f == "quantity" and value is not None:
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    value = None
+            if value not in (None, ""):
+                spec[f] = value
+        spec["missing_fields"] = [f for f in weak if spec.get(f) in (None, "")]
+        if "disposition" in answer:
+            spec["disposition"] = answer["disposition"]
+        return spec
+
+    def _parse_fields(self, text: str, spec: Dict[str, Any], weak: List[str]) -> Dict[str, Any]:
+        key = None
+        if self.cache is not None:
+            key = _parse_cache.cache_key(text, OPENAI_MODEL, self._cascade_version())
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        raw = self._call_llm(self._fields_prompt(weak) + "\n" + self._llm_text(text))
+        if raw is None:
+            return spec
+        merged = self._merge_fields(spec, raw, weak)
+        if merged is None:
+            return spec
+        if key is not None:
+            self.cache.put(key, merged, OPENAI_MODEL, self._cascade_version())
+        return merged
+
+    async def _aparse_fields(self, text: str, spec: Dict[str, Any], weak: List[str]) -> Dict[str, Any]:
+        key = None
+        if self.cache is not None:
+            key = _parse_cache.cache_key(text, OPENAI_MODEL, self._cascade_version())
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                return cached
+        raw = await self._acall_llm(self._fields_prompt(weak) + "\n" + self._llm_text(text))
+        if raw is None:
+            return spec
+        merged = self._merge_fields(spec, raw, weak)
+        if merged is None:
+            return spec
+        if key is not None:
+            await self.cache.aput(key, merged, OPENAI_MODEL, self._cascade_version())
+        return merged
+
+    def _cascade_version(self) -> str:
+        return CASCADE_PROMPT_VERSION + ("c" if self.combined else "s")
+
+    def parse_with_decision(self, text: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Spec plus full disposition: one LLM call in combined mode, two in separate mode."""
+        spec = self.parse(text)
+        return spec, self.decide(spec, text, full=True)
+
+    async def aparse_with_decision(self, text: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        spec = await self.aparse(text)
+        return spec, await self.adecide(spec, text, full=True)
+
+    def _prompt(self) -> Tuple[str, str]:
+        if self.combined:
+            return COMBINED_PROMPT_TEMPLATE, COMBINED_PROMPT_VERSION
+        return PROMPT_TEMPLATE, PROMPT_VERSION
+
+    def _take_disposition(self, text: str, spec: Dict[str, Any]) -> Dict[str, Any]:
+        # The disposition is not part of the spec schema; keep it for decide() instead
+        disposition = spec.pop("disposition", None)
+        if isinstance(disposition, str) and disposition.strip().lower() in DECISIONS:
+            self._dispositions[_parse_cache.normalize_text(text)] = disposition.strip().lower()
+        return spec
+
+    def _suggested_disposition(self, text: Optional[str]) -> Optional[str]:
+        if not self._dispositions:
+            return None
+        return self._dispositions.get(_parse_cache.normalize_text(text or ""))
+
+    def _spec_from_raw(self, raw: str) -> Dict[str, Any]:
         try:
             cleaned = self._clean_json_text(raw)
             spec = json.loads(cleaned)
@@ -233,24 +971,73 @@ class LLMSpecParser:
         if not full:
             return self._detect_override(txt)
 
-        # Try OpenAI when available for a full decision
-        if HAVE_OPENAI and OPENAI_API_KEY:
+        # Combined mode: the extraction call already answered this
+        suggested = self._suggested_disposition(text)
+        if suggested:
+            return suggested
+
+        # Try OpenAI when available for a full decision (unless the circuit breaker is open)
+        started = llm_breaker.allow() if HAVE_OPENAI and OPENAI_API_KEY else None
+        if started is not None:
             try:
                 logger.debug("Calling OpenAI for decision model=%s", OPENAI_MODEL)
-                messages = [
-                    {"role": "system", "content": "You are a decision engine: answer with exactly one of: auto_approved, needs_review, rejected. Do not add explanation."},
-                    {"role": "user", "content": "Spec: %s\nText: %s\n\nReturn one of: auto_approved, needs_review, rejected." % (json.dumps(spec), txt)},
-                ]
-                resp = openai.ChatCompletion.create(model=OPENAI_MODEL, messages=messages, temperature=0)
-                content = resp["choices"][0]["message"]["content"].strip().lower()
-                for token in ("auto_approved", "needs_review", "rejected"):
-                    if token in content:
-                        return token
-                return content.split()[0]
+                resp = openai.ChatCompletion.create(
+                    model=OPENAI_MODEL, messages=self._decision_messages(spec, txt), temperature=0,
+                    request_timeout=LLM_TIMEOUT,
+                )
+                decision = self._decision_from_content(resp["choices"][0]["message"]["content"])
+                llm_breaker.record_success(started)
+                return decision
             except Exception as e:
+                llm_breaker.record_failure(started)
                 logger.exception("OpenAI decision call failed: %s", e)
 
-        # Deterministic fallback (mimic Validator priorities)
+        return self.fallback_decide(spec, txt)
+
+    async def adecide(self, spec: Dict[str, Any], text: Optional[str] = None, full: bool = True) -> Optional[str]:
+        """Async `decide` for request handlers (full decisions use the pooled LLM client)."""
+        txt = (text or "").lower()
+        if not full:
+            return self._detect_override(txt)
+
+        suggested = self._suggested_disposition(text)
+        if suggested:
+            return suggested
+
+        client = get_llm_client()
+        if client is not None:
+            try:
+                logger.debug("Calling LLM for decision model=%s", client.model)
+                late, content = await self._within_hedge(client.chat(self._decision_messages(spec, txt)))
+                if late is None:
+                    return self._decision_from_content(content)
+                decision = self.fallback_decide(spec, txt)
+                hedge_stats.incr("decisions_hedged")
+                self._keep_late(self._record_late_decision(late, decision))
+                return decision
+            except LLMCircuitOpen:
+                logger.debug("LLM circuit breaker open; using deterministic decision")
+            except LLMError as e:
+                logger.error("LLM decision call failed, using deterministic decision: %s", e)
+
+        return self.fallback_decide(spec, txt)
+
+    def _decision_messages(self, spec: Dict[str, Any], txt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": DECISION_SYSTEM_PROMPT},
+            {"role": "user", "content": "Spec: %s\nText: %s\n\nReturn one of: auto_approved, needs_review, rejected." % (json.dumps(spec), self._llm_text(txt))},
+        ]
+
+    def _decision_from_content(self, content: str) -> str:
+        content = content.strip().lower()
+        for token in DECISIONS:
+            if token in content:
+                return token
+        return content.split()[0]
+
+    def fallback_decide(self, spec: Dict[str, Any], text: Optional[str] = None) -> str:
+        """Deterministic decision used when no LLM is available (mimics Validator priorities)."""
+        txt = (text or "").lower()
         # Allow explicit text overrides if present (use compiled regex helper)
         explicit = self._detect_override(txt)
         if explicit:
@@ -0,0 +1,355 @@
+"""Local OpenAI-compatible stub for tests and load runs (no network, no API key).
+
+    uvicorn app.services.llm_stub:app --port 8099
+    OPENAI_BASE_URL=http://localhost:8099/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+
+`POST /v1/chat/completions` answers extraction prompts (single or packed) with the heuristic
+parser's JSON and decision prompts with the deterministic decision. With `LLM_STUB_FIXTURES`
+(a JSONL file) it answers from recorded responses first; with `LLM_STUB_UPSTREAM` also set,
+fixture misses are forwarded to that OpenAI-compatible API and appended to the file, so a
+corpus can be recorded once and replayed offline.
+
+Provider behaviour is simulated per request:
+
+- `LLM_STUB_LATENCY`: latency distribution in ms — `fixed:120`, `uniform:50,400`,
+  `normal:200,50` or `lognormal:200,0.6` (median, sigma; long tail). `LLM_STUB_LATENCY_MS=N`
+  is shorthand for `fixed:N`.
+- `LLM_STUB_ERROR_RATE`: share of requests answered with HTTP 500.
+- `LLM_STUB_RATE_LIMIT_RATE`: share answered with HTTP 429 (`Retry-After: 1`);
+  `LLM_STUB_RPM` additionally caps requests per minute (token bucket), answering 429 above it.
+- `LLM_STUB_HANG_RATE` / `LLM_STUB_HANG_MS`: share of requests that stall (default 60 s) before
+  answering, to exercise client timeouts.
+- `LLM_STUB_SEED`: seed for the random draws.
+
+`GET /config` shows the settings and `POST /config` changes them at runtime (same names in
+lower case without the prefix, e.g. `{"latency": "lognormal:300,0.8", "error_rate": 0.02}`), so
+a load harness can switch scenarios without restarting. `GET /stats` reports requests by
+status, fixture hits and simulated latency; `POST /stats/reset` clears them.
+
+`POST /webhook/...` accepts and counts workflow payloads, so `N8N_WEBHOOK_URL` can point here
+when there is no n8n to talk to (otherwise every estimate waits out the webhook retries).
+"""
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from app.services.llm_parser import LLMSpecParser
+from app.services.parse_cache import normalize_text
+
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+LLM_STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "fixed:%g" % LLM_STUB_LATENCY_MS)
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+LLM_STUB_RATE_LIMIT_RATE = float(os.getenv("LLM_STUB_RATE_LIMIT_RATE", "0"))
+LLM_STUB_RPM = int(os.getenv("LLM_STUB_RPM", "0"))
+LLM_STUB_HANG_RATE = float(os.getenv("LLM_STUB_HANG_RATE", "0"))
+LLM_STUB_HANG_MS = float(os.getenv("LLM_STUB_HANG_MS", "60000"))
+LLM_STUB_SEED = os.getenv("LLM_STUB_SEED")
+LLM_STUB_FIXTURES = os.getenv("LLM_STUB_FIXTURES")
+LLM_STUB_UPSTREAM = os.getenv("LLM_STUB_UPSTREAM")
+LLM_STUB_UPSTREAM_KEY = os.getenv("LLM_STUB_UPSTREAM_KEY", "")
+
+app = FastAPI(title="LLM stub")
+_parser = LLMSpecParser()
+
+
+def latency_sampler(spec: str) -> Callable[[random.Random], float]:
+    """Parse a latency distribution spec into a sampler returning milliseconds."""
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(",")] if args else []
+    except ValueError:
+        values = []
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(max(values[0], 1e-3)), values[1])
+    raise ValueError(f"bad latency spec {spec!r}: use fixed:MS, uniform:MIN,MAX, normal:MEAN,STD or lognormal:MEDIAN,SIGMA")
+
+
+class StubConfig:
+    FIELDS = ("latency", "error_rate", "rate_limit_rate", "rpm", "hang_rate", "hang_ms", "seed")
+
+    def __init__(self):
+        self.latency = LLM_STUB_LATENCY
+        self.error_rate = LLM_STUB_ERROR_RATE
+        self.rate_limit_rate = LLM_STUB_RATE_LIMIT_RATE
+        self.rpm = LLM_STUB_RPM
+        self.hang_rate = LLM_STUB_HANG_RATE
+        self.hang_ms = LLM_STUB_HANG_MS
+        self.seed = LLM_STUB_SEED
+        self._apply()
+
+    def update(self, values: Dict[str, Any]) -> None:
+        unknown = set(values) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"unknown settings: {', '.join(sorted(unknown))}")
+        latency_sampler(values.get("latency", self.latency))
+        for name, value in values.items():
+            current = getattr(self, name)
+            setattr(self, name, type(current)(value) if current is not None and value is not None else value)
+        self._apply()
+
+    def _apply(self) -> None:
+        self.sample_latency = latency_sampler(self.latency)
+        self.rng = random.Random(self.seed)
+        self._tokens = float(self.rpm)
+        self._refilled = time.monotonic()
+
+    def take_rate_token(self) -> bool:
+        """Token bucket for `rpm`: False when the request is over the per-minute limit."""
+        if self.rpm <= 0:
+            return True
+        now = time.monotonic()
+        self._tokens = min(float(self.rpm), self._tokens + (now - self._refilled) * self.rpm / 60)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
+class Fixtures:
+    """Recorded responses in a JSONL file.
+
+    Each line is `{"key": ..., "content": ...}` (key: hash of the normalized system + user
+    messages, written by record mode) or `{"text": ..., "content": ...}` (hand-written: answers
+    full extraction prompts for that order text). `content` may be a string or a JSON value.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._by_key: Dict[str, str] = {}
+        self._by_text: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        content = entry["content"]
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        if entry.get("key"):
+            self._by_key[entry["key"]] = content
+        elif entry.get("text") is not None:
+            self._by_text[normalize_text(entry["text"])] = content
+
+    def lookup(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        content = self._by_key.get(prompt_key(messages))
+        if content is None and self._by_text:
+            text = _extraction_text(messages)
+            if text is not None:
+                content = self._by_text.get(normalize_text(text))
+        return content
+
+    def record(self, messages: List[Dict[str, str]], content: str) -> None:
+        entry = {"key": prompt_key(messages), "text": _extraction_text(messages), "content": content}
+        with self._lock:
+            self._add(entry)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._by_key) + len(self._by_text)
+
+
+def prompt_key(messages: List[Dict[str, str]]) -> str:
+    material = "\x00".join(normalize_text(m.get("content", "")) for m in messages if m.get("role") in ("system", "user"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _extraction_text(messages: List[Dict[str, str]]) -> Optional[str]:
+    """Order text of a single full extraction prompt (None for decision, field-only and packed prompts)."""
+    user = "\n".join(m.get("content", "") for m in messages if m.get("role") == "user")
+    if "### ORDER " in user or "extract ONLY the fields listed" in user or "Return one of:" in user:
+        return None
+    return user.rsplit("Text:", 1)[-1].strip()
+
+
+config = StubConfig()
+fixtures = Fixtures(LLM_STUB_FIXTURES)
+_stats_lock = threading.Lock()
+
+
+def _new_stats() -> Dict[str, Any]:
+    return {
+        "requests": 0, "by_status": {}, "fixture_hits": 0, "upstream": 0, "webhooks": 0,
+        "latency_ms_total": 0.0, "latency_ms_max": 0.0,
+    }
+
+
+_stats = _new_stats()
+
+
+def _count(status: int, latency_ms: float = 0.0, **extra: int) -> None:
+    with _stats_lock:
+        _stats["by_status"][str(status)] = _stats["by_status"].get(str(status), 0) + 1
+        _stats["latency_ms_total"] += latency_ms
+        _stats["latency_ms_max"] = max(_stats["latency_ms_max"], latency_ms)
+        for name, amount in extra.items():
+            _stats[name] += amount
+
+
+def _answer(messages) -> str:
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    user = "\n".join(m.get("content", "") for m in messages if m.get("role") == "user")
+    if system.startswith("You are a decision engine"):
+        spec_text, _, text = user.partition("\nText: ")
+        try:
+            spec = json.loads(spec_text[len("Spec: "):])
+        except Exception:
+            spec = {}
+        return _parser.fallback_decide(spec, text.split("\n\nReturn one of:")[0])
+    if "### ORDER " in user:
+        # Packed bulk prompt: one indexed object per "### ORDER <index>" section
+        sections = re.split(r"^### ORDER (\d+)\n", user.split("\nTexts:\n", 1)[-1], flags=re.M)[1:]
+        answer = []
+        for index, text in zip(sections[::2], sections[1::2]):
+            spec = _parser._default_parse(text.strip())
+            if '"disposition"' in user:
+                spec["disposition"] = _parser.fallback_decide(spec, text.strip())
+            answer.append(dict(spec, index=int(index)))
+        return json.dumps(answer)
+    # Extraction prompts end with "Text:\n<order text>"
+    text = user.rsplit("Text:", 1)[-1].strip()
+    if "extract ONLY the fields listed" in user:
+        # Cascade field prompt: answer just the requested fields
+        fields = re.findall(r'^  "(\w+)": null', user, re.M)
+        values = _parser.scan_critical(text)[0]
+        answer = {f: values.get(f) for f in fields}
+        if '"disposition"' in user:
+            answer["disposition"] = _parser.fallback_decide(dict(_parser._default_parse(text), **answer), text)
+        return json.dumps(answer)
+    spec = _parser._default_parse(text)
+    if '"disposition"' in user:
+        # Combined extraction + decision prompt
+        spec["disposition"] = _parser.fallback_decide(spec, text)
+    return json.dumps(spec)
+
+
+async def _upstream(body: Dict[str, Any]) -> str:
+    import httpx
+
+    headers = {"Authorization": f"Bearer {LLM_STUB_UPSTREAM_KEY}"} if LLM_STUB_UPSTREAM_KEY else {}
+    async with httpx.AsyncClient(base_url=LLM_STUB_UPSTREAM.rstrip("/"), headers=headers, timeout=120) as client:
+        resp = await client.post("/chat/completions", json=body)
+    if resp.status_code != 200:
+        raise HTTPException(status_code=502, detail=f"upstream returned HTTP {resp.status_code}")
+    return resp.json()["choices"][0]["message"]["content"]
+
+
+def _error(status: int, message: str, kind: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    _count(status)
+    return JSONResponse({"error": {"message": message, "type": kind, "code": kind}}, status_code=status, headers=headers)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    with _stats_lock:
+        _stats["requests"] += 1
+        request_id = _stats["requests"]
+    if not config.take_rate_token():
+        return _error(429, "Rate limit reached for requests per minute", "rate_limit_exceeded", {"Retry-After": "1"})
+    # One draw picks the outcome, so the configured rates are shares of all requests
+    draw = config.rng.random()
+    if draw < config.rate_limit_rate:
+        return _error(429, "Rate limit reached", "rate_limit_exceeded", {"Retry-After": "1"})
+    draw -= config.rate_limit_rate
+    if draw < config.error_rate:
+        return _error(500, "The server had an error while processing your request", "server_error")
+    draw -= config.error_rate
+    latency_ms = config.hang_ms if draw < config.hang_rate else config.sample_latency(config.rng)
+
+    messages = body.get("messages") or []
+    started = time.perf_counter()
+    content = fixtures.lookup(messages)
+    if content is not None:
+        extra = {"fixture_hits": 1}
+    elif LLM_STUB_UPSTREAM:
+        # Record mode: real latency, nothing simulated
+        content = await _upstream(body)
+        fixtures.record(messages, content)
+        extra, latency_ms = {"upstream": 1}, 0.0
+    else:
+        content = _answer(messages)
+        extra = {}
+    remaining = latency_ms / 1000 - (time.perf_counter() - started)
+    if remaining > 0:
+        await asyncio.sleep(remaining)
+    _count(200, latency_ms, **extra)
+
+    # Rough token counts (~4 characters per token) so cost comparisons have something to add up
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"stub-{request_id}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+@app.post("/webhook/{path:path}")
+async def webhook(path: str) -> Dict[str, Any]:
+    with _stats_lock:
+        _stats["webhooks"] += 1
+    return {"ok": True}
+
+
+@app.get("/config")
+async def get_config() -> Dict[str, Any]:
+    return config.as_dict()
+
+
+@app.post("/config")
+async def set_config(request: Request) -> Dict[str, Any]:
+    try:
+        config.update(await request.json())
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return config.as_dict()
+
+
+@app.get("/stats")
+async def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        result = json.loads(json.dumps(_stats))
+    answered = result["by_status"].get("200", 0)
+    result["latency_ms_mean"] = round(result["latency_ms_total"] / answered, 3) if answered else None
+    result["fixtures"] = len(fixtures)
+    return result
+
+
+@app.post("/stats/reset")
+async def reset_stats() -> Dict[str, Any]:
+    global _stats
+    with _stats_lock:
+        _stats = _new_stats()
+    return {"reset": True}
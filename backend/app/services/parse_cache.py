@@ -0,0 +1,280 @@
+"""Two-tier cache for LLM parse results.
+
+Reorders, CSR resubmits and n8n retries send the same order text again and again; each would
+otherwise cost an LLM round trip. Results are cached in-process (LRU) and in the
+`llm_parse_cache` table, shared by every worker and surviving restarts. The key is
+sha256(normalized text, model, prompt version), where the prompt version is a hash of the
+prompt text itself: editing `PROMPT_TEMPLATE` or changing `OPENAI_MODEL` moves every lookup to
+new keys, and the old rows age out through TTL/size pruning.
+
+    python -m app.services.parse_cache prune   # drop expired rows and trim to LLM_CACHE_DB_MAX_ENTRIES
+    python -m app.services.parse_cache clear   # drop every row
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models.llm_cache import LLMParseCacheEntry
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Persist to the llm_parse_cache table (false: in-process tier only)
+LLM_CACHE_PERSIST = os.getenv("LLM_CACHE_PERSIST", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_DB_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DB_MAX_ENTRIES", "200000"))
+# Prune the table after this many stores (per process)
+LLM_CACHE_PRUNE_EVERY = int(os.getenv("LLM_CACHE_PRUNE_EVERY", "500"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form for cache keys: NFKC, case-folded, whitespace collapsed."""
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
+
+
+def prompt_version(*prompt_parts: str) -> str:
+    """Short hash of the prompt text; any edit to the prompt yields a new version."""
+    digest = hashlib.sha256("\x00".join(prompt_parts).encode("utf-8")).hexdigest()
+    return digest[:16]
+
+
+def cache_key(text: str, model: str, version: str) -> str:
+    material = "\x00".join((normalize_text(text), model, version))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """In-process LRU in front of the llm_parse_cache table. Safe to share across threads.
+
+    Values are stored as JSON text and decoded on every hit, so callers always get a fresh dict.
+    Database errors are logged and treated as misses: the cache never fails a parse.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl: float = LLM_CACHE_TTL,
+        persist: bool = LLM_CACHE_PERSIST,
+        db_max_entries: int = LLM_CACHE_DB_MAX_ENTRIES,
+        prune_every: int = LLM_CACHE_PRUNE_EVERY,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist = persist
+        self.db_max_entries = db_max_entries
+        self.prune_every = prune_every
+        # key -> (spec JSON, expires_at epoch seconds)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stores_since_prune = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+
+    def _incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return entry[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._memory_get(key)
+        if value is None and self.persist:
+            value = self._db_get(key)
+        if value is None:
+            self._incr("misses")
+            return None
+        return json.loads(value)
+
+    def put(self, key: str, spec: Dict[str, Any], model: str, version: str) -> None:
+        value = json.dumps(spec, sort_keys=True)
+        now = time.time()
+        self._remember(key, value, now + self.ttl)
+        self._incr("stores")
+        if self.persist:
+            self._db_put(key, value, model, version, now)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """`get` for async callers: memory hits stay on the loop, database lookups run in a thread."""
+        value = self._memory_get(key)
+        if value is None and self.persist:
+            value = await asyncio.to_thread(self._db_get, key)
+        if value is None:
+            self._incr("misses")
+            return None
+        return json.loads(value)
+
+    async def aput(self, key: str, spec: Dict[str, Any], model: str, version: str) -> None:
+        value = json.dumps(spec, sort_keys=True)
+        now = time.time()
+        self._remember(key, value, now + self.ttl)
+        self._incr("stores")
+        if self.persist:
+            await asyncio.to_thread(self._db_put, key, value, model, version, now)
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _db_get(self, key: str) -> Optional[str]:
+        from app.db.session import get_session
+
+        try:
+            with get_session() as session:
+                row = session.execute(
+                    select(LLMParseCacheEntry.spec, LLMParseCacheEntry.expires_at).where(LLMParseCacheEntry.key == key)
+                ).first()
+        except Exception as e:
+            self._incr("errors")
+            logger.warning("LLM parse cache lookup failed: %s", e)
+            return None
+        if row is None:
+            return None
+        expires_at = row.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at <= datetime.now(timezone.utc):
+            self._incr("expirations")
+            return None
+        self._remember(key, row.spec, expires_at.timestamp())
+        self._incr("db_hits")
+        return row.spec
+
+    def _db_put(self, key: str, value: str, model: str, version: str, now: float) -> None:
+        from app.db.session import get_session
+
+        created = datetime.fromtimestamp(now, timezone.utc)
+        row = {
+            "key": key,
+            "model": model,
+            "prompt_version": version,
+            "spec": value,
+            "created_at": created,
+            "expires_at": created + timedelta(seconds=self.ttl),
+        }
+        try:
+            with get_session() as session:
+                dialect = sqlite if session.get_bind().dialect.name == "sqlite" else postgresql
+                stmt = dialect.insert(LLMParseCacheEntry).values(**row)
+                session.execute(stmt.on_conflict_do_update(
+                    index_elements=[LLMParseCacheEntry.key],
+                    set_={"spec": stmt.excluded.spec, "created_at": stmt.excluded.created_at, "expires_at": stmt.excluded.expires_at},
+                ))
+                session.commit()
+        except Exception as e:
+            self._incr("errors")
+            logger.warning("LLM parse cache store failed: %s", e)
+            return
+
+        with self._lock:
+            self._stores_since_prune += 1
+            due = self._stores_since_prune >= self.prune_every
+            if due:
+                self._stores_since_prune = 0
+        if due:
+            try:
+                with get_session() as session:
+                    prune(session, self.db_max_entries)
+            except Exception as e:
+                self._incr("errors")
+                logger.warning("LLM parse cache prune failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "enabled": LLM_CACHE_ENABLED,
+                "persist": self.persist,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "errors": self.errors,
+            }
+
+
+def prune(session, max_entries: int = LLM_CACHE_DB_MAX_ENTRIES) -> int:
+    """Delete expired rows, then the oldest rows beyond `max_entries`. Returns rows deleted."""
+    deleted = session.execute(
+        delete(LLMParseCacheEntry).where(LLMParseCacheEntry.expires_at <= datetime.now(timezone.utc))
+    ).rowcount or 0
+    total = session.execute(select(func.count()).select_from(LLMParseCacheEntry)).scalar_one()
+    if total > max_entries:
+        oldest = (
+            select(LLMParseCacheEntry.key)
+            .order_by(LLMParseCacheEntry.created_at)
+            .limit(total - max_entries)
+            .scalar_subquery()
+        )
+        deleted += session.execute(
+            delete(LLMParseCacheEntry).where(LLMParseCacheEntry.key.in_(oldest))
+        ).rowcount or 0
+    session.commit()
+    return deleted
+
+
+parse_cache = ParseCache()
+
+
+if __name__ == "__main__":
+    from app.db.session import get_session
+
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1:]
+    if command not in (["prune"], ["clear"]):
+        print("usage: python -m app.services.parse_cache prune|clear", file=sys.stderr)
+        sys.exit(2)
+    with get_session() as s:
+        if command == ["prune"]:
+            removed = prune(s)
+        else:
+            removed = s.execute(delete(LLMParseCacheEntry)).rowcount or 0
+            s.commit()
+    logger.info("Removed %s llm_parse_cache rows", removed)
@@ -1,4 +1,16 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Union
+
+# Optional: vectorized bulk pricing (estimate_batch falls back to the scalar path without it)
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# |price*100 - (n + 0.5)| below this is treated as a possible rounding tie; those few elements
+# are rounded with Python's round() so estimate_batch matches estimate() to the cent
+_TIE_EPSILON = 1e-6
+
+Finishing = Union[Mapping[str, Sequence[Any]], Sequence[Optional[Sequence[str]]]]
 
 class PriceEngine:
     """Rule-based pricing engine."""
@@ -60,3 +72,104 @@ class PriceEngine:
                 "rush_amount": base * rush_surcharge,
             },
         }
+
+    def estimate_batch(
+        self,
+        quantity: Sequence[int],
+        paper_type: Optional[Sequence[Optional[str]]] = None,
+        finishing: Optional[Finishing] = None,
+        rush: Optional[Sequence[Any]] = None,
+    ) -> Dict[str, Any]:
+        """Price many specs given as columns; returns columns (NumPy arrays when available).
+
+        `finishing` is either a mapping of finishing name -> per-row boolean flags, or one list of
+        finishing names per row (as in a spec). Omitted columns take the scalar defaults. Results
+        match `estimate()` for the same spec (flags: a finishing list in FINISHING_COST order),
+        `final_price` to the cent.
+        """
+        if np is None:
+            return self._estimate_batch_scalar(quantity, paper_type, finishing, rush)
+
+        qty = np.asarray(quantity, dtype=np.int64).astype(np.float64)
+        n = qty.shape[0]
+
+        offset = qty >= 1000
+        process = np.where(offset, "offset", "digital")
+        setup = np.where(offset, self.SETUP_COST["offset"], self.SETUP_COST["digital"])
+
+        if paper_type is None:
+            material_unit = np.full(n, self.MATERIAL_COST["standard"])
+        else:
+            papers, codes = np.unique(np.asarray(paper_type, dtype=object).astype(str), return_inverse=True)
+            units = np.array([self.MATERIAL_COST.get(p, self.MATERIAL_COST["standard"]) for p in papers])
+            material_unit = units[codes.reshape(-1)]
+        material_cost = material_unit * qty
+
+        # Same term order as the scalar sum so float results are bit-identical
+        finishing_cost = np.zeros(n)
+        for unit_costs in self._finishing_terms(finishing, n):
+            finishing_cost = finishing_cost + unit_costs * qty
+
+        rush_surcharge = np.where(np.zeros(n, dtype=bool) if rush is None else np.asarray(rush, dtype=bool), 0.2, 0.0)
+
+        base = material_cost + setup + finishing_cost
+        margin = 0.2
+        price = base * (1 + margin + rush_surcharge)
+
+        final_price = np.round(price, 2)
+        cents = price * 100
+        near_tie = np.abs(cents - np.floor(cents) - 0.5) < _TIE_EPSILON
+        for i in np.flatnonzero(near_tie):
+            final_price[i] = round(float(price[i]), 2)
+
+        return {
+            "process": process,
+            "material_unit": material_unit,
+            "material_cost": material_cost,
+            "setup_cost": setup,
+            "finishing_cost": finishing_cost,
+            "margin_pct": np.full(n, margin),
+            "rush_surcharge_pct": rush_surcharge,
+            "final_price": final_price,
+            "base": base,
+            "margin_amount": base * margin,
+            "rush_amount": base * rush_surcharge,
+        }
+
+    def _finishing_terms(self, finishing: Optional[Finishing], n: int) -> List[Any]:
+        """Per-row finishing unit costs, one array per summed term."""
+        if finishing is None:
+            return []
+        if isinstance(finishing, Mapping):
+            # Flags: one term per finishing type, in FINISHING_COST order
+            return [
+                np.where(np.asarray(finishing[name], dtype=bool), cost, 0.0)
+                for name, cost in self.FINISHING_COST.items()
+                if name in finishing
+            ]
+        # Lists: term j is the j-th finishing of each row (0 where the row has fewer)
+        lists = [f or [] for f in finishing]
+        width = max((len(f) for f in lists), default=0)
+        terms = []
+        for j in range(width):
+            terms.append(np.array([self.FINISHING_COST.get(f[j], 0.0) if j < len(f) else 0.0 for f in lists]))
+        return terms
+
+    def _estimate_batch_scalar(self, quantity, paper_type, finishing, rush) -> Dict[str, Any]:
+        n = len(quantity)
+        if isinstance(finishing, Mapping):
+            # Expand flags into per-row lists in FINISHING_COST order (unknown names cost nothing)
+            names = [name for name in self.FINISHING_COST if name in finishing]
+            finishing = [[name for name in names if finishing[name][i]] for i in range(n)]
+        columns: Dict[str, List[Any]] = {}
+        for i in range(n):
+            spec = {"quantity": int(quantity[i]), "rush": bool(rush[i]) if rush is not None else False}
+            if paper_type is not None:
+                spec["paper_type"] = paper_type[i]
+            if finishing is not None:
+                spec["finishing"] = finishing[i]
+            result = self.estimate(spec)
+            result.update(result.pop("breakdown"))
+            for key, value in result.items():
+                columns.setdefault(key, []).append(value)
+        return columns
@@ -0,0 +1,115 @@
+"""In-process cache for rendered dashboard responses.
+
+Entries are keyed by path + query string + representation (HTML/JSON) and tagged with the
+data version at render time. Order writes call `invalidate_orders()`, which bumps the version
+so every cached entry becomes stale at once. Entries also expire after a TTL, which bounds
+staleness from writes handled by *other* worker processes (the version counter is per process).
+The cache is an LRU bounded by entry count, so arbitrary query parameters cannot grow it.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import os
+import threading
+import time
+
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "10"))
+DASHBOARD_CACHE_MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "256"))
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    media_type: str
+    etag: str
+    version: int
+    expires_at: float
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def make_etag(body: bytes) -> str:
+    # Content hash: a 304 is only ever sent for byte-identical bodies, whichever worker rendered them
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = DASHBOARD_CACHE_MAX_ENTRIES, ttl: float = DASHBOARD_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump(self) -> int:
+        with self._lock:
+            self._version += 1
+            # Everything cached is now stale; drop it rather than letting it age out
+            self._entries.clear()
+            return self._version
+
+    def get(self, key: Tuple) -> Optional[CachedResponse]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != self._version or entry.expires_at <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple, body: bytes, media_type: str, version: int, headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            media_type=media_type,
+            etag=make_etag(body),
+            version=version,
+            expires_at=time.monotonic() + self.ttl,
+            headers=dict(headers or {}),
+        )
+        with self._lock:
+            # A write landed while this response was being computed: serve it, but don't cache it
+            if version != self._version:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "version": self._version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+            }
+
+
+dashboard_cache = ResponseCache()
+
+
+def invalidate_orders() -> None:
+    """Call after any committed write to `order` (create, status/price/issues changes)."""
+    dashboard_cache.bump()
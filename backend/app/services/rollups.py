@@ -0,0 +1,202 @@
+"""Incrementally maintained dashboard rollups.
+
+Every write that creates an order or changes its `status` / `final_price` applies a small
+delta to `order_rollup` inside the same transaction, so the dashboard reads a handful of
+(day, status) rows instead of scanning `order`. If the table ever drifts (manual SQL,
+a write path that bypassed these helpers), rebuild it from scratch:
+
+    python -m app.services.rollups rebuild
+"""
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import sys
+
+from sqlalchemy import case, delete, func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.order import Order
+from app.models.rollup import OrderRollup
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_STATUS = "unknown"
+
+# (status, final_price) of an order before a write; None for an order that doesn't exist yet
+Snapshot = Optional[Tuple[Optional[str], Optional[float]]]
+
+
+def snapshot(order: Order) -> Snapshot:
+    """Capture the rollup-relevant fields before mutating an order (load it with `lock_order` first)."""
+    return (order.status, order.final_price)
+
+
+async def lock_order(session: AsyncSession, order_id: int) -> Optional[Order]:
+    """Reload an order with SELECT ... FOR UPDATE for a write whose rollup delta diffs against it.
+
+    Without the row lock, two concurrent writes to one order (a double submit, an n8n retry) both
+    snapshot the same old state and apply the same delta twice. The lock is held until commit;
+    SQLite ignores FOR UPDATE.
+    """
+    return await session.get(Order, order_id, with_for_update=True, populate_existing=True)
+
+
+def lock_order_sync(session: Session, order_id: int) -> Optional[Order]:
+    return session.get(Order, order_id, with_for_update=True, populate_existing=True)
+
+
+def _day(created: Optional[datetime]) -> date:
+    created = created or datetime.now(timezone.utc)
+    if created.tzinfo is None:
+        return created.date()
+    return created.astimezone(timezone.utc).date()
+
+
+def deltas_for_values(
+    created_at: Optional[datetime], before: Snapshot, status: Optional[str], final_price: Optional[float]
+) -> List[Dict[str, Any]]:
+    """Rollup deltas for a write given column values (bulk paths that never load an Order instance)."""
+    day = _day(created_at)
+    new_status = status or UNKNOWN_STATUS
+    new_price = float(final_price or 0)
+    if before is None:
+        return [{"day": day, "status": new_status, "order_count": 1, "revenue": new_price}]
+
+    old_status = before[0] or UNKNOWN_STATUS
+    old_price = float(before[1] or 0)
+    if old_status == new_status:
+        if old_price == new_price:
+            return []
+        return [{"day": day, "status": new_status, "order_count": 0, "revenue": new_price - old_price}]
+    return [
+        {"day": day, "status": old_status, "order_count": -1, "revenue": -old_price},
+        {"day": day, "status": new_status, "order_count": 1, "revenue": new_price},
+    ]
+
+
+def deltas_for(order: Order, before: Snapshot) -> List[Dict[str, Any]]:
+    """Rollup deltas produced by one order write (`before` is None for a new order)."""
+    return deltas_for_values(order.created_at, before, order.status, order.final_price)
+
+
+def _upsert_stmt(dialect_name: str):
+    # Atomic increment: concurrent writers touching the same (day, status) row never lose updates
+    dialect = sqlite if dialect_name == "sqlite" else postgresql
+    stmt = dialect.insert(OrderRollup)
+    return stmt.on_conflict_do_update(
+        index_elements=[OrderRollup.day, OrderRollup.status],
+        set_={
+            "order_count": OrderRollup.order_count + stmt.excluded.order_count,
+            "revenue": OrderRollup.revenue + stmt.excluded.revenue,
+        },
+    )
+
+
+def merge_deltas(deltas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collapse deltas for the same (day, status) so bulk writes issue one row per bucket."""
+    merged: Dict[Tuple[date, str], Dict[str, Any]] = {}
+    for d in deltas:
+        key = (d["day"], d["status"])
+        if key in merged:
+            merged[key]["order_count"] += d["order_count"]
+            merged[key]["revenue"] += d["revenue"]
+        else:
+            merged[key] = dict(d)
+    return [d for d in merged.values() if d["order_count"] or d["revenue"]]
+
+
+async def apply_deltas(session: AsyncSession, deltas: List[Dict[str, Any]]) -> None:
+    if deltas:
+        await session.execute(_upsert_stmt(session.bind.dialect.name), deltas)
+
+
+def apply_deltas_sync(session: Session, deltas: List[Dict[str, Any]]) -> None:
+    if deltas:
+        session.execute(_upsert_stmt(session.get_bind().dialect.name), deltas)
+
+
+async def record_change(session: AsyncSession, order: Order, before: Snapshot) -> None:
+    """Apply the rollup delta for one order write. Call before the commit of that write."""
+    await apply_deltas(session, deltas_for(order, before))
+
+
+def record_change_sync(session: Session, order: Order, before: Snapshot) -> None:
+    apply_deltas_sync(session, deltas_for(order, before))
+
+
+def rollup_filters(start: Optional[date], end: Optional[date], status: Optional[List[str]]) -> list:
+    clauses = []
+    if start is not None:
+        clauses.append(OrderRollup.day >= start)
+    if end is not None:
+        clauses.append(OrderRollup.day <= end)
+    if status:
+        clauses.append(OrderRollup.status.in_(status))
+    return clauses
+
+
+def summary_stmt(start: Optional[date] = None, end: Optional[date] = None, status: Optional[List[str]] = None):
+    return select(
+        func.coalesce(func.sum(OrderRollup.order_count), 0),
+        func.coalesce(func.sum(OrderRollup.revenue), 0),
+        func.coalesce(func.sum(case((OrderRollup.status == "needs_review", OrderRollup.order_count), else_=0)), 0),
+    ).where(*rollup_filters(start, end, status))
+
+
+def stats_stmt(start: Optional[date] = None, end: Optional[date] = None, status: Optional[List[str]] = None):
+    return (
+        select(OrderRollup.status, func.sum(OrderRollup.order_count))
+        .where(*rollup_filters(start, end, status))
+        .group_by(OrderRollup.status)
+        .having(func.sum(OrderRollup.order_count) != 0)
+    )
+
+
+def rebuild(session: Session) -> int:
+    """Recompute every rollup row from `order` in one transaction. Returns the number of rows written."""
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        # Block concurrent deltas until the recomputed rows are committed (they then apply on top)
+        session.execute(text("LOCK TABLE order_rollup IN EXCLUSIVE MODE"))
+    # Orders without created_at count on today's UTC date, as in the write path (_day); the same
+    # expression is selected and grouped on, so they share a row with today's orders
+    created_expr = func.coalesce(Order.created_at, func.now())
+    if dialect_name == "postgresql":
+        day_expr = func.date(func.timezone("UTC", created_expr))
+    else:
+        day_expr = func.date(created_expr)
+
+    status_expr = func.coalesce(Order.status, UNKNOWN_STATUS)
+    source = (
+        select(
+            day_expr,
+            status_expr,
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.final_price), 0),
+        )
+        .group_by(day_expr, status_expr)
+    )
+    session.execute(delete(OrderRollup))
+    result = session.execute(
+        insert(OrderRollup).from_select(["day", "status", "order_count", "revenue"], source)
+    )
+    session.commit()
+    return result.rowcount or 0
+
+
+def is_empty(session: Session) -> bool:
+    return session.execute(select(OrderRollup.day).limit(1)).first() is None
+
+
+if __name__ == "__main__":
+    from app.db.session import get_session
+
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["rebuild"]:
+        print("usage: python -m app.services.rollups rebuild", file=sys.stderr)
+        sys.exit(2)
+    with get_session() as s:
+        written = rebuild(s)
+    logger.info("Rebuilt order_rollup: %s rows", written)
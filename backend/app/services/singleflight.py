@@ -0,0 +1,88 @@
+"""Coalesce identical concurrent calls into one execution ("single flight").
+
+The first caller for a key (the leader) starts the work; callers arriving while it is in
+flight wait on the same result instead of starting their own, and every waiter gets the
+result or the exception. Nothing is cached: once the call finishes, the next caller for the
+key starts a new one. Used to collapse duplicate LLM parses from double submits and webhook
+retries.
+"""
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+import asyncio
+import threading
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._lock = threading.Lock()
+        # Async calls are keyed per event loop: a task can only be awaited on its own loop
+        self._tasks: Dict[Tuple[int, Hashable], "asyncio.Task"] = {}
+        self._futures: Dict[Hashable, Future] = {}
+        self.leaders = 0
+        self.collapsed = 0
+        self.errors = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await `fn()` once per key across concurrent callers on this event loop."""
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                self.leaders += 1
+                # A task, not the leader's own coroutine: cancelling the leader's request must not
+                # cancel the work the other waiters depend on
+                task = loop.create_task(fn())
+                self._tasks[task_key] = task
+                task.add_done_callback(lambda t, k=task_key: self._finish_task(k, t))
+            else:
+                self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _finish_task(self, key: Tuple[int, Hashable], task: "asyncio.Task") -> None:
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+            # Mark the exception retrieved even if every waiter was cancelled
+            if not task.cancelled() and task.exception() is not None:
+                self.errors += 1
+
+    def do_sync(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Thread version of `do`: concurrent callers in other threads block on the leader's result."""
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                self.leaders += 1
+                future = self._futures[key] = Future()
+            else:
+                self.collapsed += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+                del self._futures[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._futures[key]
+        future.set_result(result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.leaders + self.collapsed
+            return {
+                "in_flight": len(self._tasks) + len(self._futures),
+                "leaders": self.leaders,
+                "collapsed": self.collapsed,
+                "collapsed_ratio": round(self.collapsed / calls, 4) if calls else None,
+                "errors": self.errors,
+            }
@@ -0,0 +1,229 @@
+"""Single-pass scanner behind the heuristic spec parser.
+
+All patterns are compiled once at import. `SpecScanner.scan` walks the lowercased text with one
+tokenizing regex that yields every digit run plus every vocabulary keyword (the keywords are
+compiled into a single trie-shaped pattern, so adding products or finishes adds no passes).
+Field rules that need more context (size, colour, turnaround, paper code) are checked with
+anchored matches at the digit run that starts them. First matches win, exactly as the earlier
+per-field `re.search` calls did.
+
+The product / finishing / rush / intent / unit vocabulary can be replaced with a JSON file named by
+PARSER_VOCAB_PATH, e.g.
+
+    {"products": {"business_card": ["card"], "flyer": ["flyer", "leaflet"], "poster": ["poster"]},
+     "finishing": {"lamination": ["lamination"], "foil": ["foil", "hot foil"]}}
+
+Products are checked in the listed order (the first one present wins); finishes are reported in
+the listed order. Categories missing from the file keep their defaults.
+
+Besides the first match per field, `scan` returns the evidence the cascade parser rates its
+confidence on: every size, paper code and product seen, and every explicit quantity (a number
+after a label such as "qty:" or before a unit word or product keyword).
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+PARSER_VOCAB_PATH = os.getenv("PARSER_VOCAB_PATH")
+
+DEFAULT_VOCAB: Dict[str, Any] = {
+    # label -> substrings; first label present wins
+    "products": {
+        "business_card": ["card"],
+        "flyer": ["flyer"],
+    },
+    # label -> substrings; reported in this order
+    "finishing": {
+        "lamination": ["lamination"],
+        "spot_uv": ["spot uv", "spot_uv", "spotuv"],
+        "die_cut": ["die cut", "die_cut"],
+    },
+    # whole words
+    "rush": ["rush", "urgent"],
+    # substrings that mark short texts as real orders rather than gibberish
+    "intent": ["print", "flyer", "business", "card", "please", "brochure"],
+    # substrings that make a number before them an explicit quantity (product keywords count too)
+    "units": ["pcs", "pieces", "units", "copies", "brochure", "leaflet", "poster"],
+}
+
+# Whole-word-start labels that make the number after them an explicit quantity
+QUANTITY_LABELS = ("qty", "quantity", "print", "of")
+
+# Anchored follow-up patterns, applied at a digit run
+SIZE_AT_RE = re.compile(r"\d{2,4}\s*[x×]\s*\d{2,4}(?:mm)?")
+DIGITS_AT_RE = re.compile(r"\d+")
+DAY_AFTER_RE = re.compile(r"\s*day")
+LABELLED_QTY_AT_RE = re.compile(r"\s*:?\s*(\d{1,6})\b")
+WORD_CHAR_RE = re.compile(r"\w")
+
+
+def load_vocab(path: Optional[str] = PARSER_VOCAB_PATH) -> Dict[str, Any]:
+    vocab = dict(DEFAULT_VOCAB)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            vocab.update(json.load(f))
+        logger.info("Loaded parser vocabulary from %s", path)
+    return vocab
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Regex alternation shaped as a trie; greedy, so the longest keyword at a position wins."""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        ends = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if ends else body
+
+    return build(trie)
+
+
+class SpecScanner:
+    def __init__(self, vocab: Optional[Dict[str, Any]] = None):
+        vocab = vocab or DEFAULT_VOCAB
+        self.products: List[str] = list(vocab["products"])
+        self.finishing: List[str] = list(vocab["finishing"])
+
+        # keyword -> [(category, label, whole_word)]
+        entries: Dict[str, List[Tuple[str, str, bool]]] = {}
+        for category in ("products", "finishing"):
+            for label, words in vocab[category].items():
+                for w in words:
+                    entries.setdefault(w.lower(), []).append((category, label, False))
+        for w in vocab["rush"]:
+            entries.setdefault(w.lower(), []).append(("rush", "rush", True))
+        for w in vocab["intent"]:
+            entries.setdefault(w.lower(), []).append(("intent", "intent", False))
+        for w in QUANTITY_LABELS:
+            entries.setdefault(w, []).append(("label", "label", False))
+        units = sorted({w.lower() for w in vocab["units"]} | {w.lower() for ws in vocab["products"].values() for w in ws})
+        for w in list(entries) + units:
+            if not w or w[0].isdigit():
+                raise ValueError(f"parser keyword {w!r} must be non-empty and must not start with a digit")
+
+        # The tokenizer reports the longest keyword at each position; shorter keywords that are
+        # prefixes of it start there too, so every match carries their hits as well
+        self._hits: Dict[str, List[Tuple[str, str, bool, int]]] = {
+            w: [(cat, label, whole, len(p)) for p in entries if w.startswith(p) for cat, label, whole in entries[p]]
+            for w in entries
+        }
+        # Keywords are zero-width lookaheads, so overlapping ones are all seen; digit runs are
+        # consumed. Until the quantity is found every digit run is a token; after that only runs
+        # that can start another field or be an explicit quantity are (after "c", or before
+        # x / "/" / "day" / a unit), so number-heavy tables cost no Python work
+        keywords = r"(?=(?P<kw>%s))" % _trie_pattern(sorted(entries))
+        unit = _trie_pattern(units)
+        self._unit_at_re = re.compile(r"\s*(?:%s)" % unit)
+        self._token_re = re.compile(keywords + r"|(?P<num>\d+)")
+        self._field_token_re = re.compile(
+            keywords + r"|c(?P<cnum>\d++)|(?P<num>\d++(?=\s*+(?:[x×/]|day|%s)))" % unit
+        )
+
+    def patterns(self) -> Tuple[str, ...]:
+        """Every pattern the scan depends on (vocabulary included), for cache versioning."""
+        return (
+            self._token_re.pattern, self._field_token_re.pattern, self._unit_at_re.pattern,
+            SIZE_AT_RE.pattern, DAY_AFTER_RE.pattern, LABELLED_QTY_AT_RE.pattern, " ".join(self.products),
+        )
+
+    def scan(self, text: str) -> Dict[str, Any]:
+        """First quantity/size/paper/colour/turnaround match plus vocabulary hits, in one pass.
+
+        `evidence` lists every match of the critical fields in text order, repeats included; its
+        "quantity" holds only explicit quantities (labelled or followed by a unit).
+        """
+        txt = (text or "").lower()
+        n = len(txt)
+        quantity = color = turnaround = None
+        rush = False
+        found = {"products": set(), "finishing": set(), "intent": set()}
+        quantities: List[int] = []
+        sizes: List[str] = []
+        papers: List[str] = []
+        size_end = 0
+
+        def word_at(pos: int) -> bool:
+            return 0 <= pos < n and WORD_CHAR_RE.match(txt, pos) is not None
+
+        pos, pattern = 0, self._token_re
+        while pattern is not None:
+            matches, pattern = pattern.finditer(txt, pos), None
+            for m in matches:
+                kind = m.lastgroup
+                i, j = m.span(kind)
+                if kind == "kw":
+                    kw = m.group("kw")
+                    for category, label, whole, length in self._hits[kw]:
+                        if whole and (word_at(i - 1) or word_at(i + length)):
+                            continue
+                        if category == "rush":
+                            rush = True
+                        elif category == "label":
+                            # \b(?:qty|quantity|print|of)\s*:?\s*(\d{1,6})\b
+                            lm = None if word_at(i - 1) else LABELLED_QTY_AT_RE.match(txt, i + length)
+                            if lm:
+                                quantities.append(int(lm.group(1)))
+                        else:
+                            found[category].add(label)
+                    continue
+
+                bounded_before = not word_at(i - 1)
+                bounded_after = not word_at(j)
+                # \d{2,4}\s*[x×]\s*\d{2,4}(?:mm)? -- leftmost start is within the run's last 4 digits;
+                # matches do not overlap, as with findall
+                start = max(i, j - 4)
+                if j - start >= 2 and start >= size_end:
+                    sm = SIZE_AT_RE.match(txt, start)
+                    if sm:
+                        sizes.append(sm.group(0).replace(" ", ""))
+                        size_end = sm.end()
+                # \b(c\d{3})\b
+                if j - i == 3 and bounded_after and i >= 1 and txt[i - 1] == "c" and not word_at(i - 2):
+                    papers.append("C" + txt[i:j])
+                # \b(\d+/\d+)\b
+                if color is None and bounded_before and j < n and txt[j] == "/":
+                    dm = DIGITS_AT_RE.match(txt, j + 1)
+                    if dm and not word_at(dm.end()):
+                        color = txt[i:dm.end()]
+                # (\d{1,3})\s*(day|days)
+                if turnaround is None and DAY_AFTER_RE.match(txt, j):
+                    turnaround = int(txt[max(i, j - 3):j])
+                # \b(\d{1,6})\s*(?:<unit>)
+                if bounded_before and j - i <= 6 and self._unit_at_re.match(txt, j):
+                    quantities.append(int(txt[i:j]))
+                # \b(\d{1,6})\b
+                if quantity is None and bounded_before and bounded_after and j - i <= 6:
+                    quantity = int(txt[i:j])
+                    # Only field-starting runs matter from here: switch to the lean tokenizer
+                    pos, pattern = j, self._field_token_re
+                    break
+
+        products = [p for p in self.products if p in found["products"]]
+        return {
+            "text": txt,
+            "quantity": quantity,
+            "size": sizes[0] if sizes else None,
+            "paper_type": papers[0] if papers else None,
+            "color": color,
+            "turnaround_days": turnaround,
+            "rush": rush,
+            "product_type": products[0] if products else None,
+            "finishing": [f for f in self.finishing if f in found["finishing"]],
+            "intent": bool(found["intent"]),
+            "evidence": {"quantity": quantities, "size": sizes, "paper_type": papers, "product_type": products},
+        }
+
+
+default_scanner = SpecScanner(load_vocab())
@@ -0,0 +1,218 @@
+"""Token-budgeted reduction of order text before it goes to the LLM.
+
+Intake appends the full PDF / OCR output to `raw_text`, so a 40-page artwork PDF would become a
+40-page prompt. Texts within `LLM_INPUT_TOKEN_BUDGET` estimated tokens are sent unchanged. Longer
+ones are reduced:
+
+1. Lines repeated across pages (headers, footers, page numbers; pages are split on the form feeds
+   pdfminer emits) are dropped, or kept once if they carry spec data. Repeats of lines seen three
+   or more times are dropped, as are boilerplate lines (disclaimers, signatures, URLs) and lines
+   without any letters or digits.
+2. The rest is cut into segments (blocks between blank lines, long blocks split every
+   SEGMENT_MAX_LINES lines), and each segment is scored on spec signals: quantities,
+   dimensions, stock codes, colours, finishes, turnaround.
+3. The best-scoring segments (by score per token, the opening segment preferred) are kept in
+   their original order until the budget is used; gaps are marked with "[...]".
+
+The stored `raw_text` is never changed; only the LLM input is reduced.
+"""
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Tuple
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Estimated tokens of order text sent to the LLM per call; 0 disables reduction
+LLM_INPUT_TOKEN_BUDGET = int(os.getenv("LLM_INPUT_TOKEN_BUDGET", "2000"))
+SEGMENT_MAX_LINES = 8
+# Part of every prompt version: changing how inputs are reduced invalidates cached parses
+REDUCER_VERSION = "1:%d" % LLM_INPUT_TOKEN_BUDGET
+
+GAP_MARKER = "[...]"
+
+BOILERPLATE_RE = re.compile(
+    r"confidential|intended (?:only )?for the (?:named )?(?:recipient|addressee)|received this (?:e-?mail|message) in error"
+    r"|unsubscribe|privacy (?:policy|notice)|all rights reserved|copyright|©|sent from my (?:iphone|ipad|android|mobile)"
+    r"|do not reply|registered (?:office|in)|company (?:no|number|registration)|vat (?:no|number|reg)"
+    r"|terms and conditions|https?://|www\.",
+    re.I,
+)
+ALNUM_RE = re.compile(r"[^\W_]")
+DIGITS_RE = re.compile(r"\d+")
+WHITESPACE_RE = re.compile(r"\s+")
+
+# (pattern, weight); each pattern counts at most three times per segment
+SPEC_SIGNALS = (
+    (re.compile(r"\b\d{1,6}\s*(?:pcs|pieces|copies|units|sheets?|flyers?|cards?|business cards?|brochures?|leaflets?|posters?)\b", re.I), 3),
+    (re.compile(r"\b(?:qty|quantity|quantities|print run)\b", re.I), 2),
+    (re.compile(r"\d{2,4}\s*[x×]\s*\d{2,4}", re.I), 3),
+    (re.compile(r"\b(?:a[0-7]|dl)\b|\bsize\b|\bformat\b", re.I), 1),
+    (re.compile(r"\bc\d{3}\b|\b\d{2,3}\s*gsm\b|\b(?:matte?|gloss|silk|uncoated|coated)\b", re.I), 2),
+    (re.compile(r"\b\d/\d\b|\bcmyk\b|\bpantone\b", re.I), 2),
+    (re.compile(r"laminat|spot[ _]?uv|die[ _]cut|\bfoil|emboss", re.I), 2),
+    (re.compile(r"\b\d{1,3}\s*(?:working\s+)?days?\b|\brush\b|\burgent\b|\bdeadline\b", re.I), 2),
+    (re.compile(r"\b(?:print|flyers?|business cards?|brochures?|leaflets?|posters?|stock|paper|finish(?:ing)?)\b", re.I), 1),
+)
+
+
+class Reduction(NamedTuple):
+    text: str
+    tokens_in: int
+    tokens_out: int
+    segments_kept: int
+    segments_total: int
+    lines_dropped: int
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English order text
+    return len(text or "") // 4 + 1
+
+
+def reduce_text(text: str, budget: int = LLM_INPUT_TOKEN_BUDGET) -> Reduction:
+    """Reduce `text` to about `budget` estimated tokens (unchanged when it already fits)."""
+    text = text or ""
+    tokens_in = estimate_tokens(text)
+    if budget <= 0 or tokens_in <= budget:
+        return Reduction(text, tokens_in, tokens_in, 1, 1, 0)
+
+    lines, dropped = _clean_lines(text)
+    segments = _segments(lines)
+    cleaned = "\n".join(lines)
+    if estimate_tokens(cleaned) <= budget:
+        return Reduction(cleaned, tokens_in, estimate_tokens(cleaned), len(segments), len(segments), dropped)
+
+    kept = _select(segments, budget)
+    parts: List[str] = []
+    previous = -1
+    for index in kept:
+        if parts and index != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(segments[index])
+        previous = index
+    if not kept and segments:
+        # Even the best segment is over budget on its own: keep as much of its start as fits
+        parts.append(segments[max(range(len(segments)), key=lambda i: _score(segments[i]))][: budget * 4 - 1])
+    reduced = "\n".join(parts)
+    return Reduction(reduced, tokens_in, estimate_tokens(reduced), max(len(kept), 1 if parts else 0), len(segments), dropped)
+
+
+def _clean_lines(text: str) -> Tuple[List[str], int]:
+    """Lines with page furniture, repeated lines and boilerplate removed (blank lines kept as separators)."""
+    pages = text.split("\f")
+    page_repeats: set = set()
+    if len(pages) >= 3:
+        # Header/footer lines: the same line (page numbers folded) on at least half of the pages
+        seen_on = Counter()
+        for page in pages:
+            seen_on.update({_fold(line) for line in page.splitlines() if line.strip()})
+        threshold = max(3, len(pages) // 2)
+        page_repeats = {line for line, pages_seen in seen_on.items() if pages_seen >= threshold}
+
+    all_lines = text.replace("\f", "\n\n").splitlines()
+    counts = Counter(WHITESPACE_RE.sub(" ", line).strip().lower() for line in all_lines if line.strip())
+    emitted: set = set()
+    out: List[str] = []
+    dropped = 0
+    for line in all_lines:
+        stripped = line.strip()
+        if not stripped:
+            if out and out[-1]:
+                out.append("")
+            continue
+        key = WHITESPACE_RE.sub(" ", stripped).lower()
+        folded = _fold(stripped)
+        if (
+            not ALNUM_RE.search(stripped)
+            or BOILERPLATE_RE.search(stripped)
+            or (counts[key] >= 3 and key in emitted)
+            # Page furniture goes entirely, unless it carries spec data (kept once)
+            or (folded in page_repeats and (folded in emitted or not _score(stripped)))
+        ):
+            dropped += 1
+            continue
+        emitted.update((key, folded))
+        out.append(stripped)
+    while out and not out[-1]:
+        out.pop()
+    return out, dropped
+
+
+def _fold(line: str) -> str:
+    return DIGITS_RE.sub("#", WHITESPACE_RE.sub(" ", line).strip().lower())
+
+
+def _segments(lines: List[str]) -> List[str]:
+    segments: List[str] = []
+    block: List[str] = []
+    for line in lines + [""]:
+        if line:
+            block.append(line)
+            if len(block) < SEGMENT_MAX_LINES:
+                continue
+        if block:
+            segments.append("\n".join(block))
+            block = []
+    return segments
+
+
+def _score(segment: str) -> int:
+    return sum(weight * min(len(rx.findall(segment)), 3) for rx, weight in SPEC_SIGNALS)
+
+
+def _select(segments: List[str], budget: int) -> List[int]:
+    """Indexes of the segments to keep, in original order."""
+    ranked: List[Tuple[float, int, int]] = []
+    for index, segment in enumerate(segments):
+        score = _score(segment)
+        if index == 0:
+            # The typed part of an order comes first (intake appends attachments after it)
+            score = score * 1.5 + 1
+        tokens = estimate_tokens(segment)
+        ranked.append((score / tokens ** 0.5, index, tokens))
+    ranked.sort(key=lambda r: (-r[0], r[1]))
+
+    kept: List[int] = []
+    used = 0
+    for rank, index, tokens in ranked:
+        if rank <= 0:
+            break
+        # Each gap marker costs a couple of tokens
+        if used + tokens + 2 <= budget:
+            kept.append(index)
+            used += tokens + 2
+    return sorted(kept)
+
+
+class ReductionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.texts = 0
+        self.reduced = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def record(self, reduction: Reduction) -> None:
+        with self._lock:
+            self.texts += 1
+            self.tokens_in += reduction.tokens_in
+            self.tokens_out += reduction.tokens_out
+            if reduction.tokens_out < reduction.tokens_in:
+                self.reduced += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "token_budget": LLM_INPUT_TOKEN_BUDGET,
+                "texts": self.texts,
+                "reduced": self.reduced,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "tokens_saved": self.tokens_in - self.tokens_out,
+            }
+
+
+reduction_stats = ReductionStats()
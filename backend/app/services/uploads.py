@@ -0,0 +1,111 @@
+"""Size-bounded upload handling for intake.
+
+Two limits keep memory and disk per upload bounded regardless of what the client sends:
+
+- `UploadLimitMiddleware` counts request body bytes as they arrive on the upload routes and
+  answers 413 as soon as the body passes `MAX_UPLOAD_BYTES` (plus a little room for the form
+  fields), or straight away when `Content-Length` already says so. The multipart parser spools
+  file parts to disk past 1 MB, so the body is never held in memory whole.
+- `spool_upload` copies the parsed file part to a named temporary file in `UPLOAD_CHUNK_BYTES`
+  chunks, enforcing `MAX_UPLOAD_BYTES` on the file itself. Extractors open that path (the
+  extraction pool's processes cannot share the request's file object) and read it
+  incrementally instead of receiving a bytes copy. The SHA-256 of the file is computed on the
+  way (the extraction cache key).
+"""
+from typing import Iterable, NamedTuple, Optional
+import hashlib
+import os
+import tempfile
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+# Allowance for multipart boundaries, part headers and the text form fields
+FORM_OVERHEAD_BYTES = 256 * 1024
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int = MAX_UPLOAD_BYTES):
+        super().__init__(f"upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+def _too_large_detail(max_bytes: int) -> str:
+    return f"Upload exceeds {max_bytes} bytes"
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware rejecting request bodies over `max_bytes` + form overhead on `paths`."""
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+        self.limit = max_bytes + FORM_OVERHEAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or self.max_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope.get("headers") or ()).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.limit:
+            response = JSONResponse({"detail": _too_large_detail(self.max_bytes)}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    # Raised inside body parsing; FastAPI passes HTTPException through as the response
+                    raise HTTPException(status_code=413, detail=_too_large_detail(self.max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def spool_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """Copy an upload to a temporary file in chunks; returns its path (caller deletes it), size and SHA-256.
+
+    Raises UploadTooLarge (and removes the partial file) once more than `max_bytes` were read.
+    """
+    suffix = os.path.splitext(file.filename or "")[1][:16]
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix, dir=UPLOAD_TMP_DIR)
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes > 0 and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        remove_spooled(path)
+        raise
+    return SpooledUpload(path, size, digest.hexdigest())
+
+
+def remove_spooled(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
@@ -1,12 +1,16 @@
 import requests
 import logging
 import os
+import queue
+import threading
 import time
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_N8N = os.getenv("N8N_WEBHOOK_URL", "http://n8n:5678/webhook-test/ai-estimator")
+WORKFLOW_QUEUE_MAX = int(os.getenv("WORKFLOW_QUEUE_MAX", "10000"))
+WORKFLOW_QUEUE_WORKERS = int(os.getenv("WORKFLOW_QUEUE_WORKERS", "4"))
 
 class WorkflowClient:
     def __init__(self, webhook_url: str = None, max_retries: int = 3):
@@ -66,3 +70,79 @@ class WorkflowClient:
                 continue
             logger.exception("All attempts to trigger workflow failed after trying candidates: %s", candidates)
             return False
+
+
+class WorkflowQueue:
+    """Bounded in-process queue of workflow webhook payloads drained by background threads.
+
+    Used by bulk paths so that persisting a batch never waits on n8n. Payloads still queued when
+    the process exits are lost; n8n updates are idempotent per order, so re-running the estimate
+    re-sends them.
+    """
+
+    def __init__(self, max_size: int = WORKFLOW_QUEUE_MAX, workers: int = WORKFLOW_QUEUE_WORKERS, client: Optional[WorkflowClient] = None):
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_size)
+        self._workers = workers
+        self._client = client
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self._workers):
+                t = threading.Thread(target=self._run, name=f"workflow-queue-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _run(self) -> None:
+        client = self._client or WorkflowClient()
+        while True:
+            payload = self._queue.get()
+            try:
+                ok = client.trigger(payload)
+            except Exception as e:
+                logger.exception("Queued workflow trigger failed: %s", e)
+                ok = False
+            with self._lock:
+                if ok:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+            self._queue.task_done()
+
+    def enqueue(self, payload: Dict[str, Any]) -> bool:
+        """Queue a payload without blocking. Returns False (and counts a drop) when the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.error("Workflow queue full; dropped payload for order_id=%s", payload.get("order_id"))
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "max_size": self._queue.maxsize,
+                "workers": self._workers,
+                "enqueued": self.enqueued,
+                "sent": self.sent,
+                "failed": self.failed,
+                "dropped": self.dropped,
+            }
+
+
+workflow_queue = WorkflowQueue()
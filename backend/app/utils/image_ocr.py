@@ -1,16 +1,9 @@
-from typing import Optional
+from typing import Union
 
-# Minimal OCR implementation trying pytesseract, falls back to empty string
+from app.utils.image_pipeline import analyze_image
 
-def ocr_image(content: bytes) -> str:
-    try:
-        from PIL import Image
-        import pytesseract
-        from io import BytesIO
-
-        img = Image.open(BytesIO(content))
-        text = pytesseract.image_to_string(img)
-        return text or ""
-    except Exception:
-        return ""
+# OCR via the single-pass image pipeline (pytesseract when installed), falls back to empty string
 
+def ocr_image(source: Union[bytes, str]) -> str:
+    """OCR text of an image given as bytes or a file path (see `analyze_image` for DPI and timings too)."""
+    return analyze_image(source).text
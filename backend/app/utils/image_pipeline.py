@@ -0,0 +1,145 @@
+"""Single-pass image analysis for intake: DPI, OCR input preparation and OCR.
+
+The image is opened once. DPI comes from the header metadata (no pixel decode). The pixels are
+then decoded straight to greyscale at the resolution tesseract needs: scans above
+`OCR_TARGET_DPI` are scaled down to it (JPEGs are decoded at 1/2, 1/4 or 1/8 scale by libjpeg,
+so a 600 dpi poster never exists at full size in memory), images without DPI metadata are only
+capped at `IMAGE_MAX_PIXELS`, and nothing is scaled up. With `OCR_BINARIZE` the greyscale image
+is thresholded (Otsu) before OCR. Tesseract is told the effective DPI.
+"""
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+import os
+import time
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+# Images above this many pixels are downscaled before OCR (0 = no limit)
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "40000000"))
+# Resolution images are reduced to for OCR (0 = keep the scanned resolution)
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+OCR_BINARIZE = os.getenv("OCR_BINARIZE", "false").lower() in ("1", "true", "yes")
+
+DEFAULT_DPI = (72, 72)
+
+
+class ImageAnalysis(NamedTuple):
+    text: str
+    # (xdpi, ydpi) from the header; DEFAULT_DPI when the image has none
+    dpi: Tuple[int, int]
+    size: Tuple[int, int]
+    ocr_size: Tuple[int, int]
+    timings_ms: Dict[str, float]
+
+
+def header_dpi(img: Any) -> Optional[Tuple[int, int]]:
+    """DPI recorded in an opened image's metadata, or None."""
+    dpi = img.info.get("dpi")
+    if dpi and isinstance(dpi, tuple) and dpi[0] and dpi[1]:
+        # PIL reports inch-based DPI converted from metric units (e.g. 299.9994)
+        return (int(round(dpi[0])), int(round(dpi[1])))
+    return None
+
+
+def ocr_size(size: Tuple[int, int], dpi: Optional[Tuple[int, int]], target_dpi: int = OCR_TARGET_DPI, max_pixels: int = IMAGE_MAX_PIXELS) -> Tuple[int, int]:
+    """Size to OCR an image of `size` at: reduced to `target_dpi` and `max_pixels`, never enlarged."""
+    width, height = size
+    scale = 1.0
+    if dpi and target_dpi > 0 and min(dpi) > target_dpi:
+        scale = target_dpi / min(dpi)
+    if max_pixels and width * height * scale * scale > max_pixels:
+        scale = (max_pixels / (width * height)) ** 0.5
+    return (max(1, int(width * scale)), max(1, int(height * scale)))
+
+
+@lru_cache(maxsize=1)
+def _tesseract_version() -> str:
+    try:
+        import pytesseract
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return "none"
+
+
+def extractor_version() -> str:
+    """Identifies what `analyze_image` produces (settings and tesseract build); part of extraction cache keys."""
+    return "image:1:%d:%d:%d:tesseract-%s" % (OCR_TARGET_DPI, IMAGE_MAX_PIXELS, OCR_BINARIZE, _tesseract_version())
+
+
+def _otsu_threshold(img: Any) -> int:
+    histogram = img.histogram()[:256]
+    total = sum(histogram)
+    sum_all = sum(i * count for i, count in enumerate(histogram))
+    sum_below = weight_below = 0
+    best, threshold = -1.0, 127
+    for level, count in enumerate(histogram):
+        weight_below += count
+        if not weight_below or weight_below == total:
+            continue
+        sum_below += level * count
+        weight_above = total - weight_below
+        mean_below = sum_below / weight_below
+        mean_above = (sum_all - sum_below) / weight_above
+        between = weight_below * weight_above * (mean_below - mean_above) ** 2
+        if between > best:
+            best, threshold = between, level
+    return threshold
+
+
+def analyze_image(
+    source: Union[bytes, str],
+    target_dpi: int = OCR_TARGET_DPI,
+    max_pixels: int = IMAGE_MAX_PIXELS,
+    binarize: bool = OCR_BINARIZE,
+) -> ImageAnalysis:
+    """Text, DPI and sizes of an image (bytes or file path), decoding it once.
+
+    Never raises: an unreadable image gives empty text and DEFAULT_DPI, a missing tesseract
+    empty text with the real DPI.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    if Image is None:
+        return ImageAnalysis("", DEFAULT_DPI, (0, 0), (0, 0), timings)
+    try:
+        img = Image.open(BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    except Exception:
+        return ImageAnalysis("", DEFAULT_DPI, (0, 0), (0, 0), timings)
+    with img:
+        dpi = header_dpi(img)
+        size = img.size
+        timings["header_ms"] = (time.perf_counter() - started) * 1000
+
+        mark = time.perf_counter()
+        target = ocr_size(size, dpi, target_dpi, max_pixels)
+        try:
+            # JPEG: decode greyscale at the smallest 1/2^n scale still at least `target`
+            img.draft("L", target)
+            gray = img.convert("L")
+            # Within 10% of the target (typical after a JPEG draft) is close enough for OCR
+            if gray.width > target[0] * 1.1:
+                gray = gray.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            if binarize:
+                threshold = _otsu_threshold(gray)
+                gray = gray.point(lambda v: 255 if v > threshold else 0, mode="1")
+        except Exception:
+            return ImageAnalysis("", dpi or DEFAULT_DPI, size, (0, 0), timings)
+        timings["prepare_ms"] = (time.perf_counter() - mark) * 1000
+
+    mark = time.perf_counter()
+    text = ""
+    try:
+        import pytesseract
+
+        effective_dpi = int(min(dpi) * gray.width / size[0]) if dpi else 0
+        config = f"--dpi {effective_dpi}" if effective_dpi >= 70 else ""
+        text = pytesseract.image_to_string(gray, config=config) or ""
+    except Exception:
+        pass
+    timings["ocr_ms"] = (time.perf_counter() - mark) * 1000
+    timings["total_ms"] = (time.perf_counter() - started) * 1000
+    return ImageAnalysis(text, dpi or DEFAULT_DPI, size, gray.size, {k: round(v, 3) for k, v in timings.items()})
@@ -1,5 +1,7 @@
 from io import BytesIO
-from typing import Tuple
+from typing import Tuple, Union
+
+from app.utils.image_pipeline import DEFAULT_DPI, header_dpi
 
 try:
     from PIL import Image
@@ -7,15 +9,12 @@ except Exception:
     Image = None
 
 
-def get_image_dpi(content: bytes) -> Tuple[int, int]:
-    """Return (xdpi, ydpi). Fall back to (72,72) if not available."""
+def get_image_dpi(source: Union[bytes, str]) -> Tuple[int, int]:
+    """Return (xdpi, ydpi) of image bytes or a file path (only the header is read). Fall back to (72,72) if not available."""
     if Image is None:
-        return (72, 72)
+        return DEFAULT_DPI
     try:
-        img = Image.open(BytesIO(content))
-        dpi = img.info.get("dpi")
-        if dpi and isinstance(dpi, tuple):
-            return (int(dpi[0]), int(dpi[1]))
-        return (72, 72)
+        with Image.open(BytesIO(source) if isinstance(source, (bytes, bytearray)) else source) as img:
+            return header_dpi(img) or DEFAULT_DPI
     except Exception:
-        return (72, 72)
+        return DEFAULT_DPI
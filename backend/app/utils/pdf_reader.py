@@ -1,13 +1,29 @@
-from typing import Optional
+from typing import Union
+import os
 
 # Minimal PDF text extraction helper
 
-def extract_text_from_pdf(content: bytes) -> str:
+# Pages read per document; later pages are ignored (0 = no limit)
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+
+
+def extract_text_from_pdf(source: Union[bytes, str], max_pages: int = PDF_MAX_PAGES) -> str:
+    """Text of a PDF given as bytes or a file path (paths are read incrementally, not loaded whole)."""
     try:
         from io import BytesIO
         from pdfminer.high_level import extract_text
-        fp = BytesIO(content)
-        text = extract_text(fp)
+        fp = BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+        text = extract_text(fp, maxpages=max(max_pages, 0))
         return text or ""
     except Exception:
         return ""
+
+
+def extractor_version() -> str:
+    """Identifies what `extract_text_from_pdf` produces (settings and library); part of extraction cache keys."""
+    try:
+        import pdfminer
+        library = pdfminer.__version__
+    except Exception:
+        library = "none"
+    return "pdf:1:%d:pdfminer-%s" % (PDF_MAX_PAGES, library)
@@ -0,0 +1,115 @@
+"""Benchmark: decode-once image pipeline vs the earlier separate OCR and DPI reads.
+
+    cd backend && python -m benchmarks.bench_image [--repeat 5] [--dir path/to/images]
+
+Without `--dir`, sample uploads are generated: an A4 scan at 600 dpi (JPEG), the same page at
+300 dpi (PNG) and a phone photo without DPI metadata (JPEG). When tesseract is not installed
+only decoding and preparation are timed, and the report shows how many pixels each path would
+hand to tesseract (its run time grows with that number).
+"""
+from io import BytesIO
+import argparse
+import os
+import shutil
+import time
+
+from PIL import Image, ImageDraw
+
+from app.utils.image_pipeline import analyze_image
+
+
+def legacy_analyze(content: bytes):
+    # Intake as it was before the pipeline: full-resolution decode for OCR, a second open for DPI
+    img = Image.open(BytesIO(content))
+    img.load()
+    text = ""
+    if HAVE_TESSERACT:
+        import pytesseract
+        text = pytesseract.image_to_string(img)
+    dpi = Image.open(BytesIO(content)).info.get("dpi") or (72, 72)
+    return text, dpi, img.size
+
+
+def sample_page(width: int, height: int) -> Image.Image:
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    font_size = max(12, width // 60)
+    try:
+        from PIL import ImageFont
+        font = ImageFont.load_default(size=font_size)
+    except Exception:
+        font = None
+    lines = [
+        "PURCHASE ORDER 4711",
+        "Please print 2500 flyers, A5 148x210mm, C170 silk, 4/4",
+        "Finishing: matte lamination, spot uv on front",
+        "Delivery within 5 working days - urgent",
+    ]
+    y = height // 10
+    for _ in range(6):
+        for line in lines:
+            draw.text((width // 12, y), line, fill="black", font=font)
+            y += int(font_size * 1.6)
+        y += font_size
+    return img
+
+
+def encode(img: Image.Image, fmt: str, dpi=None) -> bytes:
+    buf = BytesIO()
+    kwargs = {"dpi": dpi} if dpi else {}
+    if fmt == "JPEG":
+        kwargs["quality"] = 85
+    img.save(buf, fmt, **kwargs)
+    return buf.getvalue()
+
+
+def samples():
+    a4_600 = sample_page(4961, 7016)
+    return {
+        "a4_600dpi.jpg": encode(a4_600, "JPEG", (600, 600)),
+        "a4_300dpi.png": encode(a4_600.resize((2480, 3508)), "PNG", (300, 300)),
+        "photo_nodpi.jpg": encode(sample_page(4032, 3024), "JPEG"),
+    }
+
+
+def timed(fn, content: bytes, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(content)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+HAVE_TESSERACT = bool(shutil.which("tesseract"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dir", help="benchmark the images in this directory instead of generated ones")
+    args = parser.parse_args()
+
+    if args.dir:
+        images = {}
+        for name in sorted(os.listdir(args.dir)):
+            with open(os.path.join(args.dir, name), "rb") as f:
+                images[name] = f.read()
+    else:
+        images = samples()
+
+    print(f"tesseract: {'yes' if HAVE_TESSERACT else 'not installed (decode and preparation only)'}")
+    print(f"{'image':<18}{'KB':>8}{'legacy ms':>12}{'pipeline ms':>13}{'speedup':>9}   pixels to OCR (legacy -> pipeline)")
+    for name, content in images.items():
+        legacy_seconds, (_, _, size) = timed(legacy_analyze, content, args.repeat)
+        pipeline_seconds, analysis = timed(analyze_image, content, args.repeat)
+        print(
+            f"{name:<18}{len(content) // 1024:>8}{legacy_seconds * 1000:>12.1f}{pipeline_seconds * 1000:>13.1f}"
+            f"{legacy_seconds / pipeline_seconds:>8.1f}x   {size[0]}x{size[1]} -> {analysis.ocr_size[0]}x{analysis.ocr_size[1]}"
+            f"  dpi {analysis.dpi}"
+        )
+
+
+if __name__ == "__main__":
+    main()
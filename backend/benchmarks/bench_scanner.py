@@ -0,0 +1,86 @@
+"""Micro-benchmark: single-pass spec scanner vs the earlier per-field regex parser.
+
+    cd backend && python -m benchmarks.bench_scanner [--kb 64] [--repeat 20]
+
+The input mimics text extracted from a multi-page PDF order: page headers, address blocks, table
+rows full of numbers, with the actual job description near the end.
+"""
+import argparse
+import re
+import time
+
+from app.services.llm_parser import LLMSpecParser
+
+
+def legacy_default_parse(text):
+    # The parser as it was before the single-pass scanner (kept here as the baseline)
+    import re
+    txt = (text or "").lower()
+    if len(txt) < 30 and not any(k in txt for k in ("print", "flyer", "business", "card", "please", "brochure")):
+        return None
+    q_match = re.search(r"\b(\d{1,6})\b(?=\s*(?:pieces|pcs|flyers|cards|brochures|units)?)", txt)
+    size_match = re.search(r"(\d{2,4}\s*[x×]\s*\d{2,4}(?:mm)?)", txt)
+    paper_match = re.search(r"\b(c\d{3})\b", txt)
+    color_match = re.search(r"\b(\d+/\d+)\b", txt)
+    finishing = []
+    if "lamination" in txt:
+        finishing.append("lamination")
+    if "spot uv" in txt or "spot_uv" in txt or "spotuv" in txt:
+        finishing.append("spot_uv")
+    if "die cut" in txt or "die_cut" in txt:
+        finishing.append("die_cut")
+    td_match = re.search(r"(\d{1,3})\s*(day|days)", txt)
+    rush = bool(re.search(r"\b(rush|urgent)\b", txt))
+    product = "business_card" if "card" in txt else ("flyer" if "flyer" in txt or "flyers" in txt else None)
+    return (q_match, size_match, paper_match, color_match, finishing, td_match, rush, product)
+
+
+def pdf_like_text(kb: int) -> str:
+    page = (
+        "ACME Print Procurement Ltd.   Purchase Order   Page {n} of 40\n"
+        "Ship to: Warehouse {n}, Unit {n}B Industrial Estate, Springfield\n"
+        "Line  Item code      Description                         Qty    Unit price   Total\n"
+        + "".join(
+            "{0:>4}  SKU-{0:05d}-AB  Corrugated shipping carton, brown     {1:>5}  {2:>8.2f}  {3:>10.2f}\n".format(
+                i, i * 7, i * 0.37, i * i * 0.37 * 7
+            )
+            for i in range(1, 25)
+        )
+        + "Terms: net 30. Delivery by courier; signature required.\n\n"
+    )
+    body = []
+    n = 0
+    while sum(len(p) for p in body) < kb * 1024:
+        n += 1
+        body.append(page.format(n=n))
+    job = "Please print 2500 flyers 210x297mm C300 4/4 with lamination and spot uv, urgent, 3 days."
+    return "".join(body) + job
+
+
+def bench(fn, text, repeat):
+    fn(text)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--kb", type=int, default=64)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    text = pdf_like_text(args.kb)
+    parser = LLMSpecParser()
+    old = bench(legacy_default_parse, text, args.repeat)
+    new = bench(parser._default_parse, text, args.repeat)
+    mb = len(text) / 1e6
+    print(f"text: {len(text) / 1024:.0f} KiB")
+    print(f"per-field regexes : {old * 1e3:8.2f} ms/parse  {mb / old:7.1f} MB/s")
+    print(f"single-pass scanner: {new * 1e3:8.2f} ms/parse  {mb / new:7.1f} MB/s  ({old / new:.2f}x)")
+    print(parser._default_parse(text))
+
+
+if __name__ == "__main__":
+    main()
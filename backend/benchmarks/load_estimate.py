@@ -0,0 +1,174 @@
+"""Load harness: throughput and tail latency of POST /estimate/ against the LLM stub.
+
+    cd backend
+    uvicorn app.services.llm_stub:app --port 8099 &
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://localhost:8099/v1 LLM_CACHE_ENABLED=false \\
+        N8N_WEBHOOK_URL=http://localhost:8099/webhook/ai-estimator uvicorn app.main:app --port 8000 &
+    python -m benchmarks.load_estimate --requests 500 --concurrency 32 --latency lognormal:400,0.7
+    python -m benchmarks.load_estimate --duration 60 --error-rate 0.3    # breaker scenario
+
+Scenario flags are applied to the running stub through `POST /config` before the run, so one
+stub process serves any number of runs. Orders are created once via `/intake/orders:batch`;
+each request estimates one of them with a varied text. The report covers requests per second,
+responses by status, latency percentiles, the stub's own counters and the backend's `llm` /
+`llm_breaker` / `llm_hedge` metrics. Disable the parse cache on the backend (as above), or every
+text after the first round is served from it.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+import httpx
+
+PRODUCTS = ("business cards", "flyers", "brochures", "posters")
+SIZES = ("85x55mm", "210x297", "148x210mm", "A5", "DL")
+STOCKS = ("C300", "C350", "C170", "silk 150gsm", "uncoated 120gsm")
+FINISHES = ("", "with lamination", "spot uv on front", "die cut corners", "matte lamination and spot uv")
+
+
+def order_texts(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    texts = []
+    for n in range(count):
+        texts.append(
+            "Hi, please print %d %s, %s, %s, %s %s. Need it in %d days%s. Ref %d"
+            % (
+                rng.choice((50, 100, 250, 500, 1000, 2500, 5000)),
+                rng.choice(PRODUCTS),
+                rng.choice(SIZES),
+                rng.choice(STOCKS),
+                rng.choice(("4/4", "4/0", "1/1")),
+                rng.choice(FINISHES),
+                rng.randint(2, 10),
+                rng.choice(("", " - urgent", ", rush please")),
+                n,
+            )
+        )
+    return texts
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def configure_stub(client: httpx.AsyncClient, stub: str, args: argparse.Namespace) -> Dict[str, Any]:
+    settings = {
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "rpm": args.rpm,
+        "hang_rate": args.hang_rate,
+        "seed": args.seed,
+    }
+    resp = await client.post(f"{stub}/config", json=settings)
+    resp.raise_for_status()
+    (await client.post(f"{stub}/stats/reset")).raise_for_status()
+    return resp.json()
+
+
+async def seed_orders(client: httpx.AsyncClient, url: str, texts: List[str]) -> List[int]:
+    resp = await client.post(f"{url}/intake/orders:batch", json=[{"text": t} for t in texts])
+    resp.raise_for_status()
+    return [r["order_id"] for r in resp.json()["results"] if "order_id" in r]
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        stub_config = await configure_stub(client, args.stub, args) if args.stub else None
+        texts = order_texts(args.orders, args.seed)
+        order_ids = await seed_orders(client, args.url, texts)
+        jobs = list(zip(order_ids, texts))
+
+        latencies: List[float] = []
+        statuses: Counter = Counter()
+        decisions: Counter = Counter()
+        issued = 0
+        deadline = time.monotonic() + args.duration if args.duration else None
+
+        async def worker() -> None:
+            nonlocal issued
+            while True:
+                if deadline is not None:
+                    if time.monotonic() >= deadline:
+                        return
+                elif issued >= args.requests:
+                    return
+                order_id, text = jobs[issued % len(jobs)]
+                issued += 1
+                started = time.perf_counter()
+                try:
+                    resp = await client.post(f"{args.url}/estimate/", json={"order_id": order_id, "raw_text": f"{text} #{issued}"})
+                    status = str(resp.status_code)
+                    if resp.status_code == 200:
+                        decisions[resp.json()["validation"].get("decision")] += 1
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        stub_stats = (await client.get(f"{args.stub}/stats")).json() if args.stub else None
+        metrics = (await client.get(f"{args.url}/metrics")).json()
+
+    return {
+        "requests": len(latencies),
+        "concurrency": args.concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "status": dict(statuses),
+        "decision": dict(decisions),
+        "latency_ms": {
+            name: round(percentile(latencies, q) * 1000, 1)
+            for name, q in (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+        },
+        "stub_config": stub_config,
+        "stub": stub_stats,
+        "backend": {name: metrics.get(name) for name in ("llm", "llm_breaker", "llm_hedge")},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000", help="backend root")
+    parser.add_argument("--stub", default="http://localhost:8099", help="stub root; empty to leave the stub alone")
+    parser.add_argument("--orders", type=int, default=100, help="orders to create and cycle through")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=0, help="run for this many seconds instead of --requests")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=120, help="client timeout per request (seconds)")
+    parser.add_argument("--latency", default="fixed:0", help="stub latency distribution, e.g. lognormal:300,0.6")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['requests']} requests in {report['seconds']}s at concurrency {args.concurrency}: {report['throughput_rps']} req/s")
+    print("status:", report["status"], " decision:", report["decision"])
+    print("latency ms:", "  ".join(f"{k} {v}" for k, v in report["latency_ms"].items()))
+    if report["stub"]:
+        stub = report["stub"]
+        print(f"stub: {stub['requests']} calls, by status {stub['by_status']}, mean simulated latency {stub['latency_ms_mean']} ms")
+    for name, values in report["backend"].items():
+        print(f"{name}: {values}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Shared test setup: a throwaway SQLite database, no LLM key and no background workers.
+
+Settings are read from the environment when `app` modules are imported, so they are set here
+first. Tests that need Postgres (row locks, SKIP LOCKED) run against `TEST_POSTGRES_URL`, e.g.
+`postgresql+psycopg2://postgres@localhost/ai_print_test` (its tables are dropped and recreated),
+and are skipped without it.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="ai-print-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("OPENAI_API_KEY", None)
+os.environ["EXTRACTION_WORKERS"] = "0"
+os.environ["JOBS_WORKERS"] = "0"
+os.environ["UPLOAD_TMP_DIR"] = _tmp
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel, create_engine
+
+
+@pytest.fixture(scope="session")
+def migrated():
+    from app.db.migrations import upgrade
+
+    upgrade()
+
+
+@pytest.fixture
+def db(migrated):
+    """The app's SQLite database with every table emptied (and the dashboard cache with it)."""
+    from app.db.session import get_engine
+    from app.services.response_cache import invalidate_orders
+
+    with get_engine().begin() as conn:
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            conn.execute(table.delete())
+    invalidate_orders()
+    yield get_engine()
+
+
+@pytest.fixture
+def pg():
+    """(sync engine, async engine) on TEST_POSTGRES_URL, with its public schema rebuilt by the migrations.
+
+    The async engine does not pool, so it can be used from any event loop (`asyncio.run`).
+    """
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    from app.db.migrations import upgrade
+    from app.db.session import _to_async_url
+
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    upgrade(engine)
+    async_engine = create_async_engine(_to_async_url(url), poolclass=NullPool)
+    yield engine, async_engine
+    engine.dispose()
+
+
+@pytest.fixture
+def llm_stub():
+    """The LLM stub app with default behaviour (no latency or failures, seeded) and zeroed stats."""
+    from app.services import llm_stub
+
+    llm_stub.config.update({
+        "latency": "fixed:0", "error_rate": 0.0, "rate_limit_rate": 0.0, "rpm": 0,
+        "hang_rate": 0.0, "hang_ms": 60000.0, "seed": "tests",
+    })
+    llm_stub._stats = llm_stub._new_stats()
+    yield llm_stub
@@ -0,0 +1,195 @@
+"""CircuitBreaker state machine on a fake clock, and the hedged fallback in LLMSpecParser."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import circuit_breaker, llm_parser
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.services.llm_parser import HedgeStats, LLMSpecParser
+from app.services.parse_cache import ParseCache
+
+TEXT = "Please print 500 flyers 210x297mm C300 4/4, 3 days"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def breaker(**kwargs):
+    settings = dict(window=10, min_calls=4, failure_rate=0.5, slow_seconds=5, open_seconds=30, enabled=True)
+    return CircuitBreaker("test", **dict(settings, **kwargs))
+
+
+def record(b, *outcomes):
+    for failed in outcomes:
+        started = b.allow()
+        (b.record_failure if failed else b.record_success)(started)
+
+
+def test_trips_once_min_calls_are_seen_and_the_failure_rate_is_reached(clock):
+    b = breaker()
+    record(b, True, True, True)
+    assert b.state == CLOSED
+    record(b, False)
+    assert (b.state, b.trips) == (OPEN, 1)
+
+    b = breaker()
+    record(b, False, False, False, True, True)
+    assert b.state == CLOSED and b.stats()["window_failure_rate"] == 0.4
+    record(b, True)
+    assert b.state == OPEN
+
+
+def test_slow_successes_count_as_failures(clock):
+    b = breaker(min_calls=2)
+    for _ in range(2):
+        started = b.allow()
+        clock.now += 6
+        b.record_success(started)
+    assert b.state == OPEN and b.slow_calls == 2
+
+
+def test_open_breaker_lets_a_single_probe_through(clock):
+    b = breaker()
+    record(b, True, True, True, True)
+    assert b.allow() is None and b.short_circuited == 1
+
+    clock.now += 30
+    probe = b.allow()
+    assert probe is not None and b.state == HALF_OPEN
+    assert [b.allow(), b.allow()] == [None, None]
+    b.record_success(probe)
+    assert b.state == CLOSED and b.probes == 1
+    assert b.stats()["window_calls"] == 0
+
+
+def test_failed_probe_reopens_and_a_neutral_one_frees_the_slot(clock):
+    b = breaker()
+    record(b, True, True, True, True)
+    clock.now += 30
+    b.record_neutral(b.allow())
+    assert b.state == HALF_OPEN
+    b.record_failure(b.allow())
+    assert (b.state, b.trips) == (OPEN, 2)
+    assert b.allow() is None
+
+
+def test_outcomes_of_calls_started_before_the_last_state_change_are_ignored(clock):
+    b = breaker()
+    straggler = b.allow()
+    clock.now += 1
+    record(b, True, True, True, True)
+    b.record_failure(straggler)
+    assert b.trips == 1 and b.stats()["window_calls"] == 0
+
+    clock.now += 30
+    probe = b.allow()
+    clock.now += 1
+    # A success started while closed must not close the breaker for the probe, nor free its slot
+    b.record_success(straggler)
+    assert b.state == HALF_OPEN and b.allow() is None
+    b.record_failure(probe)
+    assert b.state == OPEN
+
+
+def test_unparseable_decision_counts_as_one_failure(clock, monkeypatch):
+    b = breaker()
+    create = lambda **kwargs: {"choices": [{"message": {"content": "  "}}]}
+    monkeypatch.setattr(llm_parser, "llm_breaker", b)
+    monkeypatch.setattr(llm_parser, "openai", SimpleNamespace(ChatCompletion=SimpleNamespace(create=create)), raising=False)
+    monkeypatch.setattr(llm_parser, "HAVE_OPENAI", True)
+    monkeypatch.setattr(llm_parser, "OPENAI_API_KEY", "test")
+
+    parser = LLMSpecParser(decision_mode="separate")
+    spec = parser._default_parse(TEXT)
+    assert parser.decide(spec, TEXT) == parser.fallback_decide(spec, TEXT.lower())
+    assert b.stats()["window_calls"] == 1 and b.stats()["window_failure_rate"] == 1.0
+
+
+class SlowClient:
+    """Async client answering `answer` after `delay` seconds."""
+
+    model = "slow"
+
+    def __init__(self, answer, delay):
+        self.answer = answer
+        self.delay = delay
+        self.calls = 0
+
+    async def chat(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.answer
+
+
+@pytest.fixture
+def hedge(monkeypatch):
+    stats = HedgeStats()
+    monkeypatch.setattr(llm_parser, "hedge_stats", stats)
+    monkeypatch.setattr(llm_parser, "LLM_HEDGE_MS", "50")
+    return stats
+
+
+def run_with_late(coro):
+    async def go():
+        result = await coro
+        await asyncio.gather(*list(llm_parser._late_tasks))
+        return result
+
+    return asyncio.run(go())
+
+
+def llm_answer(**changes):
+    return json.dumps(dict(LLMSpecParser()._default_parse(TEXT), **changes))
+
+
+def test_slow_parse_is_hedged_and_the_late_answer_is_compared_and_cached(hedge):
+    cache = ParseCache(persist=False)
+    client = SlowClient(llm_answer(quantity=600), 0.3)
+    parser = LLMSpecParser(client=client, cache=cache, decision_mode="separate", parse_mode="llm")
+
+    spec = run_with_late(parser.aparse(TEXT))
+    assert spec["quantity"] == 500
+    assert (hedge.hedged, hedge.late_answers, hedge.late_agreed) == (1, 1, 0)
+    assert hedge.field_mismatches["quantity"] == 1 and hedge.field_mismatches["size"] == 0
+
+    assert asyncio.run(parser.aparse(TEXT))["quantity"] == 600
+    assert client.calls == 1
+
+
+def test_fast_parse_is_not_hedged(hedge):
+    client = SlowClient(llm_answer(quantity=600), 0)
+    parser = LLMSpecParser(client=client, decision_mode="separate", parse_mode="llm")
+    assert run_with_late(parser.aparse(TEXT))["quantity"] == 600
+    assert (hedge.hedged, hedge.late_answers) == (0, 0)
+
+
+def test_failed_late_parse_is_counted(hedge):
+    client = SlowClient("not json", 0.3)
+    parser = LLMSpecParser(client=client, decision_mode="separate", parse_mode="llm")
+    assert run_with_late(parser.aparse(TEXT))["quantity"] == 500
+    assert (hedge.hedged, hedge.late_failures, hedge.late_answers) == (1, 1, 0)
+
+
+def test_slow_decision_is_hedged_and_a_disagreeing_late_answer_counted(hedge, monkeypatch):
+    client = SlowClient("rejected", 0.3)
+    monkeypatch.setattr(llm_parser, "get_llm_client", lambda: client)
+    parser = LLMSpecParser(decision_mode="separate")
+    spec = parser._default_parse(TEXT)
+
+    decision = run_with_late(parser.adecide(spec, TEXT))
+    assert decision == parser.fallback_decide(spec, TEXT.lower()) != "rejected"
+    assert (hedge.decisions_hedged, hedge.decision_mismatches) == (1, 1)
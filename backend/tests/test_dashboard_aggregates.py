@@ -0,0 +1,75 @@
+import random
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.api import dashboard
+from app.main import app
+from app.models.order import Order
+from app.services import rollups
+
+STATUSES = ["received", "auto_approved", "needs_review", "rejected", None]
+FIRST_DAY = date(2026, 3, 1)
+
+
+@pytest.fixture
+def orders(db):
+    rng = random.Random(3)
+    rows = [
+        Order(
+            raw_text=f"order {n}",
+            status=rng.choice(STATUSES),
+            final_price=rng.choice([None, round(rng.uniform(1, 500), 2)]),
+            created_at=datetime.combine(FIRST_DAY + timedelta(days=rng.randint(0, 9)), time(rng.randint(0, 23)), timezone.utc),
+        )
+        for n in range(300)
+    ]
+    with Session(db) as session:
+        session.add_all(rows)
+        session.commit()
+        rollups.rebuild(session)
+        session.commit()
+        # Plain values: what the pre-aggregation endpoints summed in Python
+        return [(o.status, o.final_price, o.created_at.date()) for o in rows]
+
+
+def python_summary(orders, start=None, end=None, status=None):
+    """The old per-row summary and stats, plus the date and status filters."""
+    rows = [
+        o for o in orders
+        if (start is None or o[2] >= start) and (end is None or o[2] <= end) and (not status or o[0] in status)
+    ]
+    by_status = {}
+    for st, _, _ in rows:
+        by_status[st or "unknown"] = by_status.get(st or "unknown", 0) + 1
+    summary = {
+        "total_orders": len(rows),
+        "revenue": sum(price or 0 for _, price, _ in rows),
+        "pending": sum(1 for st, _, _ in rows if st == "needs_review"),
+    }
+    return summary, by_status
+
+
+FILTERS = [
+    {},
+    {"start": date(2026, 3, 3)},
+    {"start": date(2026, 3, 3), "end": date(2026, 3, 6)},
+    {"end": date(2026, 3, 1), "status": ["needs_review"]},
+    {"status": ["auto_approved", "rejected"]},
+]
+
+
+@pytest.mark.parametrize("source", ["orders", "rollup"])
+@pytest.mark.parametrize("filters", FILTERS)
+def test_sql_aggregates_match_the_python_summary(orders, monkeypatch, source, filters):
+    monkeypatch.setattr(dashboard, "DASHBOARD_SOURCE", source)
+    expected_summary, expected_stats = python_summary(orders, **filters)
+    params = {k: v.isoformat() if isinstance(v, date) else v for k, v in filters.items()}
+    with TestClient(app) as client:
+        summary = client.get("/dashboard/summary", params=params).json()
+        stats = client.get("/dashboard/stats", params=params).json()
+
+    assert summary == dict(expected_summary, revenue=pytest.approx(expected_summary["revenue"], abs=0.005))
+    assert stats["by_status"] == expected_stats
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.main import app
+from app.models.order import Order
+from app.services import rollups
+from app.services.response_cache import ResponseCache, dashboard_cache
+
+
+@pytest.fixture
+def client(db):
+    with Session(db) as session:
+        session.add_all(Order(raw_text=f"order {n}", status="needs_review", final_price=10.0) for n in range(3))
+        session.commit()
+        rollups.rebuild(session)
+        session.commit()
+    with TestClient(app) as client:
+        yield client
+
+
+def test_matching_etag_gets_304_without_a_query(client):
+    first = client.get("/dashboard/summary")
+    assert first.status_code == 200 and first.json()["total_orders"] == 3
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache" and "Accept" in first.headers["vary"]
+
+    hits = dashboard_cache.hits
+    for inm in (etag, f'"stale", {etag}', "*"):
+        r = client.get("/dashboard/summary", headers={"If-None-Match": inm})
+        assert r.status_code == 304 and r.content == b"" and r.headers["etag"] == etag
+    assert dashboard_cache.hits == hits + 3
+
+    assert client.get("/dashboard/summary", headers={"If-None-Match": '"stale"'}).status_code == 200
+    html = client.get("/dashboard/summary", headers={"Accept": "text/html"})
+    assert html.headers["etag"] != etag
+
+
+def test_cached_listing_keeps_its_cursor_header(client):
+    first = client.get("/dashboard/orders", params={"limit": 2})
+    again = client.get("/dashboard/orders", params={"limit": 2}, headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304 and again.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+
+
+def test_writes_invalidate_cached_responses(client):
+    etag = client.get("/dashboard/summary").headers["etag"]
+
+    r = client.post("/intake/orders:batch", content=json.dumps([{"text": "250 flyers"}]))
+    assert r.status_code == 201
+    after_intake = client.get("/dashboard/summary", headers={"If-None-Match": etag})
+    assert after_intake.status_code == 200 and after_intake.json()["total_orders"] == 4
+
+    order_id = r.json()["results"][0]["order_id"]
+    r = client.put(f"/orders/{order_id}", json={"status": "needs_review", "updated_at": "2026-03-01T12:00:00Z", "price": 5})
+    assert r.status_code == 200
+    after_update = client.get("/dashboard/summary", headers={"If-None-Match": after_intake.headers["etag"]})
+    assert after_update.status_code == 200
+    assert after_update.json() == {"total_orders": 4, "revenue": 35.0, "pending": 4}
+
+
+def test_response_computed_across_a_write_is_not_cached():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    version = cache.version
+    cache.bump()
+    entry = cache.put(("/summary",), b"old", "application/json", version)
+    assert entry.etag and cache.get(("/summary",)) is None
+
+
+def test_entries_expire_and_are_evicted_least_recently_used():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    for key in ("a", "b"):
+        cache.put((key,), key.encode(), "application/json", cache.version)
+    assert cache.get(("a",)) is not None
+    cache.put(("c",), b"c", "application/json", cache.version)
+    assert cache.get(("b",)) is None and cache.get(("a",)) is not None
+    assert cache.evictions == 1
+
+    expired = ResponseCache(ttl=0)
+    expired.put(("a",), b"a", "application/json", expired.version)
+    assert expired.get(("a",)) is None
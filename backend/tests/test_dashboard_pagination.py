@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.main import app
+from app.models.order import Order
+
+
+@pytest.fixture
+def client(db):
+    with Session(db) as session:
+        session.add_all(
+            Order(raw_text=f"order {n}", status="needs_review" if n % 3 == 0 else "auto_approved", final_price=float(n))
+            for n in range(1, 26)
+        )
+        session.commit()
+    with TestClient(app) as client:
+        yield client
+
+
+def walk(client, **params) -> list:
+    """Follow X-Next-Cursor from the first page; returns the pages' id lists."""
+    pages, after = [], None
+    while True:
+        query = dict(params, **({"after": after} if after is not None else {}))
+        r = client.get("/dashboard/orders", params=query)
+        assert r.status_code == 200
+        pages.append([row["id"] for row in r.json()])
+        after = r.headers.get("x-next-cursor")
+        if after is None:
+            return pages
+        assert int(after) == pages[-1][-1]
+
+
+def test_cursor_walk_returns_every_order_once_in_id_order(client):
+    pages = walk(client, limit=10)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [i for page in pages for i in page] == list(range(1, 26))
+
+
+def test_cursor_on_exact_multiple_ends_with_empty_page(client):
+    pages = walk(client, limit=5)
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 5, 0]
+
+
+def test_cursor_walk_applies_filters_on_every_page(client):
+    pages = walk(client, limit=3, status="needs_review")
+    assert [i for page in pages for i in page] == [3, 6, 9, 12, 15, 18, 21, 24]
+
+
+def test_cursor_skips_orders_at_or_below_after(client):
+    r = client.get("/dashboard/orders", params={"after": 20, "limit": 100})
+    assert [row["id"] for row in r.json()] == [21, 22, 23, 24, 25]
+    assert "x-next-cursor" not in r.headers
+
+
+def test_recent_returns_newest_first_without_cursor(client):
+    r = client.get("/dashboard/orders", params={"recent": 3})
+    assert [row["id"] for row in r.json()] == [25, 24, 23]
+    assert "x-next-cursor" not in r.headers
+
+
+def test_export_streams_every_order(client):
+    r = client.get("/dashboard/orders/export")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["id"] for row in rows] == list(range(1, 26))
+    csv_lines = client.get("/dashboard/orders/export", params={"format": "csv"}).text.splitlines()
+    assert csv_lines[0].split(",")[0] == "id" and len(csv_lines) == 26
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlmodel import create_engine, select
+
+from app.db import session as db_session
+from app.db.session import PoolStats, get_db, get_engine, pool_metrics
+from app.models.order import Order
+
+
+def stored_texts(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(Order.raw_text)).scalars().all()
+
+
+def test_get_db_closes_the_session_on_success(db):
+    checkins = db_session.pool_stats.checkins
+    dependency = get_db()
+    session = next(dependency)
+    session.add(Order(raw_text="committed", status="received"))
+    session.commit()
+    with pytest.raises(StopIteration):
+        next(dependency)
+    assert not session.in_transaction()
+    assert db_session.pool_stats.checkins > checkins
+    assert stored_texts(db) == ["committed"]
+
+
+def test_get_db_rolls_back_and_closes_on_exception(db):
+    dependency = get_db()
+    session = next(dependency)
+    session.add(Order(raw_text="flushed, never committed", status="received"))
+    session.flush()
+    with pytest.raises(RuntimeError):
+        dependency.throw(RuntimeError("handler failed"))
+    assert not session.in_transaction()
+    assert stored_texts(db) == []
+
+
+def test_one_engine_is_shared_across_threads(db):
+    engines = []
+    threads = [threading.Thread(target=lambda: engines.append(get_engine())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(engines) == 8 and all(e is get_engine() for e in engines)
+    dependencies = [get_db() for _ in range(2)]
+    assert all(next(d).get_bind() is get_engine() for d in dependencies)
+    for d in dependencies:
+        d.close()
+
+
+def test_pool_metrics_report_both_engines(db):
+    with get_engine().connect():
+        metrics = pool_metrics()
+    sync = metrics["sync"]
+    assert sync["initialized"] and sync["url_dialect"] == "sqlite"
+    assert sync["checked_out"] >= 1 and sync["checkouts"] >= 1
+    assert set(metrics["async"]) >= {"initialized", "url_dialect", "checkouts", "waits", "timeouts"}
+
+
+def test_exhausted_pool_records_waits_and_timeouts(tmp_path):
+    class Pool(db_session.InstrumentedQueuePool):
+        stats = PoolStats()
+
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/pool.db", poolclass=Pool, pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    with engine.connect():
+        pass
+    snapshot = Pool.stats.snapshot()
+    assert (snapshot["waits"], snapshot["timeouts"]) == (1, 1)
+    assert snapshot["wait_seconds_max"] >= 0.05
+    engine.dispose()
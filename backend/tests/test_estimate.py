@@ -0,0 +1,113 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.api import estimate
+from app.db.session import pool_metrics
+from app.main import app
+from app.models.order import Order
+from app.services.llm_parser import LLMSpecParser
+from app.services.workflow import WorkflowClient, workflow_queue
+
+TEXT = "Please print 250 flyers 210x297mm C300 4/0 3 days"
+
+
+def _orders(engine, count: int) -> list:
+    with Session(engine) as session:
+        orders = [Order(raw_text=TEXT, status="received") for _ in range(count)]
+        session.add_all(orders)
+        session.commit()
+        return [order.id for order in orders]
+
+
+def test_estimate_holds_no_connection_while_parsing(db, monkeypatch):
+    checked_out = []
+    parse = LLMSpecParser.aparse
+
+    async def aparse(self, text):
+        checked_out.append(pool_metrics()["async"]["checked_out"])
+        return await parse(self, text)
+
+    monkeypatch.setattr(LLMSpecParser, "aparse", aparse)
+    monkeypatch.setattr(WorkflowClient, "trigger", lambda self, payload: True)
+    [order_id] = _orders(db, 1)
+    with TestClient(app) as client:
+        r = client.post("/estimate/", json={"order_id": order_id, "raw_text": TEXT})
+        assert r.status_code == 200
+        assert checked_out == [0]
+        order = client.get(f"/orders/{order_id}").json()
+    assert order["status"] != "received"
+    assert order["final_price"] == r.json()["pricing"]["final_price"]
+
+
+def test_estimate_batch_holds_no_connection_while_parsing(db, monkeypatch):
+    checked_out = []
+    parse_many = LLMSpecParser.aparse_many
+
+    async def aparse_many(self, texts, **kwargs):
+        checked_out.append(pool_metrics()["async"]["checked_out"])
+        return await parse_many(self, texts, **kwargs)
+
+    monkeypatch.setattr(LLMSpecParser, "aparse_many", aparse_many)
+    monkeypatch.setattr(workflow_queue, "enqueue", lambda payload: True)
+    order_ids = _orders(db, 3)
+    with TestClient(app) as client:
+        r = client.post("/estimate/batch", json={"order_ids": order_ids + [999999]})
+        assert r.status_code == 207
+        assert r.json()["estimated"] == 3
+        assert checked_out == [0]
+
+
+def test_estimate_batch_reports_duplicates_and_missing_orders(db, monkeypatch):
+    payloads = []
+    monkeypatch.setattr(workflow_queue, "enqueue", payloads.append)
+    first, second = _orders(db, 2)
+    items = [
+        {"order_id": first},
+        {"order_id": second, "raw_text": "Please print 500 business cards 85x55mm C350 4/4 rush", "customer_email": "b@example.com"},
+        {"order_id": first},
+    ]
+    with TestClient(app) as client:
+        r = client.post("/estimate/batch", json={"items": items, "order_ids": [999999]})
+    assert r.status_code == 207
+    body = r.json()
+    assert (body["estimated"], body["failed"]) == (2, 2)
+    results = body["results"]
+    assert [(res["index"], res["order_id"]) for res in results] == [(0, first), (1, second), (2, first), (3, 999999)]
+    assert [res.get("error") for res in results] == [None, None, "Duplicate order_id in batch", "Order not found"]
+    assert results[1]["spec"]["product_type"] == "business_card" and results[1]["spec"]["quantity"] == 500
+
+    with Session(db) as session:
+        stored = {o.id: o for o in (session.get(Order, first), session.get(Order, second))}
+        assert stored[first].final_price == results[0]["pricing"]["final_price"]
+        assert stored[second].final_price == results[1]["pricing"]["final_price"]
+        assert stored[second].email == "b@example.com"
+        assert all(o.status == res["decision"] for o, res in zip(stored.values(), results))
+    assert sorted(p["order_id"] for p in payloads) == [first, second]
+
+
+def test_estimate_batch_parse_failures_are_per_item(db, monkeypatch):
+    async def aparse_many(self, texts, **kwargs):
+        return [RuntimeError("provider down"), "not a spec"] + [self._default_parse(t) for t in texts[2:]]
+
+    monkeypatch.setattr(LLMSpecParser, "aparse_many", aparse_many)
+    monkeypatch.setattr(workflow_queue, "enqueue", lambda payload: True)
+    order_ids = _orders(db, 3)
+    with TestClient(app) as client:
+        r = client.post("/estimate/batch", json={"order_ids": order_ids})
+        assert r.status_code == 207
+        assert [res.get("error") for res in r.json()["results"]] == [
+            "LLM parser error", "LLM parser failed to return JSON", None,
+        ]
+        assert client.get(f"/orders/{order_ids[0]}").json()["status"] == "received"
+
+        assert client.post("/estimate/batch", json={"order_ids": []}).status_code == 400
+
+
+def test_estimate_batch_all_estimated_is_200_and_size_capped(db, monkeypatch):
+    monkeypatch.setattr(workflow_queue, "enqueue", lambda payload: True)
+    order_ids = _orders(db, 2)
+    with TestClient(app) as client:
+        r = client.post("/estimate/batch", json={"order_ids": order_ids})
+        assert r.status_code == 200 and r.json()["failed"] == 0
+        monkeypatch.setattr(estimate, "ESTIMATE_BATCH_MAX_ITEMS", 1)
+        assert client.post("/estimate/batch", json={"order_ids": order_ids}).status_code == 413
@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+
+from sqlalchemy import func, select
+
+from app.models.extraction_cache import ExtractionCacheEntry
+from app.services import extraction_pool
+from app.services.extraction_cache import ExtractionCache
+
+
+def rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(ExtractionCacheEntry)).scalar_one()
+
+
+def counting(result):
+    calls = []
+
+    async def extract():
+        calls.append(1)
+        return dict(result)
+
+    return extract, calls
+
+
+def test_results_are_stored_and_reused(db):
+    cache = ExtractionCache()
+    extract, calls = counting({"text": "Please print 500 flyers"})
+
+    async def run():
+        first = await cache.get_or_extract("a" * 64, "pdf:test", extract)
+        second = await cache.get_or_extract("a" * 64, "pdf:test", extract)
+        cache.clear_memory()
+        third = await cache.get_or_extract("a" * 64, "pdf:test", extract)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert [hit for _, hit in (first, second, third)] == [False, True, True]
+    assert third[0]["text"] == "Please print 500 flyers"
+    assert len(calls) == 1 and rows(db) == 1
+    assert (cache.memory_hits, cache.db_hits, cache.stores) == (1, 1, 1)
+
+
+def test_empty_results_are_not_stored(db):
+    cache = ExtractionCache()
+    extract, calls = counting({"text": "  \n", "dpi": [72, 72]})
+
+    async def run():
+        return [await cache.get_or_extract("b" * 64, "image:test", extract) for _ in range(2)]
+
+    assert [hit for _, hit in asyncio.run(run())] == [False, False]
+    assert len(calls) == 2 and rows(db) == 0
+    assert (cache.stores, cache.not_stored) == (0, 2)
+
+
+def test_unreadable_pdf_is_retried_on_the_next_upload(db, monkeypatch, tmp_path):
+    cache = ExtractionCache()
+    monkeypatch.setattr(extraction_pool, "extraction_cache", cache)
+    data = b"%PDF-1.4 truncated"
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(data)
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    async def run():
+        return [await extraction_pool.extract_document(str(path), sha256, "application/pdf") for _ in range(2)]
+
+    assert asyncio.run(run()) == [("", []), ("", [])]
+    assert (cache.misses, cache.not_stored) == (2, 2)
+    assert rows(db) == 0
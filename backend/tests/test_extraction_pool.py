@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import intake
+from app.main import app
+from app.services.extraction_pool import ExtractionBusy, ExtractionPool, ExtractionTimeout
+
+
+def run_all(pool, *calls):
+    async def go():
+        try:
+            return await asyncio.gather(*(pool.run(fn, *args) for fn, *args in calls), return_exceptions=True)
+        finally:
+            pool.shutdown()
+
+    return asyncio.run(go())
+
+
+def test_queued_jobs_do_not_time_out():
+    # Each job fits the timeout; together they wait far longer than it for the one worker
+    pool = ExtractionPool(workers=1, queue_max=10, timeout=1.0)
+    results = run_all(pool, *[(time.sleep, 0.6)] * 3)
+    assert results == [None, None, None]
+    assert (pool.timeouts, pool.restarts, pool.completed) == (0, 0, 3)
+
+
+def test_overrunning_job_times_out_and_only_its_worker_is_replaced():
+    pool = ExtractionPool(workers=2, queue_max=10, timeout=1.0)
+
+    async def go():
+        try:
+            pids = set(await asyncio.gather(pool.run(os.getpid), pool.run(os.getpid)))
+            slow = asyncio.ensure_future(pool.run(time.sleep, 30))
+            await asyncio.sleep(0.2)
+            quick = [await pool.run(time.sleep, 0.3) for _ in range(3)]
+            with pytest.raises(ExtractionTimeout):
+                await slow
+            after = set(await asyncio.gather(pool.run(os.getpid), pool.run(os.getpid)))
+            return pids, quick, after
+        finally:
+            pool.shutdown()
+
+    pids, quick, after = asyncio.run(go())
+    assert quick == [None, None, None]
+    assert len(pids) == 2 and len(pids & after) == 1
+    assert (pool.timeouts, pool.restarts, pool.failed) == (1, 1, 1)
+
+
+def test_workers_are_recycled_after_max_tasks():
+    pool = ExtractionPool(workers=1, max_tasks_per_child=2, queue_max=10, timeout=30)
+
+    async def go():
+        try:
+            return [await pool.run(os.getpid) for _ in range(5)]
+        finally:
+            pool.shutdown()
+
+    pids = asyncio.run(go())
+    assert pids[0] == pids[1] != pids[2] == pids[3] != pids[4]
+    assert pool.recycled == 2
+
+
+def test_queue_cap_rejects_with_busy():
+    pool = ExtractionPool(workers=0, queue_max=2, timeout=5)
+    results = run_all(pool, *[(time.sleep, 0.3)] * 3)
+    assert results[:2] == [None, None]
+    assert isinstance(results[2], ExtractionBusy)
+    assert pool.rejected == 1 and pool.max_pending == 2
+
+
+def test_thread_mode_times_out():
+    pool = ExtractionPool(workers=0, timeout=0.1)
+    [result] = run_all(pool, (time.sleep, 0.5))
+    assert isinstance(result, ExtractionTimeout) and pool.timeouts == 1
+
+
+@pytest.mark.parametrize("error, status", [(ExtractionBusy(7), 503), (ExtractionTimeout("slow"), 422)])
+def test_intake_maps_pool_errors(db, monkeypatch, error, status):
+    async def extract_document(path, sha256, content_type):
+        raise error
+
+    monkeypatch.setattr(intake, "extract_document", extract_document)
+    with TestClient(app) as client:
+        r = client.post("/intake/order", files={"file": ("order.pdf", b"%PDF-1.4", "application/pdf")})
+    assert r.status_code == status
+    if status == 503:
+        assert r.headers["Retry-After"] == "7"
@@ -0,0 +1,81 @@
+import io
+import sys
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from app.utils.image_pipeline import DEFAULT_DPI, analyze_image, ocr_size
+from app.utils.image_quality import get_image_dpi
+
+
+def image_bytes(size, fmt, dpi=None):
+    img = Image.new("RGB", size, "white")
+    # Dark block so greyscale and thresholding have two levels to tell apart
+    img.paste((40, 40, 40), (0, 0, size[0] // 2, size[1] // 2))
+    out = io.BytesIO()
+    img.save(out, fmt, **({"dpi": dpi} if dpi else {}))
+    return out.getvalue()
+
+
+@pytest.fixture
+def tesseract(monkeypatch):
+    """Fake pytesseract recording the image and config it is handed."""
+    calls = []
+
+    def image_to_string(img, config=""):
+        calls.append((img.mode, img.size, config))
+        return "500 flyers"
+
+    monkeypatch.setitem(sys.modules, "pytesseract", SimpleNamespace(image_to_string=image_to_string))
+    return calls
+
+
+def test_ocr_size_reduces_to_the_target_dpi_and_pixel_cap_but_never_enlarges():
+    assert ocr_size((2400, 1200), (600, 600), target_dpi=300, max_pixels=0) == (1200, 600)
+    assert ocr_size((2400, 1200), (600, 300), target_dpi=300, max_pixels=0) == (2400, 1200)
+    assert ocr_size((2400, 1200), (150, 150), target_dpi=300, max_pixels=0) == (2400, 1200)
+    assert ocr_size((2400, 1200), (600, 600), target_dpi=0, max_pixels=0) == (2400, 1200)
+    assert ocr_size((2000, 2000), None, target_dpi=300, max_pixels=1_000_000) == (1000, 1000)
+    assert ocr_size((2400, 1200), (600, 600), target_dpi=300, max_pixels=180_000) == (600, 300)
+
+
+def test_high_dpi_jpeg_is_decoded_at_the_target_resolution(tesseract):
+    result = analyze_image(image_bytes((2400, 1200), "JPEG", dpi=(600, 600)), target_dpi=300, max_pixels=0)
+    assert result.text == "500 flyers"
+    assert (result.dpi, result.size, result.ocr_size) == ((600, 600), (2400, 1200), (1200, 600))
+    assert tesseract == [("L", (1200, 600), "--dpi 300")]
+    assert {"header_ms", "prepare_ms", "ocr_ms", "total_ms"} <= set(result.timings_ms)
+
+
+def test_metric_png_dpi_is_rounded_and_not_downscaled(tesseract, tmp_path):
+    path = tmp_path / "scan.png"
+    path.write_bytes(image_bytes((600, 400), "PNG", dpi=(300, 300)))
+    assert get_image_dpi(str(path)) == (300, 300)
+    result = analyze_image(str(path), target_dpi=300, max_pixels=0)
+    assert (result.dpi, result.ocr_size) == ((300, 300), (600, 400))
+    assert tesseract == [("L", (600, 400), "--dpi 300")]
+
+
+def test_image_without_dpi_is_only_capped_by_pixels(tesseract):
+    result = analyze_image(image_bytes((400, 400), "PNG"), target_dpi=300, max_pixels=10_000)
+    assert (result.dpi, result.ocr_size) == (DEFAULT_DPI, (100, 100))
+    # No known resolution: tesseract estimates it
+    assert tesseract == [("L", (100, 100), "")]
+
+
+def test_binarize_hands_tesseract_a_two_level_image(tesseract, monkeypatch):
+    seen = []
+    monkeypatch.setattr(sys.modules["pytesseract"], "image_to_string", lambda img, config="": seen.append(img) or "")
+    analyze_image(image_bytes((200, 200), "PNG"), binarize=True)
+    [img] = seen
+    assert img.mode == "1" and sorted(c for _, c in img.getcolors()) == [0, 255]
+
+
+def test_unreadable_image_and_missing_tesseract_never_raise(monkeypatch):
+    assert analyze_image(b"not an image") == ("", DEFAULT_DPI, (0, 0), (0, 0), {})
+    assert get_image_dpi(b"not an image") == DEFAULT_DPI
+
+    monkeypatch.setitem(sys.modules, "pytesseract", None)
+    result = analyze_image(image_bytes((100, 100), "JPEG", dpi=(200, 200)))
+    assert (result.text, result.dpi, result.ocr_size) == ("", (200, 200), (100, 100))
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import func, text
+from sqlmodel import Session, select
+from starlette.requests import Request
+
+from app.api import intake
+from app.main import app
+from app.models.order import Order
+from app.models.rollup import OrderRollup
+
+
+def ndjson_request(chunks, content_type="application/x-ndjson"):
+    """A request whose body arrives as `chunks`; `pending` holds the chunks not read yet."""
+    pending = [{"type": "http.request", "body": c, "more_body": True} for c in chunks]
+    pending.append({"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        return pending.pop(0)
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/intake/orders:batch", "query_string": b"",
+        "headers": [(b"content-type", content_type.encode())],
+    }
+    return Request(scope, receive), pending
+
+
+def test_ndjson_lines_split_across_chunks():
+    body = b'{"text": "250 flyers"}\n\n{"text": "' + b"x" * 5000 + b'"}\nnot json\n{"email_body": "last"}'
+    chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+    request, _ = ndjson_request(chunks)
+    items = asyncio.run(intake._read_batch(request))
+    assert [item for item, _ in items] == [{"text": "250 flyers"}, {"text": "x" * 5000}, None, {"email_body": "last"}]
+    assert [error for _, error in items] == [None, None, "invalid JSON", None]
+
+
+def test_ndjson_item_limit_rejects_before_reading_the_rest(monkeypatch):
+    monkeypatch.setattr(intake, "INTAKE_BATCH_MAX_ITEMS", 3)
+    request, pending = ndjson_request([b'{"text": "a"}\n' * 2] * 10)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(intake._read_batch(request))
+    assert exc.value.status_code == 413
+    assert len(pending) > 5
+
+
+def test_byte_limit_rejects_while_streaming(monkeypatch):
+    monkeypatch.setattr(intake, "INTAKE_BATCH_MAX_BYTES", 100)
+    for content_type in ("application/x-ndjson", "application/json"):
+        request, pending = ndjson_request([b" " * 60] * 10, content_type)
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(intake._read_batch(request))
+        assert exc.value.status_code == 413
+        assert len(pending) > 5
+
+
+def test_batch_endpoint_creates_valid_items_and_reports_errors(db):
+    body = "\n".join(json.dumps(item) for item in [{"text": "250 flyers"}, {"email": "a@b.c"}, {"email_body": "posters"}])
+    with TestClient(app) as client:
+        r = client.post("/intake/orders:batch", content=body, headers={"content-type": "application/x-ndjson"})
+    assert r.status_code == 207
+    results = r.json()["results"]
+    assert r.json()["created"] == 2
+    assert "order_id" in results[0] and results[1]["error"] == "No input provided" and "order_id" in results[2]
+
+
+def test_a_failing_chunk_is_reported_and_the_others_are_created(db, monkeypatch):
+    monkeypatch.setattr(intake, "INTAKE_BATCH_CHUNK", 2)
+    with db.begin() as conn:
+        conn.execute(text(
+            "CREATE TRIGGER reject_boom BEFORE INSERT ON \"order\" WHEN NEW.raw_text = 'boom' "
+            "BEGIN SELECT RAISE(ABORT, 'rejected by trigger'); END"
+        ))
+    try:
+        texts = ["250 flyers", "100 posters", "boom", "500 cards", "50 banners"]
+        body = json.dumps([{"text": t} for t in texts])
+        with TestClient(app) as client:
+            r = client.post("/intake/orders:batch", content=body, headers={"content-type": "application/json"})
+    finally:
+        with db.begin() as conn:
+            conn.execute(text("DROP TRIGGER reject_boom"))
+
+    assert r.status_code == 207
+    assert (r.json()["created"], r.json()["failed"]) == (3, 2)
+    results = r.json()["results"]
+    assert [("order_id" in item) for item in results] == [True, True, False, False, True]
+    assert results[3]["error"] == "Database error, item not created"
+    with Session(db) as session:
+        stored = session.exec(select(Order.raw_text).order_by(Order.id)).all()
+        assert stored == ["250 flyers", "100 posters", "50 banners"]
+        assert session.exec(select(func.sum(OrderRollup.order_count))).one() == 3
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session
+
+import app.db.session
+from app.db.session import _to_async_url
+from app.models.job import EstimateJob
+from app.models.order import Order
+from app.services import jobs
+from app.services.jobs import JobWorkers
+
+TEXT = "Please print 250 flyers 210x297mm C300 4/0 3 days"
+
+
+@pytest.fixture
+def workflow(monkeypatch):
+    payloads = []
+    monkeypatch.setattr(jobs.WorkflowClient, "trigger", lambda self, payload: payloads.append(payload) or True)
+    return payloads
+
+
+@pytest.fixture
+def sessions(db, monkeypatch):
+    """Workers get sessions on a non-pooling engine, usable from each test's own event loop."""
+    engine = create_async_engine(_to_async_url(os.environ["DATABASE_URL"]), poolclass=NullPool)
+    monkeypatch.setattr(app.db.session, "get_async_session", lambda: AsyncSession(engine, expire_on_commit=False))
+    return engine
+
+
+def queue(engine, count=1, **job_values):
+    with Session(engine) as session:
+        ids = []
+        for _ in range(count):
+            order = Order(raw_text=TEXT, status="received")
+            session.add(order)
+            session.flush()
+            job = jobs.new_job(order.id, "buyer@example.com")
+            for name, value in job_values.items():
+                setattr(job, name, value)
+            session.add(job)
+            session.flush()
+            ids.append(job.id)
+        session.commit()
+        return ids
+
+
+def load(engine, job_id):
+    with Session(engine) as session:
+        job = session.get(EstimateJob, job_id)
+        return job, session.get(Order, job.order_id)
+
+
+def run(workers, times=1):
+    async def go():
+        return [await workers.run_once("worker-1") for _ in range(times)]
+
+    return asyncio.run(go())
+
+
+def test_claimed_job_runs_every_stage(db, sessions, workflow):
+    [job_id] = queue(db)
+    workers = JobWorkers(workers=0)
+    assert run(workers, 2) == [True, False]
+
+    job, order = load(db, job_id)
+    assert (job.status, job.attempts, job.locked_by, job.error) == ("succeeded", 1, None, None)
+    view = jobs.job_view(job)
+    assert [(s["name"], s["status"]) for s in view["stages"]] == [("extract", "skipped")] + [
+        (name, "done") for name in jobs.STAGES[1:]
+    ]
+    assert view["result"]["pricing"]["final_price"] == order.final_price
+    assert order.status != "received"
+    assert [p["order_id"] for p in workflow] == [order.id]
+    assert workers.job_stats.claimed == 1 and workers.job_stats.succeeded == 1
+
+
+def test_failed_attempts_are_retried_then_failed(db, sessions, workflow, monkeypatch):
+    def broken(self, spec):
+        raise RuntimeError("pricing table missing")
+
+    monkeypatch.setattr(jobs.PriceEngine, "estimate", broken)
+    [job_id] = queue(db)
+    workers = JobWorkers(workers=0, max_attempts=2, retry_seconds=0)
+
+    assert run(workers) == [True]
+    job, _ = load(db, job_id)
+    assert (job.status, job.attempts, job.locked_by) == ("queued", 1, None)
+    assert job.error == "price: RuntimeError: pricing table missing"
+    assert json.loads(job.stages)["price"]["status"] == "failed"
+
+    assert run(workers, 2) == [True, False]
+    job, order = load(db, job_id)
+    assert (job.status, job.attempts) == ("failed", 2)
+    assert job.finished_at is not None
+    assert order.status == "received" and workflow == []
+    assert (workers.job_stats.retried, workers.job_stats.failed) == (1, 1)
+
+
+def test_missing_order_fails_without_retry(db, sessions, workflow):
+    [job_id] = queue(db, order_id=999999)
+    workers = JobWorkers(workers=0, max_attempts=3, retry_seconds=0)
+    assert run(workers, 2) == [True, False]
+    job, _ = load(db, job_id)
+    assert (job.status, job.attempts, job.error) == ("failed", 1, "start: JobFailed: Order not found")
+
+
+def test_expired_lease_is_reclaimed(db, sessions, workflow):
+    past = jobs._now() - timedelta(minutes=5)
+    [job_id] = queue(db, status="running", attempts=1, locked_by="dead-worker", locked_until=past)
+    [live_id] = queue(db, status="running", attempts=1, locked_by="live-worker", locked_until=past + timedelta(hours=1))
+    workers = JobWorkers(workers=0)
+    assert run(workers, 2) == [True, False]
+
+    job, _ = load(db, job_id)
+    assert (job.status, job.attempts) == ("succeeded", 2)
+    assert load(db, live_id)[0].locked_by == "live-worker"
+    assert workers.job_stats.reclaimed == 1
+
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(db, sessions, workflow):
+    past = jobs._now() - timedelta(minutes=5)
+    [job_id] = queue(db, status="running", attempts=3, locked_by="dead-worker", locked_until=past)
+    workers = JobWorkers(workers=0, max_attempts=3)
+    assert run(workers) == [False]
+    job, _ = load(db, job_id)
+    assert (job.status, job.error, job.locked_by) == ("failed", "worker lost (lease expired)", None)
+    assert workflow == []
+
+
+class RacingSession(AsyncSession):
+    """Holds its first UPDATE until every racing session has read, so the claims interleave."""
+
+    barrier: asyncio.Barrier
+
+    async def execute(self, statement, *args, **kwargs):
+        if getattr(statement, "is_update", False) and not getattr(self, "_raced", False):
+            self._raced = True
+            await asyncio.wait_for(self.barrier.wait(), 5)
+        return await super().execute(statement, *args, **kwargs)
+
+
+def claim_concurrently(engine, workers, count):
+    async def claim(n):
+        async with RacingSession(engine, expire_on_commit=False) as session:
+            job = await workers._claim(session, f"worker-{n}")
+            return job.id if job is not None else None
+
+    async def go():
+        RacingSession.barrier = asyncio.Barrier(count)
+        try:
+            return await asyncio.gather(*(claim(n) for n in range(count)))
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(go())
+
+
+def test_concurrent_claims_take_a_job_once_on_sqlite(db, sessions):
+    [job_id] = queue(db)
+    workers = JobWorkers(workers=0)
+    claimed = claim_concurrently(sessions, workers, 2)
+    assert sorted(claimed, key=str) == [job_id, None]
+    job, _ = load(db, job_id)
+    assert (job.status, job.attempts) == ("running", 1)
+    assert workers.job_stats.claimed == 1
+
+
+def test_concurrent_claims_skip_locked_jobs_on_postgres(pg):
+    engine, async_engine = pg
+    job_ids = queue(engine, 3)
+    workers = JobWorkers(workers=0)
+    claimed = claim_concurrently(async_engine, workers, 3)
+    assert sorted(claimed) == job_ids
+    with Session(engine) as session:
+        assert {session.get(EstimateJob, i).attempts for i in job_ids} == {1}
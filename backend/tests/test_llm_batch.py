@@ -0,0 +1,110 @@
+"""Packed bulk parses: how texts are grouped into calls and which elements are re-parsed alone."""
+import asyncio
+import json
+import re
+
+import pytest
+
+from app.services import llm_parser
+from app.services.llm_parser import BATCH_ANSWER_TOKENS, BatchStats, LLMSpecParser
+from app.services.text_reducer import estimate_tokens
+
+SPEC = {
+    "product_type": "flyer", "quantity": None, "size": "210x297mm", "paper_type": "C300", "color": "4/4",
+    "finishing": [], "turnaround_days": 3, "rush": False, "missing_fields": [],
+}
+
+
+def order(n):
+    return f"Please print {n} flyers 210x297mm C300 4/4, 3 days"
+
+
+def spec(n):
+    return dict(SPEC, quantity=n)
+
+
+class PackingClient:
+    """Answers single prompts with the spec for the text's quantity and packed prompts with `answer(quantities)`."""
+
+    def __init__(self, answer=None):
+        self.answer = answer or (lambda quantities: [dict(spec(q), index=i) for i, q in enumerate(quantities)])
+        self.packs = []
+        self.singles = 0
+
+    def __call__(self, prompt):
+        quantities = [int(q) for q in re.findall(r"Please print (\d+) flyers", prompt)]
+        if "### ORDER" not in prompt:
+            self.singles += 1
+            return json.dumps(spec(quantities[-1]))
+        self.packs.append(quantities)
+        answer = self.answer(quantities)
+        return answer if isinstance(answer, str) else json.dumps(answer)
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = BatchStats()
+    monkeypatch.setattr(llm_parser, "batch_stats", stats)
+    return stats
+
+
+def parser_for(client):
+    return LLMSpecParser(client=client, decision_mode="separate", parse_mode="llm")
+
+
+def test_packs_respect_the_item_cap_and_leave_singletons_alone(monkeypatch):
+    monkeypatch.setattr(llm_parser, "LLM_BATCH_MAX_ITEMS", 3)
+    texts = {str(n): order(n) for n in range(7)}
+    packs, alone = parser_for(PackingClient())._packs(list(texts), texts)
+    assert packs == [["0", "1", "2"], ["3", "4", "5"]] and alone == ["6"]
+
+
+def test_packs_respect_the_token_budget(monkeypatch):
+    parser = parser_for(PackingClient())
+    cost = estimate_tokens(order(1)) + BATCH_ANSWER_TOKENS
+    monkeypatch.setattr(llm_parser, "LLM_BATCH_TOKEN_BUDGET", estimate_tokens(parser._batch_prompt([])) + 2 * cost)
+    texts = {"a": order(1), "b": order(2), "c": order(3), "long": order(4) + " " + "x" * 4 * 3 * cost}
+    packs, alone = parser._packs(list(texts), texts)
+    assert packs == [["a", "b"]] and alone == ["c", "long"]
+
+
+def test_parse_many_packs_texts_and_keeps_input_order(stats):
+    client = PackingClient()
+    texts = [order(n) for n in (100, 200, 300)] + ["  " + order(100).upper()]
+    specs = parser_for(client).parse_many(texts)
+    assert specs == [spec(100), spec(200), spec(300), spec(100)]
+    assert client.packs == [[100, 200, 300]] and client.singles == 0
+    assert (stats.packs, stats.packed_items, stats.answered, stats.retried) == (1, 3, 3, 0)
+
+
+def test_missing_duplicate_and_unusable_elements_are_reparsed_alone(stats):
+    def answer(quantities):
+        return [
+            dict(spec(quantities[0]), index=0),
+            # index 1 is never answered
+            dict(spec(quantities[2]), index=2),
+            dict(spec(999), index=2),
+            "not an object",
+            dict(spec(quantities[3]), index=9),
+        ]
+
+    client = PackingClient(answer)
+    texts = [order(n) for n in (100, 200, 300, 400)]
+    assert parser_for(client).parse_many(texts) == [spec(n) for n in (100, 200, 300, 400)]
+    assert client.singles == 3
+    assert (stats.answered, stats.retried, stats.failed_packs) == (1, 3, 0)
+
+
+def test_unreadable_answer_reparses_every_text(stats):
+    client = PackingClient(lambda quantities: "Sorry, I can't help with that [")
+    texts = [order(n) for n in (100, 200)]
+    assert asyncio.run(parser_for(client).aparse_many(texts, concurrency=1)) == [spec(100), spec(200)]
+    assert len(client.packs) == 1 and client.singles == 2
+    assert (stats.answered, stats.retried, stats.failed_packs) == (0, 2, 1)
+
+
+def test_batching_disabled_parses_each_text(monkeypatch, stats):
+    monkeypatch.setattr(llm_parser, "LLM_BATCH_MAX_ITEMS", 1)
+    client = PackingClient()
+    assert parser_for(client).parse_many([order(100), order(200)]) == [spec(100), spec(200)]
+    assert client.packs == [] and client.singles == 2 and stats.packs == 0
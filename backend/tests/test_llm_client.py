@@ -0,0 +1,165 @@
+"""AsyncLLMClient against the in-process LLM stub: deadlines, retries, concurrency cap and breaker."""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.llm_client import AsyncLLMClient, LLMCircuitOpen, LLMError, LLMTimeout
+
+MESSAGES = [
+    {"role": "system", "content": "You are a print order extraction assistant."},
+    {"role": "user", "content": "Extract the order as JSON.\nText:\nPlease print 250 flyers A5 on 170gsm silk"},
+]
+
+
+def make_client(llm_stub, **kwargs) -> AsyncLLMClient:
+    kwargs.setdefault("breaker", CircuitBreaker("test", window=10, min_calls=3, failure_rate=0.5, open_seconds=60))
+    client = AsyncLLMClient(base_url="http://stub/v1", api_key="test", **kwargs)
+    transport = httpx.ASGITransport(app=llm_stub.app)
+    http = {}
+
+    def _client():
+        # One httpx client per event loop, like the real one, but talking to the stub in-process
+        loop = asyncio.get_running_loop()
+        if loop not in http:
+            http[loop] = httpx.AsyncClient(transport=transport, base_url=client.base_url)
+        return http[loop]
+
+    client._client = _client
+    return client
+
+
+def stub_requests(llm_stub) -> int:
+    return llm_stub._stats["requests"]
+
+
+def test_chat_returns_the_stub_answer(llm_stub):
+    client = make_client(llm_stub)
+    content = asyncio.run(client.chat(MESSAGES))
+    assert json.loads(content)["product_type"] == "flyer"
+    stats = client.stats.snapshot()
+    assert stats["succeeded"] == 1 and stats["prompt_tokens"] > 0 and stats["completion_tokens"] > 0
+
+
+def test_hung_calls_time_out_per_attempt_and_within_the_total_deadline(llm_stub):
+    llm_stub.config.update({"hang_rate": 1.0, "hang_ms": 5000})
+    client = make_client(llm_stub, timeout=0.05, total_timeout=0.5, max_retries=10)
+    started = time.perf_counter()
+    with pytest.raises(LLMTimeout):
+        asyncio.run(client.chat(MESSAGES))
+    assert time.perf_counter() - started < 1.5
+    stats = client.stats.snapshot()
+    assert stats["retries"] >= 1 and stats["timeouts"] >= 2 and stats["failed"] == 1
+
+
+def test_server_errors_are_retried_up_to_max_retries(llm_stub):
+    llm_stub.config.update({"error_rate": 1.0})
+    client = make_client(llm_stub, max_retries=2)
+    with pytest.raises(LLMError) as exc:
+        asyncio.run(client.chat(MESSAGES))
+    assert "HTTP 500" in str(exc.value)
+    assert stub_requests(llm_stub) == 3
+    assert client.stats.snapshot()["retries"] == 2
+
+
+def test_rate_limited_calls_are_retried_until_they_succeed(llm_stub):
+    llm_stub.config.update({"rate_limit_rate": 0.3})
+    client = make_client(llm_stub, max_retries=10)
+
+    async def run():
+        return await asyncio.gather(*(client.chat(MESSAGES) for _ in range(10)))
+
+    assert all(json.loads(c)["product_type"] == "flyer" for c in asyncio.run(run()))
+    assert llm_stub._stats["by_status"].get("429", 0) == client.stats.snapshot()["retries"] > 0
+
+
+def test_concurrency_cap_bounds_calls_in_flight(llm_stub):
+    llm_stub.config.update({"latency": "fixed:50"})
+    client = make_client(llm_stub, max_concurrency=2)
+
+    async def run():
+        await asyncio.gather(*(client.chat(MESSAGES) for _ in range(6)))
+
+    asyncio.run(run())
+    stats = client.stats.snapshot()
+    assert stats["max_in_flight"] == 2 and stats["succeeded"] == 6
+    assert stats["queue_wait_seconds_total"] > 0
+
+
+def test_breaker_opens_on_failures_and_short_circuits(llm_stub):
+    llm_stub.config.update({"error_rate": 1.0})
+    client = make_client(llm_stub, max_retries=0)
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(LLMError):
+                await client.chat(MESSAGES)
+        with pytest.raises(LLMCircuitOpen):
+            await client.chat(MESSAGES)
+
+    asyncio.run(run())
+    assert stub_requests(llm_stub) == 3
+    assert client.breaker.stats()["state"] == "open"
+    assert client.stats.snapshot()["short_circuited"] == 1
+
+
+def test_breaker_probe_closes_it_once_the_provider_recovers(llm_stub):
+    llm_stub.config.update({"error_rate": 1.0})
+    breaker = CircuitBreaker("test", window=10, min_calls=3, failure_rate=0.5, open_seconds=0.05)
+    client = make_client(llm_stub, max_retries=0, breaker=breaker)
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(LLMError):
+                await client.chat(MESSAGES)
+        llm_stub.config.update({"error_rate": 0.0})
+        await asyncio.sleep(0.06)
+        return await client.chat(MESSAGES)
+
+    assert json.loads(asyncio.run(run()))["product_type"] == "flyer"
+    stats = breaker.stats()
+    assert stats["state"] == "closed" and stats["trips"] == 1 and stats["probes"] == 1
+
+
+def test_timeouts_count_as_breaker_failures(llm_stub):
+    llm_stub.config.update({"hang_rate": 1.0, "hang_ms": 5000})
+    client = make_client(llm_stub, timeout=0.02, total_timeout=0.05, max_retries=0)
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(LLMTimeout):
+                await client.chat(MESSAGES)
+
+    asyncio.run(run())
+    assert client.breaker.stats()["state"] == "open"
+
+
+def test_each_loop_gets_its_own_http_client_closed_with_the_loop():
+    client = AsyncLLMClient(base_url="http://stub/v1", api_key="test")
+
+    async def pooled():
+        http = client._client()
+        assert client._client() is http
+        return http
+
+    first = asyncio.run(pooled())
+    second = asyncio.run(pooled())
+    assert first is not second
+    # asyncio.run closed the first loop's client before closing the loop
+    assert first.is_closed and second.is_closed
+    assert len(client._http) == 1
+
+
+def test_aclose_closes_the_running_loop_client():
+    client = AsyncLLMClient(base_url="http://stub/v1", api_key="test")
+
+    async def go():
+        http = client._client()
+        await client.aclose()
+        return http, client._http
+
+    http, remaining = asyncio.run(go())
+    assert http.is_closed and remaining == {}
@@ -0,0 +1,182 @@
+"""LLMSpecParser against a counting stub client: decision modes and single-flight parses."""
+import asyncio
+import json
+
+import pytest
+
+from app.services import llm_parser
+from app.services.llm_parser import DECISION_SYSTEM_PROMPT, LLMSpecParser
+from app.services.parse_cache import ParseCache
+from app.services.singleflight import SingleFlight
+
+TEXT = "Please print 500 flyers 210x297mm C300 4/4, 3 days"
+SPEC = {
+    "product_type": "flyer", "quantity": 500, "size": "210x297mm", "paper_type": "C300", "color": "4/4",
+    "finishing": [], "turnaround_days": 3, "rush": False, "missing_fields": [],
+}
+
+
+class CountingClient:
+    """Pooled-client stand-in: answers extraction prompts with SPEC (plus any extra keys) and decisions with `decision`."""
+
+    model = "stub"
+
+    def __init__(self, decision="rejected", error=None, **extra):
+        self.decision = decision
+        self.error = error
+        self.extra = extra
+        self.extractions = 0
+        self.decisions = 0
+        # Set by tests that hold extraction calls in flight until they release them
+        self.gate = None
+
+    async def chat(self, messages, **kwargs):
+        await asyncio.sleep(0)
+        if messages[0]["content"] == DECISION_SYSTEM_PROMPT:
+            self.decisions += 1
+            return self.decision
+        self.extractions += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return json.dumps(dict(SPEC, **self.extra))
+
+
+@pytest.fixture
+def pooled(monkeypatch):
+    def install(client):
+        monkeypatch.setattr(llm_parser, "get_llm_client", lambda: client)
+        return client
+
+    return install
+
+
+def parse_with_decision(parser, text=TEXT):
+    return asyncio.run(parser.aparse_with_decision(text))
+
+
+def test_combined_mode_makes_one_call_for_spec_and_decision(pooled):
+    client = pooled(CountingClient(disposition="needs_review"))
+    combined = LLMSpecParser(decision_mode="combined", parse_mode="llm")
+    spec, decision = parse_with_decision(combined)
+    assert (client.extractions, client.decisions) == (1, 0)
+    assert decision == "needs_review"
+
+    separate_spec, _ = parse_with_decision(LLMSpecParser(decision_mode="separate", parse_mode="llm"))
+    assert spec == separate_spec == SPEC
+
+
+def test_separate_mode_makes_two_calls(pooled):
+    client = pooled(CountingClient(decision="rejected"))
+    spec, decision = parse_with_decision(LLMSpecParser(decision_mode="separate", parse_mode="llm"))
+    assert (client.extractions, client.decisions) == (1, 1)
+    assert (spec, decision) == (SPEC, "rejected")
+
+
+def test_disposition_never_reaches_the_spec(pooled):
+    pooled(CountingClient(disposition="auto_approved"))
+    cache = ParseCache(persist=False)
+    parser = LLMSpecParser(cache=cache, decision_mode="combined", parse_mode="llm")
+
+    first = asyncio.run(parser.aparse(TEXT))
+    [batched] = parser.parse_many([TEXT])
+    # A parser that only ever sees the cached answer still hands its disposition to decide
+    fresh = LLMSpecParser(cache=cache, decision_mode="combined", parse_mode="llm")
+    hit = asyncio.run(fresh.aparse(TEXT))
+    assert first == batched == hit == SPEC
+    assert cache.memory_hits >= 1
+    assert fresh.decide(hit, TEXT) == "auto_approved"
+
+
+def test_unknown_disposition_is_dropped_and_decide_asks_again(pooled):
+    client = pooled(CountingClient(decision="needs_review", disposition="ship it"))
+    spec, decision = parse_with_decision(LLMSpecParser(decision_mode="combined", parse_mode="llm"))
+    assert spec == SPEC and decision == "needs_review"
+    assert (client.extractions, client.decisions) == (1, 1)
+
+
+@pytest.fixture
+def flights(monkeypatch):
+    flights = SingleFlight("test")
+    monkeypatch.setattr(llm_parser, "parse_flights", flights)
+    return flights
+
+
+def held(client, coro_fn):
+    """Run `coro_fn()` with extraction calls held until every parse has joined, then released."""
+
+    async def go():
+        client.gate = asyncio.Event()
+        task = asyncio.ensure_future(coro_fn())
+        for _ in range(10):
+            await asyncio.sleep(0)
+        client.gate.set()
+        return await task
+
+    return asyncio.run(go())
+
+
+def test_concurrent_identical_parses_share_one_call(pooled, flights):
+    client = pooled(CountingClient())
+    parser = LLMSpecParser(decision_mode="separate", parse_mode="llm")
+    texts = [TEXT, "  " + TEXT.upper(), TEXT, "Please print 100 posters A2"]
+
+    specs = held(client, lambda: asyncio.gather(*(parser.aparse(t) for t in texts)))
+    assert client.extractions == 2
+    assert specs[:3] == [SPEC] * 3
+    assert (flights.leaders, flights.collapsed) == (2, 2)
+    # Waiters get their own copies
+    specs[0]["finishing"].append("foil")
+    assert specs[1]["finishing"] == []
+
+
+def test_leader_exception_reaches_every_waiter(pooled, flights):
+    client = pooled(CountingClient(error=RuntimeError("provider exploded")))
+    parser = LLMSpecParser(decision_mode="separate", parse_mode="llm")
+
+    results = held(client, lambda: asyncio.gather(*(parser.aparse(TEXT) for _ in range(3)), return_exceptions=True))
+    assert client.extractions == 1
+    assert [type(r) for r in results] == [RuntimeError] * 3
+    assert flights.errors == 1
+
+
+def test_cancelled_leader_does_not_cancel_the_shared_call(pooled, flights):
+    client = pooled(CountingClient())
+    parser = LLMSpecParser(decision_mode="separate", parse_mode="llm")
+
+    async def go():
+        client.gate = asyncio.Event()
+        leader = asyncio.ensure_future(parser.aparse(TEXT))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(parser.aparse(TEXT))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        client.gate.set()
+        return leader, await follower
+
+    leader, spec = asyncio.run(go())
+    assert leader.cancelled()
+    assert spec == SPEC and client.extractions == 1
+
+
+def test_finished_calls_leave_no_key_behind(pooled, flights):
+    client = pooled(CountingClient())
+    parser = LLMSpecParser(decision_mode="separate", parse_mode="llm")
+
+    async def go():
+        first = await parser.aparse(TEXT)
+        in_flight = flights.stats()["in_flight"]
+        second = await parser.aparse(TEXT)
+        return first, in_flight, second
+
+    first, in_flight, second = asyncio.run(go())
+    assert first == second == SPEC
+    assert in_flight == 0 and flights._tasks == {}
+    assert client.extractions == 2 and flights.leaders == 2
+
+    client.error = RuntimeError("down")
+    with pytest.raises(RuntimeError):
+        asyncio.run(parser.aparse(TEXT))
+    assert flights._tasks == {}
@@ -0,0 +1,58 @@
+import json
+
+from app.services import llm_parser
+from app.services.llm_parser import LLMSpecParser
+from app.services.spec_scanner import DEFAULT_VOCAB, SpecScanner
+
+
+class RecordingClient:
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return json.dumps(self.answer)
+
+
+def test_confidence_tiers():
+    parser = LLMSpecParser()
+    values, confidence = parser.scan_critical("Please print 500 flyers 210x297mm on C300")
+    assert values == {"product_type": "flyer", "quantity": 500, "size": "210x297mm", "paper_type": "C300"}
+    assert confidence == {"product_type": 1.0, "quantity": 1.0, "size": 1.0, "paper_type": 1.0}
+
+    values, confidence = parser.scan_critical("Need 300, sizes 85x55mm or 90x50mm, business cards and flyers")
+    assert (values["quantity"], confidence["quantity"]) == (300, 0.5)
+    assert (values["size"], confidence["size"]) == ("85x55mm", 0.4)
+    assert (values["product_type"], confidence["product_type"]) == ("business_card", 0.4)
+    assert (values["paper_type"], confidence["paper_type"]) == (None, 0.0)
+
+    values, confidence = parser.scan_critical("qty: 0 flyers")
+    assert (values["quantity"], confidence["quantity"]) == (None, 0.0)
+
+
+def test_vocabulary_products_are_confident(monkeypatch):
+    vocab = dict(DEFAULT_VOCAB, products=dict(DEFAULT_VOCAB["products"], poster=["poster"]))
+    monkeypatch.setattr(llm_parser, "default_scanner", SpecScanner(vocab))
+    values, confidence = LLMSpecParser().scan_critical("40 posters 420x594mm c170, 2 days")
+    assert values == {"product_type": "poster", "quantity": 40, "size": "420x594mm", "paper_type": "C170"}
+    assert min(confidence.values()) == 1.0
+
+
+def test_cascade_asks_the_llm_only_for_weak_fields():
+    client = RecordingClient({"paper_type": "C350"})
+    parser = LLMSpecParser(client=client, parse_mode="cascade", decision_mode="separate")
+    spec = parser.parse("Please print 500 flyers 210x297mm, glossy, 3 days")
+    assert len(client.prompts) == 1
+    assert '"paper_type": null' in client.prompts[0]
+    assert '"quantity": null' not in client.prompts[0]
+    assert (spec["product_type"], spec["quantity"], spec["size"], spec["paper_type"]) == ("flyer", 500, "210x297mm", "C350")
+    assert spec["missing_fields"] == []
+
+
+def test_cascade_skips_the_llm_when_every_field_is_confident():
+    client = RecordingClient({})
+    parser = LLMSpecParser(client=client, parse_mode="cascade", decision_mode="separate")
+    spec = parser.parse("Please print 500 flyers 210x297mm C300 4/4, 3 days")
+    assert client.prompts == []
+    assert spec["quantity"] == 500 and spec["missing_fields"] == []
@@ -0,0 +1,119 @@
+import json
+import random
+import statistics
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def completion(client, text="Please print 500 flyers 210x297mm C300 4/4, 3 days"):
+    return client.post("/v1/chat/completions", json={
+        "model": "stub",
+        "messages": [{"role": "system", "content": "x"}, {"role": "user", "content": "Extract.\nText:\n" + text}],
+    })
+
+
+def test_latency_sampler_specs(llm_stub):
+    rng = random.Random(1)
+    assert llm_stub.latency_sampler("fixed:120")(rng) == 120
+    assert all(50 <= llm_stub.latency_sampler("uniform:50,400")(rng) <= 400 for _ in range(200))
+    assert all(llm_stub.latency_sampler("normal:10,50")(rng) >= 0 for _ in range(200))
+    lognormal = llm_stub.latency_sampler("lognormal:200,0.6")
+    assert 170 < statistics.median(lognormal(rng) for _ in range(2000)) < 230
+    for bad in ("fixed", "fixed:a", "uniform:1", "poisson:3", ""):
+        with pytest.raises(ValueError):
+            llm_stub.latency_sampler(bad)
+
+
+def test_config_endpoint_validates_and_applies(llm_stub):
+    client = TestClient(llm_stub.app)
+    assert client.post("/config", json={"latncy": "fixed:1"}).status_code == 400
+    assert client.post("/config", json={"latency": "fixed:oops"}).status_code == 400
+    assert client.get("/config").json()["latency"] == "fixed:0"
+
+    resp = client.post("/config", json={"latency": "uniform:1,2", "rpm": "7", "error_rate": "0.25"})
+    assert resp.status_code == 200
+    assert resp.json()["latency"] == "uniform:1,2"
+    assert llm_stub.config.rpm == 7 and llm_stub.config.error_rate == 0.25
+
+
+def test_answers_extraction_prompts_with_the_heuristic_parse(llm_stub):
+    text = "Please print 500 flyers 210x297mm C300 4/4, 3 days"
+    resp = completion(TestClient(llm_stub.app), text)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert json.loads(body["choices"][0]["message"]["content"]) == llm_stub._parser._default_parse(text)
+    assert body["usage"]["total_tokens"] == body["usage"]["prompt_tokens"] + body["usage"]["completion_tokens"]
+
+
+def test_failure_shares(llm_stub):
+    llm_stub.config.update({"error_rate": 0.2, "rate_limit_rate": 0.1})
+    client = TestClient(llm_stub.app)
+    statuses = []
+    for _ in range(400):
+        resp = completion(client)
+        statuses.append(resp.status_code)
+        if resp.status_code == 429:
+            assert resp.headers["Retry-After"] == "1"
+            assert resp.json()["error"]["code"] == "rate_limit_exceeded"
+    assert 60 <= statuses.count(500) <= 100
+    assert 25 <= statuses.count(429) <= 55
+    stats = client.get("/stats").json()
+    assert stats["requests"] == 400
+    assert stats["by_status"] == {str(s): statuses.count(s) for s in set(statuses)}
+
+
+def test_failure_draws_are_reproducible_with_a_seed(llm_stub):
+    client = TestClient(llm_stub.app)
+
+    def run():
+        llm_stub.config.update({"error_rate": 0.5, "seed": "repeat"})
+        return [completion(client).status_code for _ in range(30)]
+
+    assert run() == run()
+
+
+def test_rpm_token_bucket(llm_stub):
+    llm_stub.config.update({"rpm": 3})
+    client = TestClient(llm_stub.app)
+    assert [completion(client).status_code for _ in range(5)] == [200, 200, 200, 429, 429]
+    llm_stub.config._refilled -= 20  # a third of a minute later: one token back
+    assert [completion(client).status_code for _ in range(2)] == [200, 429]
+
+
+def test_simulated_latency_and_hangs(llm_stub):
+    llm_stub.config.update({"latency": "fixed:40"})
+    client = TestClient(llm_stub.app)
+    started = time.perf_counter()
+    assert completion(client).status_code == 200
+    assert time.perf_counter() - started >= 0.04
+
+    llm_stub.config.update({"hang_rate": 1.0, "hang_ms": 80})
+    started = time.perf_counter()
+    assert completion(client).status_code == 200
+    assert time.perf_counter() - started >= 0.08
+    stats = client.get("/stats").json()
+    assert stats["latency_ms_max"] == 80
+    assert stats["latency_ms_mean"] == 60
+
+
+def test_fixtures_answer_first(llm_stub, monkeypatch, tmp_path):
+    path = tmp_path / "fixtures.jsonl"
+    path.write_text(json.dumps({"text": "Recorded  order TEXT", "content": {"quantity": 42}}) + "\n")
+    monkeypatch.setattr(llm_stub, "fixtures", llm_stub.Fixtures(str(path)))
+    client = TestClient(llm_stub.app)
+
+    resp = completion(client, "recorded order text")
+    assert json.loads(resp.json()["choices"][0]["message"]["content"]) == {"quantity": 42}
+    assert completion(client, "another order").status_code == 200
+    stats = client.get("/stats").json()
+    assert (stats["fixture_hits"], stats["fixtures"]) == (1, 1)
+
+
+def test_webhook_counter_and_stats_reset(llm_stub):
+    client = TestClient(llm_stub.app)
+    assert client.post("/webhook/n8n/estimate", json={"order_id": 1}).json() == {"ok": True}
+    assert client.get("/stats").json()["webhooks"] == 1
+    client.post("/stats/reset")
+    assert client.get("/stats").json()["webhooks"] == 0
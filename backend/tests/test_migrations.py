@@ -0,0 +1,67 @@
+from sqlalchemy import inspect, text
+from sqlmodel import create_engine
+
+from app.db import migrations
+from app.db.migrations import LATEST_VERSION, MIGRATIONS, applied_versions, current_version, upgrade
+
+TABLES = {"order", "order_rollup", "llm_parse_cache", "extraction_cache", "estimate_job", "schema_migrations"}
+
+
+def test_upgrade_creates_the_schema_and_stamps_every_version_on_sqlite(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/fresh.db")
+    assert current_version(engine) == 0
+
+    assert upgrade(engine) == [m.version for m in MIGRATIONS]
+    assert current_version(engine) == LATEST_VERSION
+    assert TABLES <= set(inspect(engine).get_table_names())
+    assert {"ix_order_status", "ix_order_created_at"} <= {i["name"] for i in inspect(engine).get_indexes("order")}
+    engine.dispose()
+
+
+def test_upgrade_is_idempotent_and_stamps_only_missing_versions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/partial.db")
+    with engine.begin() as conn:
+        applied_versions(conn)
+        for m in MIGRATIONS[:3]:
+            migrations._record(conn, m)
+
+    assert upgrade(engine) == [m.version for m in MIGRATIONS[3:]]
+    assert upgrade(engine) == []
+    with engine.connect() as conn:
+        assert applied_versions(conn) == [m.version for m in MIGRATIONS]
+    engine.dispose()
+
+
+def test_cli_current_and_list(migrated, capsys):
+    assert migrations.main(["current"]) == 0
+    assert capsys.readouterr().out.strip() == str(LATEST_VERSION)
+    assert migrations.main(["list"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == len(MIGRATIONS) and all(" applied " in line for line in lines)
+    assert migrations.main(["downgrade"]) == 2
+
+
+def test_upgrade_on_postgres_applies_once_with_indexes(pg):
+    engine, _ = pg
+    with engine.connect() as conn:
+        assert applied_versions(conn) == [m.version for m in MIGRATIONS]
+        indexes = {r[0] for r in conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = 'order'"))}
+    assert {"ix_order_status", "ix_order_email", "ix_order_created_at"} <= indexes
+    assert upgrade(engine) == []
+    assert current_version(engine) == LATEST_VERSION
+
+
+def test_rollup_migration_backfills_existing_orders_on_postgres(pg):
+    engine, _ = pg
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE order_rollup"))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = 4"))
+        conn.execute(text(
+            "INSERT INTO \"order\" (raw_text, status, final_price, created_at) VALUES "
+            "('a', 'received', 10, '2026-03-01 23:30:00-02'), ('b', 'received', 5, '2026-03-02 01:00:00+00'), "
+            "('c', NULL, NULL, '2026-03-01 12:00:00+00')"
+        ))
+    assert upgrade(engine) == [4]
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT day::text, status, order_count, revenue FROM order_rollup ORDER BY 1, 2")).all()
+    assert rows == [("2026-03-01", "unknown", 1, 0.0), ("2026-03-02", "received", 2, 15.0)]
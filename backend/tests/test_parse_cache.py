@@ -0,0 +1,105 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import func, select
+from sqlmodel import Session
+
+from app.models.llm_cache import LLMParseCacheEntry
+from app.services import parse_cache
+from app.services.llm_parser import LLMSpecParser
+from app.services.parse_cache import ParseCache, cache_key, normalize_text, prune
+
+SPEC = {"product_type": "flyer", "quantity": 500}
+KEY = cache_key("Please print 500 flyers", "gpt", "v1")
+
+
+class RecordingClient:
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return self.answer
+
+
+def rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(LLMParseCacheEntry)).scalar_one()
+
+
+def test_keys_fold_case_width_and_whitespace_but_not_model_or_prompt():
+    variants = ["Please print 500 flyers", "  PLEASE   print\n500\tflyers ", "Please print ５００ ｆｌｙｅｒｓ"]
+    assert {normalize_text(v) for v in variants} == {"please print 500 flyers"}
+    assert {cache_key(v, "gpt", "v1") for v in variants} == {KEY}
+    assert cache_key(variants[0], "gpt", "v2") != KEY != cache_key(variants[0], "other", "v1")
+    assert cache_key("Please print 50 flyers", "gpt", "v1") != KEY
+
+
+def test_memory_then_database_hits(db):
+    cache = ParseCache()
+    assert cache.get(KEY) is None
+    cache.put(KEY, SPEC, "gpt", "v1")
+    assert cache.get(KEY) == SPEC and rows(db) == 1
+
+    cache.clear_memory()
+    assert asyncio.run(cache.aget(KEY)) == SPEC
+    assert cache.get(KEY) == SPEC
+    assert (cache.misses, cache.memory_hits, cache.db_hits) == (1, 2, 1)
+    # A fresh process sees the row too
+    assert ParseCache().get(KEY) == SPEC
+
+
+def test_entries_expire_in_both_tiers(db, monkeypatch):
+    cache = ParseCache(ttl=60, persist=False)
+    cache.put(KEY, SPEC, "gpt", "v1")
+    now = parse_cache.time.time()
+    monkeypatch.setattr(parse_cache, "time", SimpleNamespace(time=lambda: now + 61))
+    assert cache.get(KEY) is None and cache.expirations == 1
+    monkeypatch.undo()
+
+    cache = ParseCache(ttl=0)
+    cache.put(KEY, SPEC, "gpt", "v1")
+    cache.clear_memory()
+    assert cache.get(KEY) is None and cache.expirations == 1
+
+
+def test_memory_tier_is_lru_bounded():
+    cache = ParseCache(max_entries=2, persist=False)
+    for n in range(3):
+        cache.put(str(n), {"n": n}, "gpt", "v1")
+        cache.get("0")
+    assert cache.get("1") is None and cache.get("0") == {"n": 0} and cache.evictions == 1
+
+
+def test_prune_drops_expired_then_oldest_rows(db):
+    now = datetime.now(timezone.utc)
+    with Session(db) as session:
+        for n, (age, ttl) in enumerate([(5, 1), (4, 10), (3, 10), (2, 10)]):
+            created = now - timedelta(minutes=age)
+            session.add(LLMParseCacheEntry(
+                key=str(n), model="gpt", prompt_version="v1", spec="{}",
+                created_at=created, expires_at=created + timedelta(minutes=ttl),
+            ))
+        session.commit()
+        assert prune(session, max_entries=2) == 2
+        assert sorted(session.exec(select(LLMParseCacheEntry.key)).scalars().all()) == ["2", "3"]
+
+
+def test_parser_answers_resubmits_from_the_cache(db):
+    client = RecordingClient(json.dumps(dict(SPEC, missing_fields=[])))
+    parser = LLMSpecParser(client=client, cache=ParseCache(), decision_mode="separate", parse_mode="llm")
+    first = parser.parse("Please print 500 flyers")
+    assert parser.parse("  please PRINT 500 flyers") == first
+    assert len(client.prompts) == 1
+
+
+def test_failed_llm_answers_are_not_cached(db):
+    client = RecordingClient("not json")
+    cache = ParseCache()
+    parser = LLMSpecParser(client=client, cache=cache, decision_mode="separate", parse_mode="llm")
+    for _ in range(2):
+        assert "parse_error" in parser.parse("Please print 500 flyers")["missing_fields"]
+    assert len(client.prompts) == 2 and cache.stores == 0 and rows(db) == 0
@@ -0,0 +1,93 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services import pricing
+from app.services.pricing import PriceEngine
+
+PAPERS = ["C300", "C350", "standard", "C170", "", None]
+FINISHES = list(PriceEngine.FINISHING_COST) + ["foil"]
+COLUMNS = ("process", "material_unit", "material_cost", "setup_cost", "finishing_cost", "margin_pct",
+           "rush_surcharge_pct", "final_price", "base", "margin_amount", "rush_amount")
+
+
+def random_specs(n, seed):
+    rng = random.Random(seed)
+    return [
+        {
+            "quantity": rng.choice([rng.randint(1, 999), rng.randint(1000, 200000), 999, 1000]),
+            "paper_type": rng.choice(PAPERS),
+            "finishing": rng.sample(FINISHES, rng.randint(0, 3)),
+            "rush": rng.random() < 0.3,
+        }
+        for _ in range(n)
+    ]
+
+
+def scalar_rows(engine, specs):
+    rows = []
+    for spec in specs:
+        result = engine.estimate(spec)
+        result.update(result.pop("breakdown"))
+        rows.append(result)
+    return rows
+
+
+def assert_same(batch, rows):
+    for column in COLUMNS:
+        assert [row[column] for row in rows] == [v.item() if hasattr(v, "item") else v for v in batch[column]], column
+
+
+def columns(specs):
+    return (
+        [s["quantity"] for s in specs],
+        [s["paper_type"] for s in specs],
+        [s["finishing"] for s in specs],
+        [s["rush"] for s in specs],
+    )
+
+
+@pytest.fixture(params=["numpy", "scalar"])
+def engine(request, monkeypatch):
+    if request.param == "scalar":
+        monkeypatch.setattr(pricing, "np", None)
+    return PriceEngine()
+
+
+def test_batch_with_finishing_lists_matches_scalar(engine):
+    specs = random_specs(5000, "lists")
+    quantity, paper, finishing, rush = columns(specs)
+    assert_same(engine.estimate_batch(quantity, paper, finishing, rush), scalar_rows(engine, specs))
+
+
+def test_batch_with_finishing_flags_matches_scalar(engine):
+    specs = random_specs(5000, "flags")
+    flags = {name: [name in s["finishing"] for s in specs] for name in FINISHES}
+    for spec in specs:
+        # Flags stand for a finishing list in FINISHING_COST order; unknown names cost nothing
+        spec["finishing"] = [name for name in PriceEngine.FINISHING_COST if name in spec["finishing"]]
+    quantity, paper, _, rush = columns(specs)
+    assert_same(engine.estimate_batch(quantity, paper, flags, rush), scalar_rows(engine, specs))
+
+
+def test_batch_defaults_match_scalar(engine):
+    specs = [{"quantity": q} for q in (1, 10, 999, 1000, 12345)]
+    assert_same(engine.estimate_batch([s["quantity"] for s in specs]), scalar_rows(engine, specs))
+
+
+class TieEngine(PriceEngine):
+    # Unit costs in fractions of a cent, so many prices land on (or a float hair off) half a cent
+    MATERIAL_COST = dict(PriceEngine.MATERIAL_COST, T1=0.0125, T2=0.03125)
+
+
+def test_half_cent_ties_round_like_scalar(monkeypatch):
+    specs = [{"quantity": q, "paper_type": p, "finishing": [], "rush": r}
+             for q in range(1, 3000) for p in ("T1", "T2") for r in (False, True)]
+    engine = TieEngine()
+    rows = scalar_rows(engine, specs)
+    prices = np.array([row["base"] * (1 + 0.2 + row["rush_surcharge_pct"]) for row in rows])
+    # The constructed specs do exercise the fallback: NumPy's rounding disagrees on many of them
+    assert (np.round(prices, 2) != np.array([row["final_price"] for row in rows])).sum() > 100
+    quantity, paper, finishing, rush = columns(specs)
+    assert_same(engine.estimate_batch(quantity, paper, finishing, rush), rows)
@@ -0,0 +1,123 @@
+import asyncio
+from datetime import date, datetime, timezone
+
+from sqlalchemy import func, select
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api import workflow_api
+from app.models.order import Order
+from app.models.rollup import OrderRollup
+from app.services import rollups
+
+DAY = date(2026, 3, 1)
+CREATED = datetime(2026, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def rollup_totals(session) -> dict:
+    rows = session.execute(
+        select(OrderRollup.status, func.sum(OrderRollup.order_count), func.sum(OrderRollup.revenue))
+        .group_by(OrderRollup.status)
+    ).all()
+    return {status: (count, round(revenue, 2)) for status, count, revenue in rows if count}
+
+
+def order_totals(session) -> dict:
+    rows = session.execute(
+        select(Order.status, func.count(Order.id), func.coalesce(func.sum(Order.final_price), 0))
+        .group_by(Order.status)
+    ).all()
+    return {status: (count, round(revenue, 2)) for status, count, revenue in rows}
+
+
+def test_deltas_for_new_order():
+    assert rollups.deltas_for_values(CREATED, None, "received", None) == [
+        {"day": DAY, "status": "received", "order_count": 1, "revenue": 0.0},
+    ]
+
+
+def test_deltas_for_status_change_move_count_and_revenue():
+    assert rollups.deltas_for_values(CREATED, ("received", 10.0), "auto_approved", 42.0) == [
+        {"day": DAY, "status": "received", "order_count": -1, "revenue": -10.0},
+        {"day": DAY, "status": "auto_approved", "order_count": 1, "revenue": 42.0},
+    ]
+
+
+def test_deltas_for_price_change_and_no_change():
+    assert rollups.deltas_for_values(CREATED, ("needs_review", 10.0), "needs_review", 12.5) == [
+        {"day": DAY, "status": "needs_review", "order_count": 0, "revenue": 2.5},
+    ]
+    assert rollups.deltas_for_values(CREATED, ("needs_review", 10.0), "needs_review", 10.0) == []
+
+
+def test_merge_deltas_collapses_buckets_and_drops_zeroes():
+    merged = rollups.merge_deltas([
+        {"day": DAY, "status": "received", "order_count": 1, "revenue": 0.0},
+        {"day": DAY, "status": "received", "order_count": -1, "revenue": 0.0},
+        {"day": DAY, "status": "auto_approved", "order_count": 1, "revenue": 5.0},
+        {"day": DAY, "status": "auto_approved", "order_count": 1, "revenue": 7.0},
+    ])
+    assert merged == [{"day": DAY, "status": "auto_approved", "order_count": 2, "revenue": 12.0}]
+
+
+def test_order_writes_keep_rollups_equal_to_order_sums(db):
+    with Session(db) as session:
+        for price in (10.0, 20.0, 30.0):
+            order = Order(raw_text="flyers", status="received", final_price=price, created_at=CREATED)
+            session.add(order)
+            rollups.record_change_sync(session, order, None)
+        session.commit()
+        order = rollups.lock_order_sync(session, 1)
+        before = rollups.snapshot(order)
+        order.status, order.final_price = "auto_approved", 99.0
+        rollups.record_change_sync(session, order, before)
+        session.commit()
+
+        assert rollup_totals(session) == order_totals(session) == {
+            "received": (2, 50.0), "auto_approved": (1, 99.0),
+        }
+        rollups.rebuild(session)
+        assert rollup_totals(session) == order_totals(session)
+
+
+def test_concurrent_updates_of_one_order_keep_rollups_consistent(pg):
+    """Concurrent writes to the same order (double submits, n8n retries) must not double-apply deltas."""
+    engine, async_engine = pg
+    with Session(engine) as session:
+        order = Order(raw_text="flyers", status="received", created_at=CREATED)
+        session.add(order)
+        rollups.record_change_sync(session, order, None)
+        session.commit()
+        order_id = order.id
+
+    async def update(n: int) -> None:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            await workflow_api.update_order(
+                workflow_api.WorkflowUpdate(order_id=order_id, status=("auto_approved", "needs_review", "rejected")[n % 3], price=float(n)),
+                session,
+            )
+
+    async def run() -> None:
+        await asyncio.gather(*(update(n) for n in range(30)))
+        await async_engine.dispose()
+
+    asyncio.run(run())
+    with Session(engine) as session:
+        totals = order_totals(session)
+        assert sum(count for count, _ in totals.values()) == 1
+        assert rollup_totals(session) == totals
+
+
+def test_rebuild_counts_orders_without_created_at_on_today(db):
+    today = datetime.now(timezone.utc)
+    with Session(db) as session:
+        session.add(Order(raw_text="flyers", status="received", final_price=5.0, created_at=today))
+        session.add(Order(raw_text="flyers", status="received", final_price=7.0, created_at=None))
+        session.add(Order(raw_text="flyers", status="received", final_price=1.0, created_at=CREATED))
+        session.commit()
+        session.execute(Order.__table__.update().where(Order.final_price == 7.0).values(created_at=None))
+        session.commit()
+
+        assert rollups.rebuild(session) == 2
+        rows = session.execute(select(OrderRollup.day, OrderRollup.order_count, OrderRollup.revenue)).all()
+        assert sorted(rows) == [(DAY, 1, 1.0), (today.date(), 2, 12.0)]
@@ -0,0 +1,97 @@
+import random
+import re
+
+from app.services.llm_parser import LLMSpecParser
+from app.services.spec_scanner import DEFAULT_VOCAB, SpecScanner
+
+
+def baseline_default_parse(text):
+    # The per-field regex parser the scanner replaced
+    txt = (text or "").lower()
+    if len(txt) < 30 and not any(k in txt for k in ("print", "flyer", "business", "card", "please", "brochure")):
+        return {
+            "product_type": None, "quantity": None, "size": None, "paper_type": None, "color": None,
+            "finishing": [], "turnaround_days": None, "rush": None,
+            "missing_fields": ["product_type", "quantity", "size"],
+        }
+    q_match = re.search(r"\b(\d{1,6})\b(?=\s*(?:pieces|pcs|flyers|cards|brochures|units)?)", txt)
+    quantity = int(q_match.group(1)) if q_match else None
+    size_match = re.search(r"(\d{2,4}\s*[x×]\s*\d{2,4}(?:mm)?)", txt)
+    size = size_match.group(1).replace(" ", "") if size_match else None
+    paper_match = re.search(r"\b(c\d{3})\b", txt)
+    paper = paper_match.group(1).upper() if paper_match else None
+    color_match = re.search(r"\b(\d+/\d+)\b", txt)
+    finishing = []
+    if "lamination" in txt:
+        finishing.append("lamination")
+    if "spot uv" in txt or "spot_uv" in txt or "spotuv" in txt:
+        finishing.append("spot_uv")
+    if "die cut" in txt or "die_cut" in txt:
+        finishing.append("die_cut")
+    td_match = re.search(r"(\d{1,3})\s*(day|days)", txt)
+    missing = [f for f, v in (("quantity", quantity), ("size", size), ("paper_type", paper)) if not v]
+    return {
+        "product_type": "business_card" if "card" in txt else ("flyer" if "flyer" in txt or "flyers" in txt else None),
+        "quantity": quantity or 100,
+        "size": size or "85x55mm",
+        "paper_type": paper or "C300",
+        "color": (color_match.group(1) if color_match else None) or "4/4",
+        "finishing": finishing or ["none"],
+        "turnaround_days": (int(td_match.group(1)) if td_match else None) or 3,
+        "rush": bool(re.search(r"\b(rush|urgent)\b", txt)),
+        "missing_fields": missing,
+    }
+
+
+FRAGMENTS = [
+    "print", "qty:", "quantity", "of", "500", "2500", "1234567", "0", "flyers", "business cards", "card",
+    "brochure", "pcs", "units", "copies", "210x297mm", "85 x 55", "85x55x20", "c300", "C350", "xc300",
+    "4/4", "4/0", "3 days", "10days", "rush", "urgent", "rushed", "lamination", "spot uv", "die_cut",
+    "please", "page 3 of 40", "unit 7b", ",", ".", "\n", "a5", "12/2024",
+]
+
+
+def random_texts(n, seed="scanner"):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield " ".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 14)))
+
+
+def test_default_parse_matches_the_baseline_parser():
+    parser = LLMSpecParser()
+    texts = [
+        "",
+        "asdf",
+        "Please print 2500 flyers 210x297mm C300 4/4 with lamination and spot uv, urgent, 3 days.",
+        "Page 1 of 40\nUnit 12B, 85x55mm business cards, qty: 1000, c350, 4/0, die cut, 5 days",
+        "order 1234567 then 300 brochures 148x210 c170 rush",
+    ] + list(random_texts(2000))
+    for text in texts:
+        assert parser._default_parse(text) == baseline_default_parse(text), text
+
+
+def test_evidence_lists_every_critical_match():
+    scan = SpecScanner().scan("Qty: 500 business cards, 85x55mm or 90x50mm, c300 or c350; also flyers, 200 pcs")
+    assert scan["quantity"] == 500
+    assert scan["evidence"] == {
+        "quantity": [500, 200],
+        "size": ["85x55mm", "90x50mm"],
+        "paper_type": ["C300", "C350"],
+        "product_type": ["business_card", "flyer"],
+    }
+
+
+def test_evidence_quantity_is_only_labelled_or_unit_marked():
+    scan = SpecScanner().scan("Page 3 for 1000 flyers 210x297 c300")
+    assert scan["quantity"] == 3
+    assert scan["evidence"]["quantity"] == [1000]
+    assert SpecScanner().scan("proof 50, 2 sided")["evidence"]["quantity"] == []
+    assert SpecScanner().scan("box of 250")["evidence"]["quantity"] == [250]
+
+
+def test_evidence_uses_the_configured_vocabulary():
+    vocab = dict(DEFAULT_VOCAB, products={"poster": ["poster"], "flyer": ["flyer"]})
+    scan = SpecScanner(vocab).scan("40 posters A2 420x594mm c170")
+    assert scan["product_type"] == "poster"
+    assert scan["evidence"]["product_type"] == ["poster"]
+    assert scan["evidence"]["quantity"] == [40]
@@ -0,0 +1,68 @@
+import random
+
+from app.services.text_reducer import GAP_MARKER, estimate_tokens, reduce_text
+
+HEADER = "ACME Studio Ltd - Artwork proof"
+FOOTER = "Page {} of 12"
+DISCLAIMER = "This e-mail is confidential and intended only for the named recipient."
+SPEC = ["Quantity: 2500 brochures", "Size 210x297mm, C300 silk, 4/4 CMYK", "Matte lamination, 5 working days"]
+
+
+WORDS = "layer bleed guide outline spread kerning export swatch gradient mask artboard vector raster margin".split()
+
+
+def artwork_page(n):
+    # Artwork notes that differ from page to page (in words, not just numbers)
+    rng = random.Random(n)
+    body = "\n\n".join(" ".join(rng.choice(WORDS) for _ in range(30)) for _ in range(6))
+    return f"{HEADER}\n{body}\n{DISCLAIMER}\nwww.acme-studio.example\n{FOOTER.format(n)}"
+
+
+def document():
+    pages = [artwork_page(n) for n in range(1, 12)]
+    # The order itself is buried on the last page
+    pages.append(f"{HEADER}\nPlease print:\n" + "\n".join(SPEC) + f"\n{FOOTER.format(12)}")
+    return "Hello, files attached.\n\n" + "\f".join(pages)
+
+
+def test_spec_lines_buried_late_survive_the_budget():
+    text = document()
+    reduction = reduce_text(text, budget=150)
+    assert reduction.tokens_in == estimate_tokens(text) > 10 * 150
+    assert reduction.tokens_out <= 150 and reduction.tokens_out == estimate_tokens(reduction.text)
+    for line in SPEC:
+        assert line in reduction.text
+    assert DISCLAIMER not in reduction.text and "www." not in reduction.text
+    assert "Page " not in reduction.text and reduction.text.count(HEADER) <= 1
+    assert reduction.lines_dropped >= 11 * 3
+    assert reduction.segments_kept < reduction.segments_total
+
+
+def test_gaps_between_kept_segments_are_marked():
+    reduction = reduce_text(document(), budget=150)
+    assert reduction.text.startswith("Hello, files attached.")
+    assert f"{GAP_MARKER}\n" in reduction.text
+    assert not reduction.text.endswith(GAP_MARKER)
+
+
+def test_text_within_budget_is_unchanged():
+    text = "Please print 500 flyers\n\nwww.example.com"
+    assert reduce_text(text, budget=100) == (text, estimate_tokens(text), estimate_tokens(text), 1, 1, 0)
+    assert reduce_text(document(), budget=0).text == document()
+
+
+def test_cleaning_alone_can_fit_the_budget():
+    text = "Please print 500 flyers A5 C300\n" + "Please confirm the proof\n" * 40 + DISCLAIMER
+    reduction = reduce_text(text, budget=60)
+    assert reduction.text == "Please print 500 flyers A5 C300\nPlease confirm the proof"
+    assert reduction.lines_dropped == 40
+
+
+def test_every_segment_over_budget_keeps_the_start_of_the_best_one():
+    filler = " ".join(["lorem ipsum dolor"] * 60)
+    text = f"{filler}\n\nPlease print 800 flyers 148x210mm C170 4/0 {filler}\n\n{filler} again"
+    for budget in (20, 21, 50):
+        reduction = reduce_text(text, budget=budget)
+        assert reduction.text.startswith("Please print 800 flyers")
+        assert reduction.tokens_out <= budget
+        assert (reduction.segments_kept, reduction.segments_total) == (1, 3)
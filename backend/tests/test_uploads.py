@@ -0,0 +1,105 @@
+import asyncio
+import functools
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from app.api import intake
+from app.main import app
+from app.services import uploads
+from app.services.uploads import UploadLimitMiddleware, UploadTooLarge, spool_upload
+
+
+@pytest.fixture
+def tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_TMP_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    monkeypatch.setattr(uploads, "FORM_OVERHEAD_BYTES", 0)
+    calls = []
+    api = FastAPI()
+
+    @api.post("/upload")
+    @api.post("/other")
+    async def echo(request: Request):
+        calls.append(request.url.path)
+        return {"size": len(await request.body())}
+
+    api.add_middleware(UploadLimitMiddleware, paths=["/upload"], max_bytes=100)
+    with TestClient(api) as client:
+        yield client, calls
+
+
+def chunks(total, size=30):
+    for start in range(0, total, size):
+        yield b"x" * min(size, total - start)
+
+
+def test_declared_length_over_the_limit_is_rejected_before_the_route(limited):
+    client, calls = limited
+    r = client.post("/upload", content=b"x" * 101)
+    assert r.status_code == 413 and r.json() == {"detail": "Upload exceeds 100 bytes"}
+    assert calls == []
+    assert client.post("/upload", content=b"x" * 100).json() == {"size": 100}
+
+
+def test_streamed_body_is_cut_off_once_it_passes_the_limit(limited):
+    client, calls = limited
+    r = client.post("/upload", content=chunks(200))
+    assert r.status_code == 413 and r.json()["detail"] == "Upload exceeds 100 bytes"
+    assert client.post("/upload", content=chunks(90)).json() == {"size": 90}
+
+
+def test_other_paths_are_not_limited(limited):
+    client, _ = limited
+    assert client.post("/other", content=b"x" * 500).json() == {"size": 500}
+
+
+def spool(data, **kwargs):
+    return asyncio.run(spool_upload(UploadFile(io.BytesIO(data), filename="artwork.pdf"), **kwargs))
+
+
+def test_spool_upload_copies_in_chunks_and_hashes(tmp_dir, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_BYTES", 7)
+    data = os.urandom(100)
+    spooled = spool(data)
+    assert os.path.dirname(spooled.path) == str(tmp_dir) and spooled.path.endswith(".pdf")
+    assert (spooled.size, spooled.sha256) == (100, hashlib.sha256(data).hexdigest())
+    with open(spooled.path, "rb") as f:
+        assert f.read() == data
+    uploads.remove_spooled(spooled.path)
+    uploads.remove_spooled(spooled.path)
+    assert list(tmp_dir.iterdir()) == []
+
+
+def test_spool_upload_removes_the_partial_file(tmp_dir, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_BYTES", 10)
+    with pytest.raises(UploadTooLarge) as e:
+        spool(b"x" * 31, max_bytes=30)
+    assert e.value.max_bytes == 30
+    assert spool(b"x" * 30, max_bytes=30).size == 30
+
+    class Failing(io.BytesIO):
+        def read(self, size=-1):
+            raise asyncio.CancelledError()
+
+    for path in tmp_dir.iterdir():
+        path.unlink()
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(spool_upload(UploadFile(Failing(), filename="artwork.pdf")))
+    assert list(tmp_dir.iterdir()) == []
+
+
+def test_intake_answers_413_and_leaves_no_spooled_file(db, tmp_dir, monkeypatch):
+    monkeypatch.setattr(intake, "spool_upload", functools.partial(spool_upload, max_bytes=10))
+    with TestClient(app) as client:
+        r = client.post("/intake/order", files={"file": ("order.txt", b"x" * 11, "text/plain")})
+    assert r.status_code == 413 and r.json() == {"detail": "Upload exceeds 10 bytes"}
+    assert list(tmp_dir.iterdir()) == []
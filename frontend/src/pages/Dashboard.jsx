@@ -15,7 +15,7 @@ export default function Dashboard(){
     setLoading(true)
     Promise.all([
       axios.get(`${API_BASE}/dashboard/summary`).then(r=>r.data),
-      axios.get(`${API_BASE}/dashboard/orders`).then(r=>r.data),
+      axios.get(`${API_BASE}/dashboard/orders`, {params: {recent: 50}}).then(r=>r.data),
       axios.get(`${API_BASE}/dashboard/stats`).then(r=>r.data)
     ]).then(([s, o, st])=>{
       setSummary(s)
@@ -66,7 +66,7 @@ export default function Dashboard(){
           <table className="w-full text-left border-collapse">
             <thead className="bg-gray-50"><tr><th className="p-2">ID</th><th className="p-2">Product</th><th className="p-2">Qty</th><th className="p-2">Status</th><th className="p-2">Price</th><th className="p-2">Email</th><th className="p-2">Issues</th></tr></thead>
             <tbody>
-              {orders.slice().reverse().slice(0,50).map(o=> (
+              {orders.map(o=> (
                 <tr key={o.id} className="border-b"><td className="p-2">{o.id}</td><td className="p-2">{o.product_type||'—'}</td><td className="p-2">{o.quantity||'—'}</td><td className="p-2"><StatusBadge status={o.status} /></td><td className="p-2">{o.final_price!=null?('$'+o.final_price):'—'}</td><td className="p-2">{o.email||'—'}</td><td className="p-2">{o.issues||''}</td></tr>
               ))}
             </tbody>